@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de la decodificación de respuestas FHIR (ver ph4h/fhirjson.py).
+
+Uso:
+  python3 bench-decode.py [--responses CARPETA] [--record CARPETA] [--base URL]
+                          [--pad BYTES] [--repeat R]
+
+Compara, sobre respuestas grabadas (Bundle de search, $expand, $translate
+y lecturas de ConceptMap), el camino anterior (json + dicts recorridos con
+.get) con los tipados: decode después de parsear todo (con json y, si está
+instalado, con orjson) y parse directo del cuerpo (con msgspec, si está
+instalado, que no construye los campos que no se leen). Informa tiempo (el
+mejor de R pasadas) y memoria con tracemalloc (pico y lo que queda retenido
+al guardar el resultado de cada respuesta, como hacen los checks).
+
+Con --responses usa los *.json de esa carpeta (nombrados bundle-*, expansion-*,
+parameters-*, conceptmap-*). Si no, graba las respuestas de --base o de un
+servidor simulado con los fixtures de siempre (--pad agrega relleno a cada
+recurso), en --record si se indica o en una carpeta temporal.
+"""
+import argparse
+import gc
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from ph4h.client import HttpPool, enc
+from ph4h.expansion import flatten
+from ph4h.fhirjson import Bundle, ConceptMapSummary, Expansion, Parameters, loads, msgspec, orjson
+from ph4h.mockserver import DEFAULT_FIXTURES, MockConfig, MockServer
+
+KINDS = ("bundle", "expansion", "parameters", "conceptmap")
+
+
+# ----------------- Grabación -----------------
+def record(base: str, out: Path, limit: int = 50):
+    """Graba en `out` las respuestas que piden los checks; devuelve cuántas por tipo."""
+    pool = HttpPool()
+    out.mkdir(parents=True, exist_ok=True)
+    counts = dict.fromkeys(KINDS, 0)
+
+    def save(kind: str, url: str):
+        r = pool.get(url, timeout=60)
+        if not r.ok:
+            return None
+        (out / f"{kind}-{counts[kind]:04d}.json").write_bytes(r.content)
+        counts[kind] += 1
+        return loads(r.content)
+
+    listings = {k: save("bundle", f"{base}/{k}?_count=200") for k in ("CodeSystem", "ValueSet", "ConceptMap")}
+    for res in (Bundle.decode(listings["ValueSet"]).resources if listings["ValueSet"] else [])[:limit]:
+        if res.get("url"):
+            save("expansion", f"{base}/ValueSet/%24expand?url={enc(res['url'])}&count=1000")
+    for res in (Bundle.decode(listings["ConceptMap"]).resources if listings["ConceptMap"] else [])[:limit]:
+        cm = ConceptMapSummary.decode(save("conceptmap", f"{base}/ConceptMap/{enc(res.get('id') or '')}"))
+        if not cm or not cm.complete:
+            continue
+        exp = Expansion.decode(loads(pool.get(f"{base}/ValueSet/%24expand?url={enc(cm.source)}&count=1", timeout=60).content))
+        if exp and exp.concepts:
+            c = exp.concepts[0]
+            save("parameters", f"{base}/ConceptMap/%24translate?url={enc(cm.url)}&code={enc(str(c.code))}"
+                               f"&system={enc(c.system or '')}&source={enc(cm.source)}&target={enc(cm.target)}")
+    return counts
+
+
+# ----------------- Caminos a comparar -----------------
+# Lo que hacía cada check con el dict de la respuesta (y lo que dejaba vivo).
+def dict_bundle(page):
+    total = page.get("total")
+    nxt = next((l.get("url") for l in (page.get("link") or []) if l.get("relation") == "next"), None)
+    return page, total, nxt, [e.get("resource") or {} for e in (page.get("entry") or [])]
+
+def dict_expansion(resp):
+    expansion = resp.get("expansion") or {}
+    return expansion.get("total"), list(flatten(expansion.get("contains") or []))
+
+def dict_parameters(resp):
+    return resp, [p for p in (resp.get("parameter") or []) if p.get("name") == "match"]
+
+def dict_conceptmap(cm):
+    return cm, (cm.get("url") or "").strip(), (cm.get("sourceUri") or cm.get("sourceCanonical") or "").strip()
+
+DICT = {"bundle": dict_bundle, "expansion": dict_expansion, "parameters": dict_parameters,
+        "conceptmap": dict_conceptmap}
+TYPED = {"bundle": Bundle.decode, "expansion": Expansion.decode, "parameters": Parameters.decode,
+         "conceptmap": ConceptMapSummary.decode}
+PARSED = {"bundle": Bundle.parse, "expansion": Expansion.parse, "parameters": Parameters.parse,
+          "conceptmap": ConceptMapSummary.parse}
+
+
+def timed(bodies, parse, walk, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        for b in bodies:
+            walk(parse(b))
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def memory(bodies, parse, walk):
+    """(bytes retenidos, pico) al decodificar todas las respuestas guardando cada resultado."""
+    gc.collect()
+    tracemalloc.start()
+    kept = [walk(parse(b)) for b in bodies]
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return retained, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark de la decodificación de respuestas FHIR.")
+    parser.add_argument("--responses", help="Carpeta con respuestas ya grabadas")
+    parser.add_argument("--record", help="Dónde grabar las respuestas (por defecto, una carpeta temporal)")
+    parser.add_argument("--base", help="Servidor del que grabar (por defecto, uno simulado)")
+    parser.add_argument("--pad", type=int, default=0, help="Bytes de relleno por recurso del servidor simulado")
+    parser.add_argument("--repeat", type=int, default=20, help="Pasadas por caso (se informa la mejor)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(args.responses or args.record or tmp)
+        if not args.responses:
+            if args.base:
+                counts = record(args.base.rstrip("/"), folder)
+            else:
+                with MockServer(list(DEFAULT_FIXTURES), MockConfig(pad_bytes=args.pad, max_page=1000)) as server:
+                    counts = record(server.base, folder)
+            print(f"[INFO] Respuestas grabadas en {folder}: " + ", ".join(f"{n} {k}" for k, n in counts.items()))
+
+        print(f"[INFO] orjson: {'sí' if orjson else 'no'} | msgspec: {'sí' if msgspec else 'no'}")
+        for kind in KINDS:
+            bodies = [f.read_bytes() for f in sorted(folder.glob(f"{kind}-*.json"))]
+            if not bodies:
+                print(f"[INFO] {kind}: sin respuestas grabadas")
+                continue
+            size = sum(len(b) for b in bodies)
+            cases = {"json+dict": (json.loads, DICT[kind]), "json+tipado": (json.loads, TYPED[kind])}
+            if orjson:
+                cases["orjson+tipado"] = (loads, TYPED[kind])
+            if msgspec:
+                cases["msgspec"] = (PARSED[kind], lambda obj: obj)
+            results = {name: (timed(bodies, p, w, args.repeat),) + memory(bodies, p, w)
+                       for name, (p, w) in cases.items()}
+            print(f"[BENCH] {kind}: {len(bodies)} respuestas, {size / 1024:.1f} KB")
+            t_ref, kept_ref, _ = results["json+dict"]
+            for name, (secs, kept, peak) in results.items():
+                gain = "" if name == "json+dict" else \
+                    f" (x{t_ref / secs:.1f} en tiempo, {kept / kept_ref:.0%} de la memoria retenida)"
+                print(f"  {name:14} {secs * 1000:8.2f} ms | retenido {kept / 1024:8.1f} KB | "
+                      f"pico {peak / 1024:8.1f} KB{gain}")
+
+
+if __name__ == "__main__":
+    main()
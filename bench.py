@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los checks contra servidores simulados (ph4h/mockserver.py).
+
+Uso:
+  python3 bench.py [--fixtures CARPETA|PAQUETE ...] [--countries N] [--repeat R]
+                   [--latency SEG] [--jitter SEG] [--error-rate P] [--page-size N] [--pad BYTES]
+                   [--out bench-results.json] [--baseline ANTERIOR.json] [--tolerance 0.25]
+
+Levanta N servidores simulados (uno por "país", cada uno en su puerto),
+corre check-cs.py, check-vs.py y check-cm.py contra el primero y sweep.py
+contra los N, cada uno R veces como proceso aparte, y registra el tiempo
+(mediana), los requests y los bytes (de metrics.json). Con --baseline
+compara contra una corrida anterior y sale con 1 si algo empeoró más que
+--tolerance (tiempo y bytes) o si hay más requests.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from ph4h.mockserver import DEFAULT_FIXTURES, MockConfig, MockServer, MockTerminology
+
+SCRIPTS = ("check-cs.py", "check-vs.py", "check-cm.py")
+HERE = Path(__file__).resolve().parent
+
+
+def run_once(cmd, env: dict, metrics_dir: Path):
+    """Corre `cmd` y devuelve (segundos, rc, requests, bytes) según su metrics.json."""
+    for f in metrics_dir.glob("metrics.json"):
+        f.unlink()
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    seconds = time.perf_counter() - t0
+    try:
+        with open(metrics_dir / "metrics.json", "r", encoding="utf-8") as f:
+            series = json.load(f)["series"]
+    except (OSError, ValueError, KeyError):
+        series = []
+    if proc.returncode and proc.stderr.strip():
+        print(proc.stderr.strip().splitlines()[-1], file=sys.stderr)
+    return seconds, proc.returncode, sum(s["count"] for s in series), sum(s["bytes"] for s in series)
+
+
+def measure(cmd, env, metrics_dir: Path, repeat: int) -> dict:
+    runs = [run_once(cmd, env, metrics_dir) for _ in range(max(1, repeat))]
+    return {"seconds": round(statistics.median(r[0] for r in runs), 4),
+            "rc": max(r[1] for r in runs), "requests": runs[-1][2], "bytes": runs[-1][3]}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> int:
+    """Líneas [OK]/[FAIL] por caso; devuelve la cantidad de regresiones."""
+    regressions = 0
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b:
+            print(f"[INFO] {name}: sin referencia en la corrida anterior")
+            continue
+        problems = []
+        if r["seconds"] > b["seconds"] * (1 + tolerance):
+            problems.append(f"tiempo {b['seconds']:.2f}s -> {r['seconds']:.2f}s")
+        if r["requests"] > b["requests"]:
+            problems.append(f"requests {b['requests']} -> {r['requests']}")
+        if r["bytes"] > b["bytes"] * (1 + tolerance):
+            problems.append(f"bytes {b['bytes']} -> {r['bytes']}")
+        if problems:
+            regressions += 1
+            print(f"[FAIL] {name}: {' | '.join(problems)}")
+        else:
+            print(f"[OK] {name}: {b['seconds']:.2f}s -> {r['seconds']:.2f}s | requests {b['requests']} -> {r['requests']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de check-cs/vs/cm y sweep.py contra servidores simulados.")
+    parser.add_argument("--fixtures", nargs="*", default=list(DEFAULT_FIXTURES),
+                        help="Carpetas de JSON o paquetes .tgz")
+    parser.add_argument("--countries", type=int, default=5, help="Servidores simulados para el barrido")
+    parser.add_argument("--repeat", type=int, default=3, help="Corridas por caso (se informa la mediana)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Segundos de demora por respuesta")
+    parser.add_argument("--jitter", type=float, default=0.005, help="± segundos aleatorios sobre --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilidad de responder 503")
+    parser.add_argument("--page-size", type=int, default=20, help="_count por defecto de los search")
+    parser.add_argument("--pad", type=int, default=0, help="Bytes de relleno por recurso devuelto")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla del jitter y los errores")
+    parser.add_argument("--out", default="bench-results.json", help="Dónde guardar los resultados")
+    parser.add_argument("--baseline", help="Resultados anteriores contra los que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Empeoramiento admitido en tiempo y bytes")
+    args = parser.parse_args()
+
+    term = MockTerminology(args.fixtures)  # los N servidores comparten los índices
+    config = MockConfig(args.latency, args.jitter, args.error_rate, args.page_size, pad_bytes=args.pad, seed=args.seed)
+    servers = [MockServer(None, config, terminology=term).start() for _ in range(max(1, args.countries))]
+    try:
+        cs = next((c for c in term.store["CodeSystem"].values() if c.get("concept")), {})
+        cs_local, code_local = cs.get("url", ""), str((cs.get("concept") or [{}])[0].get("code", ""))
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            env = dict(os.environ, METRICS_DIR=str(tmp), EXPECTED_TOTAL=str(len(term.store["ValueSet"])),
+                       PYTHONDONTWRITEBYTECODE="1")
+            base = servers[0].base
+            results = {}
+            commands = {
+                "check-cs.py": [sys.executable, "check-cs.py", base, cs_local, code_local],
+                "check-vs.py": [sys.executable, "check-vs.py", base],
+                "check-cm.py": [sys.executable, "check-cm.py", base],
+            }
+            for name in SCRIPTS:
+                results[name] = measure(commands[name], env, tmp, args.repeat)
+            table = [{"country": f"MOCK{i + 1}", "base": s.base, "cs_local": cs_local, "code": code_local}
+                     for i, s in enumerate(servers)]
+            (tmp / "servers.json").write_text(json.dumps(table), encoding="utf-8")
+            results[f"sweep-{len(servers)}"] = measure(
+                [sys.executable, "sweep.py", str(tmp / "servers.json"), "--out-dir", str(tmp / "out"),
+                 "--metrics-dir", str(tmp), "--budget", "0"], env, tmp, args.repeat)
+    finally:
+        for s in servers:
+            s.stop()
+
+    for name, r in results.items():
+        print(f"[BENCH] {name}: {r['seconds']:.2f}s | {r['requests']} requests | "
+              f"{r['bytes'] / 1024:.1f} KB | rc={r['rc']}")
+    data = {"finished": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+            "results": results}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en: {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results") or {}
+        sys.exit(1 if compare(results, baseline, args.tolerance) else 0)
+
+
+if __name__ == "__main__":
+    main()
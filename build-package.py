@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Construye paquetes FHIR (.tgz) para Snowstorm, varios a la vez.
+
+Uso:
+  python3 build-package.py [build-packages.json] [--only NOMBRE ...] [--jobs N] [--level 0-9] [--force]
+  python3 build-package.py -d CARPETA -o paquete.tgz --name NOMBRE [--version 1.0.0]
+
+Cada entrada de la configuración trae el manifiesto (name, version,
+description, author, url) y sus fuentes: "directory" (todos los JSON de la
+carpeta) y/o "files" (archivos sueltos, van a <resourceType>/). Las rutas
+son relativas a la carpeta de la configuración. version "today" = AAAA.MM.DD.
+"""
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ph4h.package import PackageSpec, build_package, list_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye paquetes FHIR (.tgz) sin carpetas temporales.")
+    parser.add_argument("config", nargs="?", default="build-packages.json", help="Lista de paquetes (JSON)")
+    parser.add_argument("--only", nargs="*", help="Construir solo estos paquetes (por name)")
+    parser.add_argument("-d", "--directory", help="Construir un solo paquete con todos los JSON de esta carpeta")
+    parser.add_argument("-o", "--output", help="Archivo .tgz de salida (con -d)")
+    parser.add_argument("--name", help="name del package.json (con -d)")
+    parser.add_argument("--version", default="1.0.0", help="version del package.json (con -d)")
+    parser.add_argument("--jobs", type=int, default=4, help="Paquetes construidos a la vez")
+    parser.add_argument("--level", type=int, default=9, choices=range(0, 10), metavar="0-9", help="Nivel de compresión gzip")
+    parser.add_argument("--force", action="store_true", help="Ignorar la cache y reconstruir aunque nada haya cambiado")
+    args = parser.parse_args()
+
+    if args.directory:
+        if not args.output or not args.name:
+            parser.error("-d requiere -o y --name")
+        specs = [PackageSpec(args.name, args.version, args.output, list_dir(Path(args.directory)))]
+    else:
+        config = Path(args.config)
+        with open(config, "r", encoding="utf-8") as f:
+            specs = [PackageSpec.from_dict(d, config.parent) for d in json.load(f)]
+        if args.only:
+            specs = [s for s in specs if s.name in args.only]
+
+    def build(spec):
+        return build_package(spec, compresslevel=args.level, force=args.force)
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        for spec, fut in [(s, pool.submit(build, s)) for s in specs]:
+            try:
+                fut.result()
+            except Exception as e:
+                print(f"❌ {spec.name}: {e}", file=sys.stderr)
+                failed += 1
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+import os, sys
+
+from ph4h.checks import check_package
+from ph4h.client import FhirClient
+
+# Args
+if len(sys.argv) < 2:
+    print("[FAIL] Uso: diff-package.py PAQUETE.tgz [BASE_URL]")
+    sys.exit(1)
+
+PACKAGE = sys.argv[1]
+BASE = (sys.argv[2] if len(sys.argv) >= 3 else os.environ.get("BASE_URL", "http://localhost:8180/fhir")).rstrip("/")
+
+client = FhirClient.from_env()
+rc = check_package(client, BASE, PACKAGE)
+if int(os.environ.get("HTTP_STATS", "0")): client.pool.stats.report()
+if os.environ.get("METRICS_DIR"): client.metrics.export(os.environ["METRICS_DIR"])
+sys.exit(rc)
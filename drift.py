@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Deriva de terminología: compara la expansión de los ValueSet compartidos
+(por defecto, los de http://racsel.org/fhir/ValueSet/) entre todos los
+servidores de servers.json (ver ph4h/drift.py).
+
+Uso:
+  python3 drift.py [servers.json] [--only PAÍS ...] [--vs URL ...] [--prefix URL]
+                   [--db history.sqlite] [--max-age SEG] [--jobs N]
+                   [--max-inflight N] [--max-per-host N] [--adaptive]
+                   [--out current-status/drift.json]
+
+Cada expansión se recorre una sola vez por servidor y se reduce a una
+huella que no depende del orden; solo los servidores cuya huella difiere
+de la más repetida se vuelven a expandir para listar los códigos que les
+faltan o sobran. Con --db las huellas de los ValueSet cuya meta no cambió
+se reutilizan durante --max-age segundos. Sale con 1 si hay deriva o errores.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from ph4h.checks import VS_RETRIES, VS_SLEEP_RETRY
+from ph4h.client import FhirClient, Limits, env, shared_pool
+from ph4h.drift import DRIFT_MAX_AGE, DRIFT_PREFIX, detect
+from ph4h.history import History
+from sweep import load_servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara la expansión de los ValueSet compartidos entre servidores.")
+    parser.add_argument("config", nargs="?", default="servers.json", help="Tabla de servidores (JSON)")
+    parser.add_argument("--only", nargs="*", help="Limitar la comparación a estos países")
+    parser.add_argument("--vs", nargs="*", help="ValueSets a comparar (por defecto, todos los compartidos bajo --prefix)")
+    parser.add_argument("--prefix", default=DRIFT_PREFIX, help="Prefijo de canonical de los ValueSet compartidos (DRIFT_PREFIX)")
+    parser.add_argument("--db", default="history.sqlite", help="Historial SQLite donde guardar y reutilizar huellas ('' = no)")
+    parser.add_argument("--max-age", type=float, default=DRIFT_MAX_AGE,
+                        help="Segundos que vale una huella reutilizada (DRIFT_MAX_AGE; 0 = recalcular todo)")
+    parser.add_argument("--jobs", type=int, default=8, help="Expansiones pedidas a la vez")
+    parser.add_argument("--max-inflight", type=int, default=int(env("MAX_INFLIGHT", "32")),
+                        help="Tope global de requests simultáneos (0 = sin tope)")
+    parser.add_argument("--max-per-host", type=int, default=int(env("MAX_PER_HOST", "4")),
+                        help="Tope de requests simultáneos por host (0 = sin tope)")
+    parser.add_argument("--adaptive", action="store_true", default=env("ADAPTIVE_LIMITS", "0") == "1",
+                        help="Tope por host adaptativo (AIMD, como sweep.py --adaptive)")
+    parser.add_argument("--out", default="current-status/drift.json", help="Reporte JSON por ValueSet y servidor")
+    args = parser.parse_args()
+
+    servers = load_servers(Path(args.config))
+    if args.only:
+        wanted = {c.upper() for c in args.only}
+        servers = [s for s in servers if s["country"].upper() in wanted]
+    if len(servers) < 2:
+        parser.error("hacen falta al menos dos servidores para comparar")
+
+    limits = Limits(args.max_inflight, args.max_per_host, adaptive=args.adaptive)
+    clients = {s["country"]: FhirClient.from_env(retries=VS_RETRIES, sleep_retry=VS_SLEEP_RETRY,
+                                                 limits=limits, label=s["country"]) for s in servers}
+    history = History(args.db) if args.db else None
+    try:
+        rc, report = detect(servers, clients, history=history, prefix=args.prefix, urls=args.vs,
+                            max_age=args.max_age, jobs=args.jobs)
+    finally:
+        if history is not None:
+            history.close()
+    shared_pool().stats.report()
+    limits.report()
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"finished": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "prefix": args.prefix,
+                   "servers": [s["country"] for s in servers], "valuesets": report},
+                  f, ensure_ascii=False, indent=2)
+    os.replace(tmp, out)
+    print(f"Resultado guardado en: {out}")
+    sys.exit(rc)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Linter offline de paquetes FHIR antes de publicarlos (ver ph4h/lint.py).
+
+Uso:
+  python3 lint-package.py [PAQUETE.tgz ...] [--jobs N] [--show N] [--allow PREFIJO ...]
+                          [--external] [--out lint.json]
+
+Sin paquetes toma packages/*.tgz, giis/*.tgz y prequal/*.tgz. Cada .tgz se
+lee una sola vez en streaming, sin extraerlo, y se verifica que package.json
+y .index.json coincidan con el contenido, que no haya ids ni canonicals
+repetidos y que las referencias ValueSet -> CodeSystem y ConceptMap ->
+ValueSet (y sus códigos) resuelvan dentro del paquete. Los paquetes se
+revisan en paralelo en procesos separados (descomprimir y parsear es CPU
+puro). Las referencias a terminologías externas (LINT_EXTERNAL, más las de
+--allow) no cuentan como colgantes. Sale con 1 si algún paquete tiene errores.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from ph4h.lint import LINT_EXTERNAL, lint_package
+
+DEFAULT_GLOBS = ("packages/*.tgz", "giis/*.tgz", "prequal/*.tgz")
+
+
+def report(result, show: int, external: bool):
+    shown = Counter()
+    for level, check, message in result.findings:
+        shown[check] += 1
+        if shown[check] <= show:
+            print(f"[{level}] {result.path} [{check}] {message}")
+    for check, n in shown.items():
+        if n > show:
+            print(f"[INFO] {result.path} [{check}] … y {n - show} más")
+    if external and result.external:
+        print(f"[INFO] {result.path} referencias externas: " +
+              ", ".join(f"{url} x{n}" for url, n in result.external.most_common()))
+    kinds = ", ".join(f"{n} {k}" for k, n in sorted(result.counts.items()))
+    status = "FAIL" if result.errors else "WARN" if result.warnings else "OK"
+    print(f"[{status}] {result.path}: {result.name or '?'} {result.version} | {sum(result.counts.values())} "
+          f"recursos ({kinds or 'ninguno'}) | errores {result.errors} | avisos {result.warnings} | "
+          f"externas {len(result.external)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica paquetes FHIR (.tgz) sin servidor ni extracción.")
+    parser.add_argument("packages", nargs="*", help=f"Paquetes .tgz (por defecto {' '.join(DEFAULT_GLOBS)})")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Paquetes revisados a la vez (procesos)")
+    parser.add_argument("--show", type=int, default=10, help="Hallazgos mostrados por verificación y paquete")
+    parser.add_argument("--allow", nargs="*", default=[], metavar="PREFIJO",
+                        help="Prefijos de canonical externos, además de LINT_EXTERNAL")
+    parser.add_argument("--external", action="store_true", help="Listar las referencias a canonicals externos")
+    parser.add_argument("--out", help="Guardar todos los hallazgos en este JSON")
+    args = parser.parse_args()
+
+    paths = args.packages or sorted(p for pattern in DEFAULT_GLOBS for p in glob.glob(pattern))
+    if not paths:
+        parser.error("no hay paquetes para revisar")
+
+    lint = partial(lint_package, external=LINT_EXTERNAL + tuple(args.allow))
+    t0 = time.perf_counter()
+    if args.jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(paths))) as pool:
+            results = list(pool.map(lint, paths))
+    else:
+        results = [lint(p) for p in paths]
+    elapsed = time.perf_counter() - t0
+
+    for result in results:
+        report(result, args.show, args.external)
+    failed = sum(1 for r in results if r.errors)
+    print("--------------------------------------------")
+    print(f"[RESUMEN] Paquetes: {len(results)} | sin errores: {len(results) - failed} | con errores: {failed} | "
+          f"errores: {sum(r.errors for r in results)} | avisos: {sum(r.warnings for r in results)} | "
+          f"{elapsed:.2f}s")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"finished": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                       "packages": [r.as_dict() for r in results]}, f, ensure_ascii=False, indent=2)
+        print(f"Resultado guardado en: {args.out}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
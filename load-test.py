@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de un servidor de terminología (ver ph4h/loadtest.py).
+
+Uso:
+  python3 load-test.py BASE_URL [--rate R | --ramp INICIO:FIN:PASO] [--step-seconds SEG]
+                       [--mix lookup=1,expand=1,translate=1] [--constant] [--timeout SEG]
+                       [--max-inflight N] [--max-errors 0.01] [--slo-p95 SEG] [--abort-errors 0.5]
+                       [--cs-local URL --code CÓDIGO] [--limit N] [--seed N] [--out loadtest-results.json]
+  python3 load-test.py --country PAÍS [--servers servers.json] ...
+  python3 load-test.py --mock [--mock-latency SEG] [--mock-jitter SEG] [--mock-capacity N] ...
+
+Arma las mismas consultas que check-cs/vs/cm ($lookup de los pares
+configurados, $expand de cada ValueSet, $translate de cada ConceptMap VS)
+y las dispara a una tasa fija por paso (Poisson, o constante con
+--constant), sin esperar respuestas. Por paso informa throughput logrado,
+p50/p95/p99/max (desde el instante programado) y errores por tipo; el
+primer paso con más de --max-errors de errores (o p95 > --slo-p95) marca
+el inicio de la saturación, y la rampa se corta si pasa --abort-errors.
+
+Con --mock levanta un servidor simulado local (con --mock-capacity
+requests simultáneos, por encima responde 429) para probar de punta a punta.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from ph4h.client import FhirClient
+from ph4h.loadtest import OPERATIONS, LoadGenerator, parse_mix, parse_ramp, workload
+from ph4h.mockserver import DEFAULT_FIXTURES, MockConfig, MockServer
+from sweep import load_servers
+
+
+def ms(seconds: float) -> str:
+    return f"{seconds * 1000:.0f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de lazo abierto con las operaciones de los checks.")
+    parser.add_argument("base", nargs="?", help="URL base FHIR")
+    parser.add_argument("--country", help="Tomar base y CodeSystem/código de este país de --servers")
+    parser.add_argument("--servers", default="servers.json", help="Tabla de servidores (con --country)")
+    parser.add_argument("--cs-local", help="CodeSystem local para el $lookup LOCAL")
+    parser.add_argument("--code", help="Código del CodeSystem local")
+    parser.add_argument("--rate", type=float, default=10.0, help="Requests por segundo (un solo paso)")
+    parser.add_argument("--ramp", help="Rampa de tasas INICIO:FIN:PASO en req/s (reemplaza --rate)")
+    parser.add_argument("--step-seconds", type=float, default=30.0, help="Duración de cada paso")
+    parser.add_argument("--mix", default=",".join(f"{o}=1" for o in OPERATIONS),
+                        help="Peso de cada operación (lookup, expand, translate)")
+    parser.add_argument("--constant", action="store_true", help="Intervalos fijos en vez de llegadas Poisson")
+    parser.add_argument("--timeout", type=float, default=15.0, help="Timeout de cada request")
+    parser.add_argument("--max-inflight", type=int, default=256, help="Tope local de requests en vuelo")
+    parser.add_argument("--max-errors", type=float, default=0.01, help="Fracción de errores que marca saturación")
+    parser.add_argument("--slo-p95", type=float, help="p95 (segundos) por encima del cual el paso cuenta como saturado")
+    parser.add_argument("--abort-errors", type=float, default=0.5, help="Cortar la rampa si los errores pasan esta fracción")
+    parser.add_argument("--limit", type=int, default=200, help="Máximo de ValueSet/ConceptMap distintos en la mezcla")
+    parser.add_argument("--seed", type=int, help="Semilla de las llegadas y la elección de operaciones")
+    parser.add_argument("--out", default="loadtest-results.json", help="Resultados por paso (JSON)")
+    parser.add_argument("--mock", action="store_true", help="Probar contra un servidor simulado local")
+    parser.add_argument("--mock-latency", type=float, default=0.02, help="Latencia del servidor simulado")
+    parser.add_argument("--mock-jitter", type=float, default=0.005, help="± segundos sobre --mock-latency")
+    parser.add_argument("--mock-capacity", type=int, default=0, help="Requests simultáneos del simulado (0 = sin tope)")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+        rates = parse_ramp(args.ramp) if args.ramp else [args.rate]
+    except ValueError as e:
+        parser.error(str(e))
+
+    server = mock = None
+    if args.country:
+        server = next((s for s in load_servers(Path(args.servers)) if s["country"].upper() == args.country.upper()), None)
+        if server is None:
+            parser.error(f"{args.country} no está en {args.servers}")
+    if args.mock:
+        mock = MockServer(list(DEFAULT_FIXTURES), MockConfig(args.mock_latency, args.mock_jitter, seed=args.seed,
+                                                            capacity=args.mock_capacity)).start()
+        cs = next((c for c in mock.term.store["CodeSystem"].values() if c.get("concept")), {})
+        server = {"base": mock.base, "cs_local": cs.get("url"), "code": str((cs.get("concept") or [{}])[0].get("code", ""))}
+    base = args.base or (server or {}).get("base")
+    if not base:
+        parser.error("indicar BASE_URL, --country o --mock")
+    base = base.rstrip("/")
+
+    try:
+        print(f"[INFO] Base: {base}")
+        client = FhirClient.from_env()
+        ops = workload(client, base, args.cs_local or (server or {}).get("cs_local"),
+                       args.code or (server or {}).get("code"), (server or {}).get("cs_checks"), args.limit)
+        print("[INFO] Operaciones: " + " | ".join(f"{len(ops[n])} {n}" for n in OPERATIONS) +
+              f" | mezcla {','.join(f'{k}={v:g}' for k, v in mix.items())}")
+        try:
+            gen = LoadGenerator(base, ops, mix, args.timeout, args.max_inflight, not args.constant, args.seed)
+        except ValueError as e:
+            print(f"[FAIL] {e}")
+            sys.exit(1)
+
+        steps, onset, best = [], None, None
+        for rate in rates:
+            step = gen.run_step(rate, args.step_seconds)
+            steps.append(step)
+            p = step.percentiles()
+            saturated = step.error_rate > args.max_errors or (args.slo_p95 and p[95] > args.slo_p95)
+            errors = ", ".join(f"{k} x{n}" for k, n in step.errors.most_common())
+            print(f"[{'WARN' if saturated else 'OK'}] {rate:g} req/s x {args.step_seconds:g}s: "
+                  f"logrado {step.throughput:.1f} req/s | p50 {ms(p[50])} p95 {ms(p[95])} p99 {ms(p[99])} "
+                  f"max {ms(p['max'])} | errores {step.failed} ({100 * step.error_rate:.1f}%"
+                  f"{': ' + errors if errors else ''}) | descartados {step.dropped}")
+            if saturated and onset is None:
+                onset = step
+            if not saturated and onset is None and (best is None or step.throughput > best.throughput):
+                best = step
+            if step.error_rate > args.abort_errors:
+                print(f"[INFO] Rampa cortada: {100 * step.error_rate:.0f}% de errores a {rate:g} req/s")
+                break
+    finally:
+        if mock is not None:
+            mock.stop()
+
+    print("--------------------------------------------")
+    sustained = (f"{best.throughput:.1f} req/s logrados a {best.rate:g} req/s (p95 {ms(best.percentiles()[95])})"
+                 if best else "ninguno")
+    if onset:
+        cause = ", ".join(f"{k} x{n}" for k, n in onset.errors.most_common(3)) or f"p95 {ms(onset.percentiles()[95])}"
+        print(f"[RESUMEN] Máximo sostenido: {sustained} | saturación desde {onset.rate:g} req/s ({cause})")
+    else:
+        print(f"[RESUMEN] Máximo sostenido: {sustained} | sin saturación hasta {steps[-1].rate:g} req/s")
+
+    data = {"finished": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "base": base,
+            "config": {k: v for k, v in vars(args).items() if k not in ("out",)},
+            "operations": {n: len(ops[n]) for n in OPERATIONS},
+            "onset": onset.rate if onset else None, "steps": [s.as_dict() for s in steps]}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
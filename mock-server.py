@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Servidor FHIR de terminología simulado (ver ph4h/mockserver.py).
+
+Uso:
+  python3 mock-server.py [FIXTURE ...] [--port 8180] [--latency SEG] [--jitter SEG]
+                         [--error-rate P] [--page-size N] [--pad BYTES] [--no-batch]
+                         [--capacity N] [--retry-after SEG]
+
+Cada FIXTURE es una carpeta de JSON (giis/, prequal/) o un paquete .tgz;
+por defecto giis/, prequal/ y el paquete de BAHAMAS. Los checks se apuntan a http://127.0.0.1:PUERTO/fhir.
+"""
+import argparse
+import time
+
+from ph4h.mockserver import DEFAULT_FIXTURES, MockConfig, MockServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor FHIR de terminología simulado.")
+    parser.add_argument("fixtures", nargs="*", default=list(DEFAULT_FIXTURES),
+                        help="Carpetas de JSON o paquetes .tgz")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8180)
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de demora por respuesta")
+    parser.add_argument("--jitter", type=float, default=0.0, help="± segundos aleatorios sobre --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilidad de responder 503")
+    parser.add_argument("--page-size", type=int, default=20, help="_count por defecto de los search")
+    parser.add_argument("--max-page", type=int, default=1000, help="Tope de _count/count")
+    parser.add_argument("--pad", type=int, default=0, help="Bytes de relleno (text.div) por recurso devuelto")
+    parser.add_argument("--no-batch", action="store_true", help="Rechazar los Bundle batch")
+    parser.add_argument("--capacity", type=int, default=0,
+                        help="Requests simultáneos que atiende; por encima responde 429 (0 = sin tope)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After de los 429 por --capacity")
+    parser.add_argument("--seed", type=int, help="Semilla del jitter y los errores")
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency, args.jitter, args.error_rate, args.page_size, args.max_page,
+                        args.pad, batch=not args.no_batch, seed=args.seed,
+                        capacity=args.capacity, retry_after=args.retry_after)
+    with MockServer(args.fixtures, config, args.host, args.port) as server:
+        counts = ", ".join(f"{len(v)} {k}" for k, v in server.term.store.items())
+        print(f"[INFO] Sirviendo {counts} en {server.base} (Ctrl-C para salir)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print(f"[INFO] {server.requests} requests | {server.bytes / 1024:.1f} KB servidos | "
+                  f"{server.rejected} rechazados por capacidad")
+
+
+if __name__ == "__main__":
+    main()
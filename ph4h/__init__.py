@@ -0,0 +1 @@
+"""Herramientas compartidas para verificar los servidores de terminología PH4H."""
@@ -0,0 +1,749 @@
+"""
+Checks de CodeSystem, ValueSet y ConceptMap sobre un servidor FHIR.
+
+Cada check escribe sus líneas [OK]/[WARN]/[FAIL] con `emit` (print por
+defecto) y devuelve el código de salida del script original (0 ó 1), de
+modo que check-*.py y sweep.py producen exactamente el mismo reporte.
+
+Con un `cache` (ver ph4h.history) cada resultado por recurso se registra,
+y los ValueSet/ConceptMap cuyo meta.versionId/lastUpdated no cambió desde
+la última verificación OK reutilizan su línea sin volver a consultarse.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .client import FhirClient, dec, enc, env, rtype
+from .expansion import ExpansionError, ExpansionStats, iter_pages, iter_stream
+from .package import KINDS, artifact_of, index_package
+from .fhirjson import Bundle, ConceptMapSummary, Expansion, Parameters
+from .search import SearchError, iter_entries
+
+# ---- Config (compatibles con los scripts originales) ----
+CONCURRENCY = max(1, int(env("CONCURRENCY", "4")))  # artefactos simultáneos por check
+EXPECTED_TOTAL = int(env("EXPECTED_TOTAL", "24"))
+CS_BATCH = int(env("CS_BATCH", "0"))  # 1 = existencia y $lookup en un Bundle batch
+
+VS_FULL = int(env("VS_FULL", "0"))  # 1 = recorrer la expansión completa de cada ValueSet
+VS_EXPECT = env("VS_EXPECT", "")    # JSON (inline o archivo) con el tamaño esperado por ValueSet
+CM_COVERAGE = int(env("CM_COVERAGE", "0"))  # 1 = traducir TODOS los códigos de cada ConceptMap
+CM_LEAN = int(env("CM_LEAN", "0"))  # 1 = listado con _elements/_count/name y sin GET repetidos
+CM_PAGE = max(1, int(env("CM_PAGE", "1000")))  # _count del listado en modo lean
+CM_ELEMENTS = "id,meta,name,url,sourceUri,sourceCanonical,targetUri,targetCanonical"
+
+# CodeSystem URLs
+CS_SNOMED  = env("CS_SNOMED",  "http://snomed.info/sct")
+CS_CIE10   = env("CS_CIE10",   "http://hl7.org/fhir/sid/icd-10")
+CS_CIE11   = env("CS_CIE11",   "http://id.who.int/icd/release/11/mms")
+CS_LOCAL   = env("CS_LOCAL",   "http://racsel.org/connectathon")
+CS_RACSEL  = env("CS_RACSEL",  "http://racsel.org/connectathon")
+CS_PREQUAL = env("CS_PREQUAL", "http://smart.who.int/pcmt-vaxprequal/CodeSystem/PreQualProductIDs")
+
+# Códigos para $lookup
+CODE_SNOMED  = env("CODE_SNOMED",  "96309000")
+CODE_CIE10   = env("CODE_CIE10",   "E79.0")
+CODE_CIE11   = env("CODE_CIE11",   "XM0N24")
+CODE_LOCAL   = env("LOCAL_CODE",   "LOCAL123")
+CODE_RACSEL  = env("CODE_RACSEL",  "A10")
+CODE_PREQUAL = env("CODE_PREQUAL", "PolioVaccineInactivatedIProduct8b13b5fcf5e9268b345775be7c3f077c")
+
+# Defaults de reintentos de cada script original
+CS_RETRIES, CS_SLEEP_RETRY = "1", "1"
+VS_RETRIES, VS_SLEEP_RETRY = "2", "2"
+CM_RETRIES, CM_SLEEP_RETRY = "1", "1"
+
+
+class NoCache:
+    """Cache nulo: nunca reutiliza ni guarda (modo de los scripts sueltos)."""
+
+    def reuse(self, kind: str, key: str, meta):
+        return None
+
+    def store(self, kind: str, key: str, meta, status: str, line: str):
+        pass
+
+
+def lstrip_spaces(s: str) -> str:
+    return s[len(s) - len(s.lstrip()):]
+
+def count_total(obj) -> int:
+    """Total de un search con _summary=count (usualmente en root)."""
+    if not isinstance(obj, dict):
+        return 0
+    # FHIR Bundle suele tener 'total' en la raíz
+    t = obj.get("total")
+    if isinstance(t, int):
+        return t
+    try:
+        # fallback muy defensivo
+        entry0 = (obj.get("entry") or [])[0]
+        res = (entry0 or {}).get("resource") or {}
+        t2 = res.get("total")
+        return int(t2) if t2 is not None else 0
+    except Exception:
+        return 0
+
+
+# ----------------- Operaciones -----------------
+# URLs relativas a la base de cada consulta de los checks; load-test.py las
+# reutiliza para generar carga con las mismas operaciones.
+def exists_query(system: str) -> str:
+    return f"CodeSystem?url={enc(system)}&_summary=count"
+
+def lookup_query(system: str, code: str) -> str:
+    # %24lookup para ser robustos (aunque en Python no es necesario como en Bash)
+    return f"CodeSystem/%24lookup?system={enc(system)}&code={enc(code)}"
+
+def expand_query(key: str, val: str) -> str:
+    """$expand de un solo concepto (existencia y total) por canonical (key="url") o por id."""
+    if key == "url":
+        return f"ValueSet/%24expand?url={enc(val)}&_count=1&_elements=expansion.total,expansion.contains"
+    return f"ValueSet/{enc(val)}/%24expand?_count=1&_elements=expansion.total,expansion.contains"
+
+def first_concept_query(vs_url: str) -> str:
+    return f"ValueSet/%24expand?url={enc(vs_url)}&_count=1"
+
+def translate_query(url_cm: str, code: str, system: str, source: str, target: str) -> str:
+    return (f"ConceptMap/%24translate?url={enc(url_cm)}&code={enc(code)}&system={enc(system)}"
+            f"&source={enc(source)}&target={enc(target)}")
+
+
+# ----------------- CodeSystem -----------------
+def load_cs_checks(spec: str = None):
+    """
+    Pares CodeSystem/código a verificar: [{"label", "system", "code"}, ...].
+
+    `spec` (o CS_CHECKS) es JSON inline o la ruta a un archivo JSON; sin él
+    se usan las variables CS_*/CODE_* de siempre. Una entrada sin "system"
+    o sin "code" toma el CodeSystem/código local del servidor.
+    """
+    spec = spec or env("CS_CHECKS", "")
+    if not spec:
+        return [{"label": "SNOMED", "system": CS_SNOMED, "code": CODE_SNOMED},
+                {"label": "CIE10", "system": CS_CIE10, "code": CODE_CIE10},
+                {"label": "CIE11", "system": CS_CIE11, "code": CODE_CIE11},
+                {"label": "LOCAL"},
+                {"label": "RACSEL", "system": CS_RACSEL, "code": CODE_RACSEL},
+                {"label": "PREQUAL", "system": CS_PREQUAL, "code": CODE_PREQUAL}]
+    if isinstance(spec, list):
+        return spec
+    text = spec if spec.lstrip().startswith("[") else Path(spec).read_text(encoding="utf-8")
+    return json.loads(text)
+
+
+def _exists_result(label: str, url: str, js, why: str):
+    if count_total(js) >= 1:
+        return "OK", f"[OK] CodeSystem {label} presente ({url})"
+    return "FAIL", f"[FAIL] CodeSystem {label} NO encontrado ({url}){why}"
+
+
+def _lookup_result(label: str, system: str, code: str, r, why: str):
+    params = Parameters.decode(r)
+    if not params:
+        return "FAIL", f"[FAIL] $lookup {label} ({system}|{code}){why}"
+    # Éxito adicional: que traiga algún parámetro útil (display/name/code)
+    if params.has("display", "name", "code"):
+        return "OK", f"[OK] $lookup {label} ({code})"
+    return "WARN", f"[WARN] $lookup {label} sin display/name (aceptado)"
+
+
+def batch_get(client: FhirClient, base: str, rel_urls):
+    """
+    Resuelve varios GET relativos (p.ej. "CodeSystem?url=...") en un solo
+    Bundle batch. Devuelve un recurso (o None) por URL, en el mismo orden,
+    o None entero si el servidor no acepta batch.
+    """
+    bundle = {"resourceType": "Bundle", "type": "batch",
+              "entry": [{"request": {"method": "GET", "url": u}} for u in rel_urls]}
+    resp = client.post_json(base, bundle)
+    entries = (resp or {}).get("entry") or []
+    if rtype(resp) != "Bundle" or resp.get("type", "batch-response") != "batch-response" \
+            or len(entries) != len(rel_urls):
+        return None
+    out = []
+    for e in entries:
+        status = str(((e or {}).get("response") or {}).get("status") or "")
+        res = (e or {}).get("resource")
+        out.append(res if status.startswith("2") and isinstance(res, dict) else None)
+    return out
+
+
+def check_codesystems(client: FhirClient, base: str, cs_local: str = None, code_local: str = None,
+                      emit=print, cache=None, cs_checks=None, batch: bool = None) -> int:
+    """
+    Existencia de CodeSystems y $lookup.
+
+    Por defecto corta en el primer FAIL, como check-cs.py. Con batch (o
+    CS_BATCH=1) manda todas las consultas en un Bundle batch (con GETs
+    concurrentes si el servidor no lo acepta) y reporta todos los resultados.
+    """
+    base = base.rstrip("/")
+    cache = cache or NoCache()
+    cs_local = cs_local or CS_LOCAL
+    code_local = code_local or CODE_LOCAL
+    batch = CS_BATCH if batch is None else batch
+
+    systems = [(c["label"], c.get("system") or cs_local, c.get("code") or code_local)
+               for c in load_cs_checks(cs_checks)]
+    queries = ([exists_query(url) for _label, url, _code in systems] +
+               [lookup_query(url, code) for _label, url, code in systems])
+
+    def evaluate(i: int, js, why: str):
+        label, url, code = systems[i % len(systems)]
+        if i < len(systems):
+            status, line = _exists_result(label, url, js, why)
+            cache.store("CodeSystem", url, None, status, line)
+        else:
+            status, line = _lookup_result(label, url, code, js, why)
+            cache.store("$lookup", f"{url}|{code}", None, status, line)
+        emit(line)
+        return status != "FAIL"
+
+    emit(f"[INFO] Base: {base}")
+
+    if not batch:
+        # 1) Existencia de CodeSystems, 2) Lookups; secuencial, corta en el primer FAIL
+        for i, q in enumerate(queries):
+            js = client.get_json(f"{base}/{q}")
+            if not evaluate(i, js, client.why()):
+                return 1
+        emit("[OK] Validación de CodeSystems y $lookup completada.")
+        return 0
+
+    results = batch_get(client, base, queries)
+    if results is not None:
+        emit(f"[INFO] Bundle batch: {len(queries)} consultas en 1 request")
+        results = [(js, "") for js in results]
+    else:
+        emit(f"[INFO] El servidor no acepta batch{client.why()}; {len(queries)} GETs concurrentes")
+
+        def fetch(q):
+            js = client.get_json(f"{base}/{q}")
+            return js, client.why()
+
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            results = list(pool.map(fetch, queries))
+
+    fails = sum(0 if evaluate(i, js, why) else 1 for i, (js, why) in enumerate(results))
+    if fails:
+        emit(f"[FAIL] Validación de CodeSystems y $lookup: {fails} de {len(queries)} con FAIL")
+        return 1
+    emit("[OK] Validación de CodeSystems y $lookup completada.")
+    return 0
+
+
+# ----------------- ValueSet -----------------
+def load_vs_expectations(spec: str = None) -> dict:
+    """
+    Tamaños esperados de expansión por ValueSet (canonical o "ValueSet/<id>"):
+    {"<vs>": 120} exige exactamente 120; {"<vs>": {"min": 10, "max": 500}} un rango.
+    `spec` (o VS_EXPECT) es JSON inline o la ruta a un archivo JSON.
+    """
+    spec = spec or VS_EXPECT
+    if not spec:
+        return {}
+    if isinstance(spec, dict):
+        return spec
+    text = spec if spec.lstrip().startswith("{") else Path(spec).read_text(encoding="utf-8")
+    return json.loads(text)
+
+
+def _expected_problem(n: int, expected):
+    """Descripción de por qué `n` no cumple lo esperado, o "" si cumple."""
+    if expected is None:
+        return ""
+    if not isinstance(expected, dict):
+        expected = {"total": expected}
+    if "total" in expected and n != int(expected["total"]):
+        return f"se esperaban {expected['total']}"
+    if "min" in expected and n < int(expected["min"]):
+        return f"se esperaban ≥ {expected['min']}"
+    if "max" in expected and n > int(expected["max"]):
+        return f"se esperaban ≤ {expected['max']}"
+    return ""
+
+
+def check_valuesets(client: FhirClient, base: str, emit=print, cache=None, full: bool = None,
+                    expectations=None) -> int:
+    """
+    Lista todos los ValueSet, valida EXPECTED_TOTAL y exige ≥ 1 concepto en cada $expand.
+
+    Con full (o VS_FULL=1) recorre en streaming la expansión completa de cada
+    ValueSet: valida el tamaño contra expansion.total y VS_EXPECT, y reporta
+    duplicados, inactivos, un digest del contenido y conceptos por segundo.
+    """
+    base = base.rstrip("/")
+    cache = cache or NoCache()
+    full = VS_FULL if full is None else full
+    expectations = load_vs_expectations(expectations)
+    kind = "ValueSetFull" if full else "ValueSet"
+    emit(f"[INFO] Base: {base}")
+
+    # 0) Ping rápido
+    meta = client.get_json(f"{base}/metadata")
+    if not meta or rtype(meta) != "CapabilityStatement":
+        emit(f"[FAIL] El servidor no responde /metadata correctamente{client.why()}"); return 1
+    emit("[OK] metadata")
+
+    def expand_one(item):
+        """$expand de un ValueSet; devuelve (label, ok, línea de salida)."""
+        key, val, meta = item
+        label = val if key == "url" else f"ValueSet/{val}"
+        prev = cache.reuse(kind, label, meta)
+        if prev:
+            return label, prev[0] != "FAIL", prev[1]
+        label, ok, line = _expand_full(key, val) if full else _expand(key, val)
+        cache.store(kind, label, meta, "FAIL" if not ok else "WARN" if line.startswith("[WARN]") else "OK", line)
+        return label, ok, line
+
+    totals = {"concepts": 0, "seconds": 0.0}
+
+    def _expand_full(key, val):
+        label = val if key == "url" else f"ValueSet/{val}"
+        st = ExpansionStats()
+        info = {}
+        try:
+            for c in iter_stream(client, base, vs_url=val if key == "url" else None,
+                                 vs_id=val if key == "id" else None, stats=info):
+                st.add(c)
+        except ExpansionError as e:
+            return label, False, f"[FAIL] {label} -> {e}"
+        st.stop()
+        totals["concepts"] += st.concepts
+        totals["seconds"] += st.seconds
+
+        detail = (f"{label} conceptos={st.concepts} inactivos={st.inactive} duplicados={st.duplicates} "
+                  f"páginas={info['pages']} sha256={st.digest[:16]} ({st.rate:.0f} conceptos/s)")
+        if not st.concepts:
+            return label, False, f"[FAIL] {label} (sin conceptos)"
+        if info["total"] is not None and info["total"] != st.concepts:
+            return label, False, f"[FAIL] {detail} (expansion.total={info['total']})"
+        problem = _expected_problem(st.concepts, expectations.get(label))
+        if problem:
+            return label, False, f"[FAIL] {detail} ({problem})"
+        if st.duplicates:
+            return label, True, f"[WARN] {detail} (duplicados: {', '.join(st.duplicate_codes)})"
+        if st.inactive:
+            return label, True, f"[WARN] {detail}"
+        return label, True, f"[OK] {detail}"
+
+    def _expand(key, val):
+        exp_u = f"{base}/{expand_query(key, val)}"
+        label = val if key == "url" else f"ValueSet/{val}"
+
+        exp = client.get_as(exp_u, Expansion.parse)
+        if not exp:
+            return label, False, f"[FAIL] {label} -> respuesta inválida{client.why()}"
+
+        if (exp.total or 0) > 0 or exp.size > 0:
+            return label, True, f"[OK] {label}"
+        return label, False, f"[FAIL] {label} (sin conceptos)"
+
+    # 1) Listar TODOS los ValueSet (paginación) y recolectar id/url. Si la
+    # primera página ya anuncia EXPECTED_TOTAL, los $expand arrancan mientras
+    # se siguen pidiendo páginas; la salida se emite igual, en orden, al final.
+    emit("[INFO] Listando ValueSet…")
+    valuesets = []  # cada item: (("url", <canonical>, meta) o ("id", <id>, meta), future o None)
+    total_listados = 0
+    info = {}
+    pool = ThreadPoolExecutor(max_workers=CONCURRENCY)
+    try:
+        try:
+            for res in iter_entries(client, f"{base}/ValueSet?_count=200&_elements=id,url,meta", stats=info):
+                total_listados += 1
+                if res.get("resourceType") != "ValueSet":
+                    continue
+                url = (res.get("url") or "").strip()
+                vid = (res.get("id") or "").strip()
+                meta = res.get("meta") or {}
+                item = ("url", url, meta) if url else ("id", vid, meta) if vid else None
+                if item:
+                    early = info["total"] == EXPECTED_TOTAL
+                    valuesets.append((item, pool.submit(expand_one, item) if early else None))
+        except SearchError as e:
+            emit(f"[FAIL] Error listando ValueSet{e.why}"); return 1
+
+        emit(f"[OK] ValueSet listados: {total_listados}")
+
+        # 2) Validar que el total sea EXACTAMENTE EXPECTED_TOTAL
+        if total_listados != EXPECTED_TOTAL:
+            emit(f"[FAIL] Se encontraron {total_listados} ValueSet(s); se requieren exactamente {EXPECTED_TOTAL}.")
+            return 1
+        emit(f"[OK] Total de ValueSet = {EXPECTED_TOTAL}")
+
+        # 3) Expandir cada VS y exigir ≥ 1 concepto
+        emit("[INFO] Recorriendo la expansión completa de cada ValueSet…" if full
+             else "[INFO] Expandiendo cada ValueSet (≥ 1 concepto)…")
+
+        vs_total = 0
+        vs_ok = 0
+        fails = []
+
+        # Los $expand corren en paralelo (CONCURRENCY), pero los resultados se
+        # emiten en el orden del listado: la salida es idéntica a la secuencial.
+        futures = [fut or pool.submit(expand_one, item) for item, fut in valuesets]
+        for fut in futures:
+            label, ok, line = fut.result()
+            vs_total += 1
+            emit(line)
+            if ok:
+                vs_ok += 1
+            else:
+                fails.append(label)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    emit("--------------------------------------------")
+    emit(f"[RESUMEN] ValueSet totales: {vs_total} | OK: {vs_ok} | FAIL: {len(fails)}")
+    if full and totals["seconds"] > 0:
+        emit(f"[INFO] Conceptos recorridos: {totals['concepts']} "
+             f"({totals['concepts'] / totals['seconds']:.0f} conceptos/s por ValueSet)")
+
+    if fails:
+        emit("[DETALLE] ValueSet que fallaron:")
+        for f in fails:
+            emit(f)
+        return 1
+
+    emit(f"[OK] Todos los ValueSet ({vs_total}) expanden completos" if full
+         else f"[OK] Todos los ValueSet ({vs_total}) expanden con ≥ 1 concepto")
+    return 0
+
+
+# ----------------- ConceptMap -----------------
+def valueset_metas(client: FhirClient, base: str) -> dict:
+    """{url: meta} de los ValueSet del servidor (un listado con _elements); {} si el listado falla."""
+    metas = {}
+    try:
+        for res in iter_entries(client, f"{base}/ValueSet?_elements=url,meta&_count={CM_PAGE}"):
+            url = (res.get("url") or "").strip()
+            if url:
+                # Con varias versiones del mismo url, cualquiera que cambie cuenta
+                metas.setdefault(url, []).append(res.get("meta") or {})
+    except SearchError:
+        return {}
+    return {url: {k: ",".join(sorted(m.get(k) or "" for m in ms)) for k in ("versionId", "lastUpdated")}
+            for url, ms in metas.items()}
+
+
+def chained_meta(meta, source_meta) -> dict:
+    """
+    meta de un ConceptMap para la cache, encadenada con la de su ValueSet
+    origen: cambia si cambia cualquiera de los dos. Vacía (no se reutiliza)
+    si alguna de las dos no vino.
+    """
+    meta, source_meta = meta or {}, source_meta or {}
+    if not (meta.get("versionId") or meta.get("lastUpdated")) or \
+            not (source_meta.get("versionId") or source_meta.get("lastUpdated")):
+        return {}
+    return {k: f"{meta.get(k) or ''}|{source_meta.get(k) or ''}" for k in ("versionId", "lastUpdated")}
+
+
+def check_conceptmaps(client: FhirClient, base: str, emit=print, cache=None, coverage: bool = None,
+                      lean: bool = None) -> int:
+    """
+    Traduce el primer concepto de cada ConceptMap cuyo name empieza con 'VS'.
+
+    Con coverage (o CM_COVERAGE=1) recorre la expansión completa del ValueSet
+    origen por páginas y traduce cada código, reportando mapeados, sin mapeo
+    y errores por ConceptMap.
+
+    Con lean (o CM_LEAN=1) el listado pide solo CM_ELEMENTS, de a CM_PAGE y
+    filtrado por name=VS en el servidor, y usa esos campos en vez de volver a
+    leer cada candidato; si el servidor rechaza el filtro o _elements se
+    reintenta sin ellos, y si ignora _elements solo se pierde el ahorro.
+
+    Con un `cache` el resultado de cada candidato se guarda con la meta del
+    ConceptMap encadenada con la de su ValueSet origen (un listado extra de
+    ValueSet por corrida), así que editar cualquiera de los dos lo re-verifica.
+    Un cambio en el CodeSystem destino no se ve hasta el próximo ciclo completo.
+    """
+    base = base.rstrip("/")
+    cache = cache or NoCache()
+    debug = client.debug
+    coverage = CM_COVERAGE if coverage is None else coverage
+    lean = CM_LEAN if lean is None else lean
+    kind = "ConceptMapCoverage" if coverage else "ConceptMap"
+    # Tráfico de este check: lo que hizo su cliente entre el inicio y el final (las
+    # métricas por servidor mezclan los demás checks y barridos del proceso)
+    requests0, bytes0 = client.traffic()
+
+    # ----------------- 0) Ping -----------------
+    meta = client.get_json(f"{base}/metadata")
+    if not meta or rtype(meta) != "CapabilityStatement":
+        emit(f"[FAIL] /metadata no responde en {base}{client.why()}"); return 1
+    emit(f"[OK] metadata en {base}")
+    # Solo hace falta si hay cache de verdad (sweep con historial)
+    source_metas = None if isinstance(cache, NoCache) else valueset_metas(client, base)
+
+    def resolve_name(item):
+        """(id, name, meta, recurso, source) del listado; si el search no trajo name, lo lee del recurso."""
+        cid, name, meta, res, source = item
+        if name: return cid, name, meta, res, source
+        cm = client.get_as(f"{base}/ConceptMap/{enc(cid)}", ConceptMapSummary.parse)
+        if cm: return cid, cm.name, cm.meta or meta, cm, cm.source or source
+        return cid, "", meta, None, source
+
+    def translate_one(item):
+        """Cadena GET ConceptMap → $expand → $translate de un candidato; devuelve (estado, línea)."""
+        cid, _name, meta, cm, source = item
+        if source_metas is not None:
+            meta = chained_meta(meta, source_metas.get(source))
+        prev = cache.reuse(kind, cid, meta)
+        if prev: return prev
+        status, line = _translate(cid, cm)
+        cache.store(kind, cid, meta, status, line)
+        return status, line
+
+    def _translate(cid, cm=None):
+        # El ConceptMap ya leído (o listado con url/source/target) no se vuelve a pedir
+        if not (cm and cm.complete):
+            cm = client.get_as(f"{base}/ConceptMap/{enc(cid)}", ConceptMapSummary.parse)
+        if not cm:
+            # solo fallos de candidatos VS cuentan como FAIL
+            return "FAIL", f"[FAIL] GET {base}/ConceptMap/{cid}{client.why()}"
+
+        url_cm, src_uri, tgt_uri = cm.url, cm.source, cm.target
+        if not url_cm or not src_uri or not tgt_uri:
+            return "FAIL", f"[FAIL] GET {base}/ConceptMap/{cid}  (sin url/source/target)"
+
+        if coverage:
+            return _coverage(cid, url_cm, src_uri, tgt_uri)
+
+        exp = client.get_as(f"{base}/{first_concept_query(src_uri)}", Expansion.parse)
+        if not exp:
+            return "FAIL", f"[FAIL] GET {base}/ValueSet/$expand?url={src_uri}&_count=1{client.why()}"
+
+        if not exp.concepts:
+            return "FAIL", f"[FAIL] GET {base}/ValueSet/$expand?url={src_uri}&_count=1  (sin conceptos)"
+
+        first = exp.concepts[0]
+        code = (first.code or "").strip()
+        system = (first.system or "").strip()
+        if not code or not system:
+            return "FAIL", f"[FAIL] GET {base}/ValueSet/$expand?url={src_uri}&_count=1  (primer concepto sin code/system)"
+
+        tr_url = f"{base}/{translate_query(url_cm, code, system, src_uri, tgt_uri)}"
+        tres = client.get_as(tr_url, Parameters.parse)
+
+        # Prefijo según resultado
+        if not tres:
+            return "FAIL", f"[FAIL] GET {dec(tr_url)}{client.why()}"
+
+        if tres.has("match"): return "OK", f"[OK] GET {dec(tr_url)}"
+        return "WARN", f"[WARN] GET {dec(tr_url)}"
+
+    def _coverage(cid, url_cm, src_uri, tgt_uri):
+        """Traduce toda la expansión de src_uri, página por página; devuelve (estado, línea)."""
+        mapped = unmapped = errors = 0
+        reason = ""  # why() del primer $translate fallido
+        unmapped_codes = []  # solo los primeros, para DEBUG
+        use_batch = True
+
+        def translate(q):
+            # why() es por hilo: se lee en el worker que hizo el request
+            tres = client.get_as(f"{base}/{q}", Parameters.parse)
+            return tres, "" if tres else client.why()
+        try:
+            for concepts in iter_pages(client, base, src_uri):
+                queries = [translate_query(url_cm, str(c.code), c.system or "", src_uri, tgt_uri)
+                           for c in concepts]
+                results = batch_get(client, base, queries) if use_batch else None
+                if results is None:
+                    # Sin batch (o rechazado una vez): $translate concurrentes para el resto del mapa
+                    use_batch = False
+                    results = translate_pool.map(translate, queries)
+                else:
+                    results = ((Parameters.decode(r), "") for r in results)
+                for c, (tres, why) in zip(concepts, results):
+                    if not tres:
+                        errors += 1
+                        reason = reason or why
+                    elif tres.has("match"):
+                        mapped += 1
+                    else:
+                        unmapped += 1
+                        if len(unmapped_codes) < 10: unmapped_codes.append(str(c.code))
+        except ExpansionError as e:
+            return "FAIL", f"[FAIL] GET {dec(e.url)}  ({e})"
+
+        total = mapped + unmapped + errors
+        pct = 100.0 * mapped / total if total else 0.0
+        detail = (f"ConceptMap/{cid} ({url_cm}) cobertura {mapped}/{total} ({pct:.1f}%) | "
+                  f"sin mapeo: {unmapped} | errores: {errors}{reason}")
+        if debug and unmapped_codes:
+            emit(f"[DEBUG] {cid} sin mapeo (primeros): {', '.join(unmapped_codes)}")
+        if not total:
+            return "FAIL", f"[FAIL] {detail}  (sin conceptos)"
+        if errors or not mapped:
+            return "FAIL", f"[FAIL] {detail}"
+        if unmapped:
+            return "WARN", f"[WARN] {detail}"
+        return "OK", f"[OK] {detail}"
+
+    def chain(item):
+        """Nombre y, si es candidato VS, su cadena de traducción: (id, name, meta, recurso, (estado, línea) o None)."""
+        cid, name, meta, cm, source = resolve_name(item)
+        if not lstrip_spaces(name).startswith("VS"): return cid, name, meta, cm, None
+        return cid, name, meta, cm, translate_one((cid, name, meta, cm, source))
+
+    # ----------------- 1) Listar ConceptMaps (SIN filtros) -----------------
+    # Las páginas llegan en paralelo cuando el servidor pagina por offset, y
+    # cada ConceptMap entra a su cadena (nombre → traducción) apenas se lista;
+    # la salida se emite recién al final, en el orden del listado.
+    if lean:
+        listings = [(f"name=VS, _elements, _count={CM_PAGE}", f"?name=VS&_elements={CM_ELEMENTS}&_count={CM_PAGE}"),
+                    (f"_elements, _count={CM_PAGE}", f"?_elements={CM_ELEMENTS}&_count={CM_PAGE}"),
+                    ("SIN filtros", "")]
+    else:
+        listings = [("SIN filtros", "")]
+    pool = ThreadPoolExecutor(max_workers=CONCURRENCY)
+    # Los $translate sueltos de cobertura van a un único pool para todo el check (no uno por mapa
+    # dentro de cada worker): a lo sumo CONCURRENCY cadenas + CONCURRENCY $translate en vuelo
+    translate_pool = ThreadPoolExecutor(max_workers=CONCURRENCY) if coverage else None
+    try:
+        for i, (desc, query) in enumerate(listings):
+            emit(f"[INFO] Listando ConceptMap ({desc})…")
+            chains, ignored, info = [], False, {}
+            try:
+                for res in iter_entries(client, f"{base}/ConceptMap{query}", stats=info):
+                    cm = ConceptMapSummary.decode(res)
+                    if cm:
+                        if cm.id: chains.append(pool.submit(chain, (cm.id, cm.name, cm.meta, cm if lean else None,
+                                                                     cm.source)))
+                        ignored = ignored or cm.grouped
+                break
+            except SearchError as e:
+                # Un filtro rechazado falla en la primera página; un corte a mitad del listado es FAIL
+                if info.get("pages") or i + 1 == len(listings):
+                    emit(f"[FAIL] Error listando ConceptMap{e.why}"); return 1
+                emit(f"[INFO] Listado ({desc}) rechazado{e.why}; reintentando")
+        if lean and ignored:
+            emit("[INFO] El servidor ignora _elements: el listado trae los ConceptMap completos")
+        emit(f"[OK] ConceptMaps listados: {len(chains)}")
+
+        # ----------------- 2) Selección VS (sin marcar FAIL los demás) -----------------
+        results = [fut.result() for fut in chains]
+        for cid, name, meta, cm, result in results:
+            if result is None and debug:
+                if name: emit(f"[DEBUG] skip {cid} name='{name}' (no comienza por 'VS')")
+                else: emit(f"[DEBUG] skip {cid} name='{name}' (no VS o sin acceso)")
+        translated = [r[4] for r in results if r[4] is not None]
+        emit(f"[INFO] ConceptMaps con name iniciando en 'VS': {len(translated)}")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if translate_pool: translate_pool.shutdown(wait=True, cancel_futures=True)
+
+    # ----------------- 3) Traducir candidatos VS -----------------
+    # Cada cadena es secuencial; las cadenas corren en paralelo y se emiten en el orden del listado.
+    oks = fails = warns = 0
+    for status, line in translated:
+        emit(line)
+        if status == "OK": oks += 1
+        elif status == "WARN": warns += 1
+        else: fails += 1
+
+    if lean or int(env("HTTP_STATS", "0")):
+        # Fuera de lean solo con HTTP_STATS: el reporte por defecto no cambia
+        requests1, bytes1 = client.traffic()
+        emit(f"[INFO] Tráfico ConceptMap{' (lean)' if lean else ''}: {requests1 - requests0} requests | "
+             f"{(bytes1 - bytes0) / 1024:.1f} KB")
+    emit("--------------------------------------------")
+    emit(f"[RESUMEN] VS {'cobertura completa' if coverage else 'traducidos'}: OK={oks} | WARN={warns} | FAIL={fails}")
+    # Solo candidatos VS afectan OK/WARN/FAIL. Los no-VS no se cuentan.
+    return 1 if fails > 0 else 0
+
+
+# ----------------- Paquete vs servidor -----------------
+def _sample(codes, n: int = 5) -> str:
+    codes = sorted(codes)
+    return ", ".join(codes[:n]) + ("…" if len(codes) > n else "")
+
+
+def check_package(client: FhirClient, base: str, package, emit=print, index: dict = None) -> int:
+    """
+    Compara un paquete .tgz con lo que tiene el servidor: artefactos
+    faltantes, con otra versión o con códigos de menos/de más, y artefactos
+    del mismo espacio de canonicals que el servidor tiene y el paquete no.
+    """
+    base = base.rstrip("/")
+    index = index if index is not None else index_package(package)
+    emit(f"[INFO] Base: {base}")
+    emit(f"[INFO] Paquete {package}: {len(index)} artefactos, "
+         f"{sum(len(a.codes) for a in index.values())} códigos")
+
+    def server_codes(a, res):
+        """Códigos del servidor; un CodeSystem sin concept[] (content=not-present) se lee de su expansión implícita."""
+        codes = artifact_of(res).codes
+        if codes or a.kind != "CodeSystem" or not a.codes:
+            return codes
+        return frozenset(str(c.code) for page in iter_pages(client, base, f"{a.url}?fhir_vs")
+                         for c in page if (c.system or a.url) == a.url)
+
+    def compare(a):
+        """(estado, línea) de un artefacto del paquete contra el servidor."""
+        bundle = client.get_as(f"{base}/{a.kind}?url={enc(a.url)}", Bundle.parse)
+        if not bundle:
+            return "ERROR", f"[FAIL] {a.kind} {a.url} -> respuesta inválida{client.why()}"
+        found = [r for r in bundle.resources if r.get("resourceType") == a.kind and (r.get("url") or "").strip() == a.url]
+        if not found:
+            return "MISSING", f"[FAIL] {a.kind} {a.url} no está en el servidor"
+        res = next((r for r in found if (r.get("version") or "") == a.version), found[0])
+        try:
+            codes = server_codes(a, res)
+        except ExpansionError as e:
+            return "ERROR", f"[FAIL] {a.kind} {a.url} -> {e}"
+
+        missing, extra = a.codes - codes, codes - a.codes
+        notes = []
+        version = res.get("version") or ""
+        if version != a.version:
+            notes.append(f"versión servidor={version or '-'} ≠ paquete={a.version or '-'}")
+        if missing:
+            notes.append(f"faltan {len(missing)} códigos: {_sample(missing)}")
+        if extra:
+            notes.append(f"{len(extra)} códigos extra: {_sample(extra)}")
+        if missing:
+            return "CODES", f"[FAIL] {a.kind} {a.url} {' | '.join(notes)}"
+        if notes:
+            return "OUTDATED" if version != a.version else "EXTRA_CODES", f"[WARN] {a.kind} {a.url} {' | '.join(notes)}"
+        return "OK", f"[OK] {a.kind} {a.url} (v{a.version or '-'}, {len(a.codes)} códigos)"
+
+    # Artefactos del servidor bajo los mismos prefijos de canonical que el paquete
+    prefixes = {a.url.rsplit("/", 1)[0] + "/" for a in index.values()}
+
+    def extras(kind):
+        out = []
+        next_url = f"{base}/{kind}?_count=1000&_elements=url,version"
+        while next_url:
+            page = client.get_as(next_url, Bundle.parse)
+            if not page:
+                return None
+            for res in page.resources:
+                url = (res.get("url") or "").strip()
+                if url and (kind, url) not in index and url.rsplit("/", 1)[0] + "/" in prefixes:
+                    out.append(url)
+            next_url = page.next
+        return out
+
+    counts = {}
+    artifacts = sorted(index.values(), key=lambda a: (KINDS.index(a.kind), a.url))
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        for status, line in pool.map(compare, artifacts):
+            counts[status] = counts.get(status, 0) + 1
+            emit(line)
+        extra_urls = 0
+        for kind, urls in zip(KINDS, pool.map(extras, KINDS)):
+            if urls is None:
+                emit(f"[WARN] No se pudo listar {kind} para buscar artefactos extra{client.why()}")
+                continue
+            for url in sorted(set(urls)):
+                emit(f"[WARN] {kind} {url} está en el servidor pero no en el paquete")
+                extra_urls += 1
+
+    emit("--------------------------------------------")
+    emit(f"[RESUMEN] Artefactos: {len(artifacts)} | OK: {counts.get('OK', 0)} | "
+         f"faltantes: {counts.get('MISSING', 0)} | desactualizados: {counts.get('OUTDATED', 0)} | "
+         f"con códigos faltantes: {counts.get('CODES', 0)} | con códigos extra: {counts.get('EXTRA_CODES', 0)} | "
+         f"errores: {counts.get('ERROR', 0)} | extra en el servidor: {extra_urls}")
+    return 1 if counts.get("MISSING") or counts.get("CODES") or counts.get("ERROR") else 0
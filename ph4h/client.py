@@ -0,0 +1,614 @@
+"""Cliente HTTP compartido por los checks FHIR (check-cs/vs/cm y sweep.py)."""
+import os
+import random
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util import make_headers
+
+from .fhirjson import loads
+from .metrics import Metrics
+
+HEADERS = {"Accept": "application/fhir+json"}
+
+# Motivos de corte rápido que los checks agregan a sus líneas [FAIL]
+CIRCUIT_OPEN = " (circuit open)"
+BUDGET_EXHAUSTED = " (presupuesto agotado)"
+
+# gzip/deflate siempre; br (y zstd) solo si urllib3 puede decodificarlos,
+# es decir, si están instalados brotli/zstandard.
+ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+
+
+def env(name, default):
+    return os.environ.get(name, default)
+
+def enc(s: str) -> str:
+    return urllib.parse.quote(s, safe="")
+
+def dec(s: str) -> str:
+    return urllib.parse.unquote(s)
+
+def rtype(obj) -> str:
+    return obj.get("resourceType", "") if isinstance(obj, dict) else ""
+
+def host_of(url: str) -> str:
+    return urllib.parse.urlsplit(url).netloc
+
+def host_port(url: str) -> str:
+    """host:puerto con el puerto por defecto del esquema (clave de los pools)."""
+    u = urllib.parse.urlsplit(url)
+    return f"{u.hostname}:{u.port or (443 if u.scheme == 'https' else 80)}"
+
+def overloaded(status: int) -> bool:
+    """¿La respuesta pide bajar la carga? (429 y 5xx)"""
+    return status == 429 or status >= 500
+
+def retry_after(response) -> float:
+    """Segundos del header Retry-After (en segundos o fecha HTTP); 0 si no viene."""
+    value = (response.headers.get("Retry-After") or "").strip() if response is not None else ""
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+AIMD_START = float(env("AIMD_START", "2"))    # requests en vuelo por host al arrancar
+AIMD_MAX = float(env("AIMD_MAX", "16"))       # techo del límite adaptativo por host
+AIMD_BETA = float(env("AIMD_BETA", "0.5"))    # factor de recorte ante sobrecarga
+AIMD_SLOW = float(env("AIMD_SLOW", "4"))      # latencia "sana": hasta N veces la mínima vista (+50ms)
+AIMD_HOLD = float(env("AIMD_HOLD", "20"))     # latencias típicas sin subir después de un recorte
+
+
+class AdaptiveLimit:
+    """
+    Tope de requests en vuelo de un host que se ajusta solo (AIMD): cada
+    respuesta con latencia sana lo sube 1/límite (≈ +1 por ronda completa),
+    un timeout, error de conexión, 429 o 5xx lo recorta por AIMD_BETA (a lo
+    sumo una vez por latencia típica, para que una ráfaga de fallos no lo
+    hunda de golpe) y un Retry-After frena todo el host ese tiempo. Solo sube
+    si el límite se llegó a usar entero (con pocos hilos pidiendo no hay
+    nada que medir) y, tras un recorte, no vuelve a subir durante AIMD_HOLD
+    latencias típicas (más la pausa), así no tantea el techo a cada rato.
+    """
+
+    def __init__(self, start: float = AIMD_START, ceiling: float = AIMD_MAX, beta: float = AIMD_BETA,
+                 slow: float = AIMD_SLOW, hold: float = AIMD_HOLD):
+        self.ceiling = max(1.0, ceiling)
+        self.limit = min(max(1.0, start), self.ceiling)
+        self.beta = beta
+        self.slow = slow
+        self.hold = hold
+        self.peak = self.limit
+        self.cuts = 0
+        self.pauses = 0
+        self.inflight = 0
+        self._base = None  # menor latencia vista
+        self._srtt = None  # latencia típica (promedio móvil)
+        self._last_cut = 0.0
+        self._hold_until = 0.0
+        self._paused_until = 0.0
+        self._full = False  # se llegó a `allowed` requests en vuelo desde la última suba
+        self._cond = threading.Condition()
+
+    @property
+    def allowed(self) -> int:
+        return max(1, int(self.limit + 0.5))
+
+    def acquire(self, timeout: float = None) -> bool:
+        """Como Semaphore.acquire: False si pasan `timeout` segundos sin cupo."""
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                pause = self._paused_until - now
+                if pause <= 0 and self.inflight < self.allowed:
+                    break
+                wait = pause if pause > 0 else None
+                if end is not None:
+                    if end <= now:
+                        return False
+                    wait = end - now if wait is None else min(wait, end - now)
+                self._cond.wait(wait)
+            self.inflight += 1
+            self._full = self._full or self.inflight >= self.allowed
+            return True
+
+    def release(self):
+        with self._cond:
+            self.inflight -= 1
+            self._cond.notify()
+
+    def success(self, latency: float):
+        with self._cond:
+            self._base = latency if self._base is None else min(self._base, latency)
+            self._srtt = latency if self._srtt is None else 0.8 * self._srtt + 0.2 * latency
+            if (self._full and latency <= self._base * self.slow + 0.05 and self.limit < self.ceiling
+                    and time.monotonic() >= self._hold_until):
+                allowed = self.allowed
+                self.limit = min(self.ceiling, self.limit + 1.0 / self.limit)
+                self.peak = max(self.peak, self.limit)
+                if self.allowed != allowed:
+                    self._full = False
+                    self._cond.notify_all()
+
+    def overload(self, pause: float = 0.0):
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_cut >= (self._srtt or 1.0):
+                self.limit = max(1.0, self.limit * self.beta)
+                self.cuts += 1
+                self._last_cut = now
+            self._hold_until = max(self._hold_until, now + self.hold * (self._srtt or 1.0) + pause)
+            if pause > 0:
+                self._paused_until = max(self._paused_until, now + pause)
+                self.pauses += 1
+
+
+class BudgetExhausted(Exception):
+    """Se agotó el presupuesto (Deadline) esperando cupo en Limits.slot."""
+
+
+class Limits:
+    """
+    Topes de requests en vuelo: uno global y uno por host (0 = sin tope).
+    Un mismo Limits se comparte entre todos los clientes de un barrido.
+
+    Con adaptive el tope por host es un AdaptiveLimit que arranca en
+    `start` y se mueve entre 1 y `ceiling` según las respuestas del host
+    (max_per_host no aplica); los clientes lo alimentan con success() y
+    overload().
+    """
+
+    def __init__(self, max_total: int = 0, max_per_host: int = 0, adaptive: bool = False,
+                 start: float = AIMD_START, ceiling: float = AIMD_MAX):
+        self.total = threading.BoundedSemaphore(max_total) if max_total > 0 else None
+        self.max_per_host = max_per_host
+        self.adaptive = adaptive
+        self.start = start
+        self.ceiling = ceiling
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(int(env("MAX_INFLIGHT", "0")), int(env("MAX_PER_HOST", "0")),
+                   adaptive=env("ADAPTIVE_LIMITS", "0") == "1")
+
+    def _host_sem(self, host: str):
+        if self.max_per_host <= 0 and not self.adaptive:
+            return None
+        with self._lock:
+            sem = self._hosts.get(host)
+            if sem is None:
+                sem = self._hosts[host] = (AdaptiveLimit(self.start, self.ceiling) if self.adaptive
+                                           else threading.BoundedSemaphore(self.max_per_host))
+            return sem
+
+    def _adaptive(self, url: str):
+        if not self.adaptive:
+            return None
+        return self._host_sem(host_port(url))
+
+    def success(self, url: str, latency: float):
+        """Respuesta sana de `url` (solo cuenta en modo adaptive)."""
+        gate = self._adaptive(url)
+        if gate: gate.success(latency)
+
+    def overload(self, url: str, pause: float = 0.0):
+        """Timeout, 429 o 5xx de `url`; `pause` = Retry-After en segundos."""
+        gate = self._adaptive(url)
+        if gate: gate.overload(pause)
+
+    def summary(self, host: str = None):
+        """[(host, límite final, máximo alcanzado, recortes, pausas)] de los límites adaptativos."""
+        with self._lock:
+            gates = sorted((h, g) for h, g in self._hosts.items()
+                           if isinstance(g, AdaptiveLimit) and host in (None, h))
+        return [(h, g.allowed, max(1, int(g.peak + 0.5)), g.cuts, g.pauses) for h, g in gates]
+
+    def report(self, log=print, host: str = None):
+        for host, limit, peak, cuts, pauses in self.summary(host):
+            log(f"[INFO] Concurrencia {host}: límite final {limit} | máximo {peak} | "
+                f"recortes {cuts} | pausas Retry-After {pauses}")
+
+    @contextmanager
+    def slot(self, url: str, deadline: "Deadline" = None):
+        """
+        Cupo para un request a `url`. Con `deadline` la espera no pasa del
+        presupuesto que queda: si se agota antes de conseguir cupo, BudgetExhausted.
+        """
+        def timeout():
+            left = deadline.remaining() if deadline else float("inf")
+            if left <= 0:
+                raise BudgetExhausted(url)
+            return None if left == float("inf") else left
+
+        # Primero el cupo del host y luego el global: quien espera a un host
+        # saturado no retiene un cupo global que otro servidor podría usar.
+        host_sem = self._host_sem(host_port(url))
+        if host_sem and not host_sem.acquire(timeout=timeout()):
+            raise BudgetExhausted(url)
+        try:
+            if self.total and not self.total.acquire(timeout=timeout()):
+                raise BudgetExhausted(url)
+            try:
+                yield
+            finally:
+                if self.total: self.total.release()
+        finally:
+            if host_sem: host_sem.release()
+
+
+class ConnStats:
+    """Conexiones abiertas vs. requests hechos, por host (reutilizadas = requests - abiertas)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.opened = {}
+        self.requests = {}
+
+    def on_open(self, host: str):
+        with self._lock:
+            self.opened[host] = self.opened.get(host, 0) + 1
+
+    def on_request(self, host: str):
+        with self._lock:
+            self.requests[host] = self.requests.get(host, 0) + 1
+
+    def summary(self):
+        """[(host, requests, abiertas, reutilizadas)] ordenado por host."""
+        with self._lock:
+            hosts = sorted(set(self.requests) | set(self.opened))
+            rows = []
+            for h in hosts:
+                n, o = self.requests.get(h, 0), self.opened.get(h, 0)
+                rows.append((h, n, o, max(0, n - o)))
+            return rows
+
+    def report(self, log=print):
+        rows = self.summary()
+        for h, n, o, reused in rows:
+            log(f"[INFO] HTTP {h}: {n} requests | {o} conexiones abiertas | {reused} reutilizadas")
+        n = sum(r[1] for r in rows)
+        o = sum(r[2] for r in rows)
+        log(f"[INFO] HTTP total: {n} requests | {o} conexiones abiertas | {max(0, n - o)} reutilizadas")
+
+
+def _counting(pool_cls, stats: ConnStats):
+    """Subclase del pool de urllib3 que registra cada conexión nueva en `stats`."""
+    class CountingPool(pool_cls):
+        def _new_conn(self):
+            stats.on_open(f"{self.host}:{self.port}")
+            return super()._new_conn()
+    CountingPool.__name__ = f"Counting{pool_cls.__name__}"
+    return CountingPool
+
+
+class _CountingAdapter(HTTPAdapter):
+    def __init__(self, stats: ConnStats, **kw):
+        self.stats = stats
+        super().__init__(**kw)
+
+    def _instrument(self, manager):
+        manager.pool_classes_by_scheme = {
+            "http": _counting(HTTPConnectionPool, self.stats),
+            "https": _counting(HTTPSConnectionPool, self.stats),
+        }
+        return manager
+
+    def init_poolmanager(self, *args, **kw):
+        super().init_poolmanager(*args, **kw)
+        self._instrument(self.poolmanager)
+
+    def proxy_manager_for(self, proxy, **kw):
+        if proxy in self.proxy_manager:
+            return self.proxy_manager[proxy]
+        return self._instrument(super().proxy_manager_for(proxy, **kw))
+
+
+class HttpPool:
+    """
+    requests.Session compartida por todos los clientes del proceso: un pool
+    keep-alive por host (HTTP_POOL_HOSTS pools de HTTP_POOL_SIZE conexiones),
+    compresión y conteo de conexiones abiertas/reutilizadas.
+    """
+
+    def __init__(self, pool_hosts: int = 32, pool_size: int = 10):
+        self.stats = ConnStats()
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        adapter = _CountingAdapter(self.stats, pool_connections=pool_hosts, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_env(cls):
+        return cls(int(env("HTTP_POOL_HOSTS", "32")), int(env("HTTP_POOL_SIZE", "10")))
+
+    def get(self, url: str, timeout: float, stream: bool = False):
+        self.stats.on_request(host_port(url))
+        return self.session.get(url, timeout=timeout, stream=stream)
+
+    def post(self, url: str, body, timeout: float):
+        self.stats.on_request(host_port(url))
+        return self.session.post(url, json=body, timeout=timeout,
+                                 headers={"Content-Type": "application/fhir+json"})
+
+    def post_data(self, url: str, data, content_type: str, timeout):
+        """POST de un cuerpo crudo; `data` puede ser un archivo (se envía de a bloques)."""
+        self.stats.on_request(host_port(url))
+        return self.session.post(url, data=data, timeout=timeout, headers={"Content-Type": content_type})
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por host: tras `threshold` fallos seguidos de conexión o
+    timeout se abre y corta en seco todo request a ese host durante
+    `reset_after` segundos; luego deja pasar un intento (half-open).
+    """
+
+    def __init__(self, threshold: int = 3, reset_after: float = 300):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._fails = {}       # host -> fallos seguidos
+        self._open_until = {}  # host -> monotonic
+
+    @classmethod
+    def from_env(cls):
+        return cls(int(env("BREAKER_THRESHOLD", "3")), float(env("BREAKER_RESET", "300")))
+
+    def allow(self, host: str) -> bool:
+        if self.threshold <= 0:
+            return True
+        with self._lock:
+            until = self._open_until.get(host)
+            if until is None:
+                return True
+            if time.monotonic() < until:
+                return False
+            # half-open: un fallo más lo vuelve a abrir
+            del self._open_until[host]
+            self._fails[host] = self.threshold - 1
+            return True
+
+    def is_open(self, host: str) -> bool:
+        with self._lock:
+            until = self._open_until.get(host)
+            return until is not None and time.monotonic() < until
+
+    def success(self, host: str):
+        with self._lock:
+            self._fails.pop(host, None)
+
+    def failure(self, host: str):
+        with self._lock:
+            n = self._fails.get(host, 0) + 1
+            self._fails[host] = n
+            if self.threshold > 0 and n >= self.threshold:
+                self._open_until[host] = time.monotonic() + self.reset_after
+
+
+class Deadline:
+    """Presupuesto de tiempo de un servidor (0 = sin límite), compartido por sus checks."""
+
+    def __init__(self, budget: float = 0):
+        self.expires = time.monotonic() + budget if budget > 0 else None
+
+    def remaining(self) -> float:
+        return float("inf") if self.expires is None else self.expires - time.monotonic()
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+def _shared_instance(key: str, factory):
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = factory()
+        return _shared[key]
+
+def shared_pool() -> HttpPool:
+    """HttpPool único del proceso (se crea al primer uso)."""
+    return _shared_instance("pool", HttpPool.from_env)
+
+def shared_breaker() -> CircuitBreaker:
+    """CircuitBreaker único del proceso: todos los checks de un host comparten su estado."""
+    return _shared_instance("breaker", CircuitBreaker.from_env)
+
+def shared_metrics() -> Metrics:
+    """Metrics único del proceso (latencias de todos los clientes)."""
+    return _shared_instance("metrics", Metrics)
+
+
+class FhirClient:
+    """
+    GET JSON con reintentos (backoff exponencial con jitter), respetando los
+    topes de un Limits compartido, el circuit breaker del host y el
+    presupuesto (Deadline) del servidor.
+    """
+
+    def __init__(self, timeout: float = 15, retries: int = 1, sleep_retry: float = 1,
+                 limits: Limits = None, debug: int = 0, log=print, pool: HttpPool = None,
+                 breaker: CircuitBreaker = None, deadline: Deadline = None, backoff_max: float = 30,
+                 label: str = None, metrics: Metrics = None):
+        self.timeout = timeout
+        self.retries = retries
+        self.sleep_retry = sleep_retry
+        self.limits = limits or Limits.from_env()
+        self.debug = debug
+        self.log = log
+        self.pool = pool or shared_pool()
+        self.breaker = breaker or shared_breaker()
+        self.deadline = deadline or Deadline()
+        self.backoff_max = backoff_max
+        self.label = label  # servidor en las métricas (por defecto host:puerto)
+        self.metrics = metrics or shared_metrics()
+        self._tls = threading.local()
+        self._traffic = [0, 0]  # requests y bytes de este cliente (ver traffic())
+        self._traffic_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, retries: str = "1", sleep_retry: str = "1", **kw):
+        """Lee TIMEOUT/RETRIES/SLEEP_RETRY/DEBUG/SERVER_BUDGET; los defaults varían por check."""
+        kw.setdefault("deadline", Deadline(float(env("SERVER_BUDGET", "0"))))
+        kw.setdefault("backoff_max", float(env("BACKOFF_MAX", "30")))
+        return cls(float(env("TIMEOUT", "15")), int(env("RETRIES", retries)),
+                   float(env("SLEEP_RETRY", sleep_retry)), debug=int(env("DEBUG", "0")), **kw)
+
+    def record(self, url: str, seconds: float, nbytes: int, ok: bool):
+        """Registra un request en las métricas (compartidas) y en el tráfico propio del cliente."""
+        self.metrics.record(self.label or host_port(url), url, seconds, nbytes, ok)
+        with self._traffic_lock:
+            self._traffic[0] += 1
+            self._traffic[1] += nbytes
+
+    def traffic(self):
+        """(requests, bytes) hechos por este cliente; restando dos lecturas se obtiene lo de un tramo."""
+        with self._traffic_lock:
+            return tuple(self._traffic)
+
+    def why(self) -> str:
+        """Motivo de corte del último get_json fallido de este hilo ("" si fue un fallo normal)."""
+        return getattr(self._tls, "reason", "")
+
+    def _backoff(self, attempt: int, pause: float = 0.0) -> float:
+        # Exponencial con "equal jitter": entre d/2 y d, nunca más que lo que queda de presupuesto;
+        # si el servidor mandó Retry-After (`pause`) se espera al menos eso
+        d = min(self.backoff_max, self.sleep_retry * (2 ** attempt))
+        d = max(d / 2 + random.uniform(0, d / 2), pause)
+        return max(0.0, min(d, self.deadline.remaining()))
+
+    def _pause(self, response) -> float:
+        """Retry-After de `response`, acotado por BACKOFF_MAX y por el presupuesto que queda."""
+        return max(0.0, min(retry_after(response), self.backoff_max, self.deadline.remaining()))
+
+    def _fail(self, url: str, reason: str, last, method: str = "GET"):
+        self._tls.reason = reason
+        if self.debug: self.log(f"[DEBUG] {method} failed: {url} -> {reason.strip() or last}")
+        return None
+
+    def get_json(self, url: str):
+        """GET con reintentos; devuelve dict o None (ver why() para el motivo)."""
+        return self._request(url)
+
+    def get_as(self, url: str, parse):
+        """
+        GET como get_json, pero el cuerpo lo decodifica `parse` (p.ej. Bundle.parse,
+        ver fhirjson); None si falla o si la respuesta no es del tipo esperado.
+        """
+        return self._request(url, parse=parse)
+
+    def post_json(self, url: str, body):
+        """POST (p.ej. un Bundle batch) con la misma política de reintentos que get_json."""
+        return self._request(url, body)
+
+    def get_stream(self, url: str):
+        """
+        GET cuyo cuerpo se lee de a poco (ver StreamBody); None si falla, como
+        get_json. Los reintentos cubren hasta recibir los headers; un corte a
+        mitad del cuerpo lo ve quien lee.
+        """
+        return self._request(url, stream=True)
+
+    def _request(self, url: str, body=None, stream: bool = False, parse=loads):
+        host = host_port(url)
+        method = "GET" if body is None else "POST"
+        self._tls.reason = ""
+        last = None
+        for attempt in range(self.retries + 1):
+            pause = 0.0
+            if not self.breaker.allow(host):
+                return self._fail(url, CIRCUIT_OPEN, last, method)
+            try:
+                with self.limits.slot(url, self.deadline):
+                    left = self.deadline.remaining()
+                    if left <= 0:
+                        return self._fail(url, BUDGET_EXHAUSTED, last, method)
+                    t0 = time.perf_counter()
+                    if body is None:
+                        r = self.pool.get(url, min(self.timeout, left), stream=stream)
+                    else:
+                        r = self.pool.post(url, body, min(self.timeout, left))
+            except BudgetExhausted:
+                return self._fail(url, BUDGET_EXHAUSTED, last, method)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # Solo conexión/timeout cuentan para el breaker; un 404 o 500 prueba que el host vive
+                self.record(url, time.perf_counter() - t0, 0, False)
+                self.breaker.failure(host)
+                self.limits.overload(url)
+                last = e
+            except Exception as e:
+                last = e
+            else:
+                self.breaker.success(host)
+                if overloaded(r.status_code):
+                    pause = self._pause(r)
+                    self.limits.overload(url, pause)
+                else:
+                    self.limits.success(url, time.perf_counter() - t0)
+                if stream and r.ok:
+                    return StreamBody(self, r, url, t0)
+                self.record(url, time.perf_counter() - t0, len(r.content), r.ok)
+                try:
+                    r.raise_for_status()
+                    return parse(r.content)
+                except Exception as e:
+                    last = e
+                    if body is not None and 400 <= r.status_code < 500 and r.status_code != 429:
+                        break  # el servidor rechaza el POST (p.ej. no soporta batch): no insistir
+            if attempt >= self.retries:
+                break
+            time.sleep(self._backoff(attempt, pause))
+        if self.deadline.remaining() <= 0:
+            return self._fail(url, BUDGET_EXHAUSTED, last, method)
+        return self._fail(url, "", last, method)
+
+
+class StreamBody:
+    """
+    Cuerpo (ya descomprimido) de una respuesta en streaming, como archivo de
+    solo lectura. Cuenta los bytes leídos y registra la métrica al cerrarse;
+    usar con `with`.
+    """
+
+    def __init__(self, client: FhirClient, response, url: str, t0: float):
+        self.client = client
+        self.response = response
+        self.url = url
+        self.t0 = t0
+        self.nbytes = 0
+        self.closed = False
+        response.raw.decode_content = True
+
+    def read(self, n: int = -1) -> bytes:
+        data = self.response.raw.read(None if n is None or n < 0 else n)
+        self.nbytes += len(data)
+        return data
+
+    def close(self, ok: bool = True):
+        if self.closed:
+            return
+        self.closed = True
+        self.response.close()
+        self.client.record(self.url, time.perf_counter() - self.t0, self.nbytes, ok)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(ok=exc_type is None)
@@ -0,0 +1,186 @@
+"""
+Deriva de terminología entre servidores: ¿todos los países expanden igual
+los ValueSet compartidos de RACSEL?
+
+Por cada servidor y ValueSet compartido se recorre la expansión completa en
+streaming (iter_stream) acumulando una huella que no depende del orden ni
+de la paginación (ExpansionStats.fingerprint); en memoria solo queda la
+huella. Se comparan las huellas entre servidores: la más repetida es la
+referencia, y solo para los que difieren se vuelven a pedir los códigos
+(suyos y de un servidor de referencia) para informar qué falta o sobra.
+Con un History, la huella de un ValueSet cuya meta no cambió se reutiliza.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import FhirClient, env
+from .expansion import ExpansionError, ExpansionStats, concept_key, iter_stream
+from .search import SearchError, iter_entries
+
+DRIFT_PREFIX = env("DRIFT_PREFIX", "http://racsel.org/fhir/ValueSet/")  # canonicals compartidos
+DRIFT_MAX_AGE = float(env("DRIFT_MAX_AGE", "86400"))  # segundos que vale una huella reutilizada
+
+
+def list_valuesets(client: FhirClient, base: str, prefix: str = DRIFT_PREFIX) -> dict:
+    """{url: meta} de los ValueSet del servidor bajo `prefix`; SearchError si el listado falla."""
+    out = {}
+    for res in iter_entries(client, f"{base}/ValueSet?_count=200&_elements=url,meta"):
+        url = (res.get("url") or "").strip()
+        if res.get("resourceType") == "ValueSet" and url.startswith(prefix):
+            out.setdefault(url, res.get("meta") or {})
+    return out
+
+
+def fingerprint(client: FhirClient, base: str, url: str):
+    """(conceptos, huella) de la expansión completa de `url`; ExpansionError si no llega."""
+    st = ExpansionStats()
+    for c in iter_stream(client, base, vs_url=url):
+        st.add(c)
+    return st.concepts, st.fingerprint
+
+
+def expansion_keys(client: FhirClient, base: str, url: str) -> set:
+    """system|version|code de cada concepto de la expansión (solo para los servidores que difieren)."""
+    return {concept_key(c) for c in iter_stream(client, base, vs_url=url)}
+
+
+def _codes(keys):
+    return {(k.split("|", 1)[0], k.rsplit("|", 1)[-1]) for k in keys}
+
+
+def _sample(keys, n: int = 5) -> str:
+    codes = sorted(k.rsplit("|", 1)[-1] for k in keys)
+    return ", ".join(codes[:n]) + ("…" if len(codes) > n else "")
+
+
+def describe(ref_keys: set, keys: set) -> str:
+    """Qué le falta o sobra a `keys` respecto de la referencia."""
+    missing, extra = ref_keys - keys, keys - ref_keys
+    if _codes(ref_keys) == _codes(keys):
+        versions = sorted({k.split("|")[1] or "-" for k in extra})
+        return f"mismos códigos con otra versión del sistema ({', '.join(versions)})"
+    notes = []
+    if missing:
+        notes.append(f"faltan {len(missing)}: {_sample(missing)}")
+    if extra:
+        notes.append(f"sobran {len(extra)}: {_sample(extra)}")
+    return " | ".join(notes)
+
+
+def detect(servers, clients: dict, emit=print, history=None, prefix: str = DRIFT_PREFIX,
+           urls=None, max_age: float = DRIFT_MAX_AGE, jobs: int = 8):
+    """
+    Compara las expansiones de los ValueSet compartidos entre `servers`
+    (entradas de servers.json; `clients` por país). Compartido es todo
+    ValueSet bajo `prefix` que esté en al menos dos servidores, o los `urls`
+    indicados. Devuelve (rc, {url: {"status", "servers": {país: ...}}}).
+    """
+    countries = [s["country"] for s in servers]
+    bases = {s["country"]: s["base"].rstrip("/") for s in servers}
+    listed = {}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        def listing(country):
+            try:
+                return list_valuesets(clients[country], bases[country], prefix)
+            except SearchError as e:
+                emit(f"[FAIL] {country}: no se pudo listar ValueSet{e.why}")
+                return None
+        for country, vs in zip(countries, pool.map(listing, countries)):
+            if vs is not None:
+                listed[country] = vs
+
+        seen = Counter(url for vs in listed.values() for url in vs)
+        shared = sorted(urls or [u for u, n in seen.items() if n >= 2])
+        emit(f"[INFO] ValueSets compartidos: {len(shared)} en {len(listed)} servidores")
+
+        def measure(task):
+            country, url = task
+            meta = listed[country][url]
+            prev = history.fingerprint(country, url, meta, max_age) if history else None
+            if prev:
+                return prev + (True,)
+            try:
+                concepts, fp = fingerprint(clients[country], bases[country], url)
+            except ExpansionError as e:
+                return None, str(e), False
+            if history:
+                history.record_fingerprint(country, url, meta, concepts, fp)
+            return concepts, fp, False
+
+        tasks = [(c, u) for u in shared for c in countries if u in listed.get(c, {})]
+        measured = dict(zip(tasks, pool.map(measure, tasks)))
+
+        # Referencia por ValueSet: la huella más repetida (a igualdad, la del primer servidor)
+        plan = {}
+        for url in shared:
+            ok = [(c, measured[(c, url)]) for c in countries
+                  if (c, url) in measured and measured[(c, url)][0] is not None]
+            groups = Counter(fp for _, (_, fp, _) in ok)
+            if len(groups) < 2:
+                continue
+            top = max(groups.values())
+            ref_fp = next(fp for _, (_, fp, _) in ok if groups[fp] == top)
+            ref = next(c for c, (_, fp, _) in ok if fp == ref_fp)
+            plan[url] = (ref, [c for c, (_, fp, _) in ok if fp != ref_fp])
+
+        def detail(task):
+            country, url = task
+            try:
+                return expansion_keys(clients[country], bases[country], url)
+            except ExpansionError as e:
+                return e
+        wanted = sorted({(ref, url) for url, (ref, _) in plan.items()} |
+                        {(c, url) for url, (_, outliers) in plan.items() for c in outliers})
+        keys = dict(zip(wanted, pool.map(detail, wanted)))
+
+    rc = 0
+    report = {}
+    counts = Counter()
+    for url in shared:
+        entry = report[url] = {"status": "OK", "servers": {}}
+        errors = []
+        for c in countries:
+            r = measured.get((c, url))
+            if c not in listed:
+                entry["servers"][c] = {"error": "sin listado"}
+            elif r is None:
+                entry["servers"][c] = {"missing": True}
+            elif r[0] is None:
+                entry["servers"][c] = {"error": r[1]}
+                errors.append(c)
+                emit(f"[FAIL] {url} en {c} -> {r[1]}")
+            else:
+                entry["servers"][c] = {"concepts": r[0], "fingerprint": r[1], "reused": r[2]}
+        if url in plan:
+            ref, outliers = plan[url]
+            entry["status"], entry["reference"] = "DRIFT", ref
+            ref_keys = keys.get((ref, url))
+            for c in outliers:
+                k = keys.get((c, url))
+                if isinstance(ref_keys, set) and isinstance(k, set):
+                    detail = describe(ref_keys, k)
+                else:
+                    detail = f"sin detalle: {k if isinstance(k, Exception) else ref_keys}"
+                entry["servers"][c]["detail"] = detail
+                emit(f"[WARN] {url}: {c} difiere de {ref} "
+                     f"(conceptos {measured[(c, url)][0]} vs {measured[(ref, url)][0]}) | {detail}")
+        absent = [c for c in countries if c in listed and url not in listed[c]]
+        if absent:
+            entry["status"] = "DRIFT"
+            emit(f"[WARN] {url}: no está en {', '.join(absent)}")
+        if entry["status"] == "DRIFT":
+            counts["drift"] += 1
+        elif errors or not any((c, url) in measured for c in countries):
+            entry["status"] = "ERROR"
+            counts["errors"] += 1
+        else:
+            counts["ok"] += 1
+            same = [measured[(c, url)] for c in countries if (c, url) in measured]
+            emit(f"[OK] {url}: {len(same)} servidores coinciden (conceptos={same[0][0]}, huella={same[0][1][:16]})")
+        rc = rc or int(entry["status"] != "OK")
+    reused = sum(1 for r in measured.values() if r[2])
+    emit("--------------------------------------------")
+    emit(f"[RESUMEN] ValueSets compartidos: {len(shared)} | iguales: {counts['ok']} | con deriva: {counts['drift']} | "
+         f"con errores: {counts['errors']} | huellas reutilizadas: {reused}/{len(measured)} | "
+         f"expansiones detalladas: {len(keys)}")
+    return rc, report
@@ -0,0 +1,205 @@
+"""
+Recorrido paginado de expansiones completas ($expand con offset/count).
+
+Los generadores piden una página a la vez y la sueltan antes de pedir la
+siguiente, así que la memoria queda acotada por el tamaño de página aunque
+el ValueSet tenga decenas de miles de conceptos.
+
+iter_stream() además lee cada página con un parser JSON incremental (ijson,
+opcional) y entrega los conceptos a medida que llegan; sin ijson cae a
+decodificar la página entera, que igual está acotada por EXPAND_PAGE.
+"""
+import hashlib
+import time
+
+from .client import FhirClient, enc, env
+from .fhirjson import Expansion, loads
+
+try:
+    import ijson
+except ImportError:  # opcional
+    ijson = None
+
+EXPAND_PAGE = max(1, int(env("EXPAND_PAGE", "1000")))  # conceptos por página de $expand
+
+
+class ExpansionError(Exception):
+    """Una página de $expand no llegó o no es un ValueSet."""
+
+    def __init__(self, message: str, url: str):
+        super().__init__(message)
+        self.url = url
+
+
+def flatten(contains, abstract: bool = False):
+    """Conceptos de expansion.contains, incluyendo los anidados (expansiones jerárquicas)."""
+    stack = list(reversed(contains or []))
+    while stack:
+        c = stack.pop() or {}
+        if c.get("code") is not None and (abstract or not c.get("abstract")):
+            yield c
+        stack.extend(reversed(c.get("contains") or []))
+
+
+def _expand_url(base: str, vs_url: str, vs_id: str, offset: int, page: int) -> str:
+    if vs_id:
+        return f"{base}/ValueSet/{enc(vs_id)}/%24expand?offset={offset}&count={page}"
+    return f"{base}/ValueSet/%24expand?url={enc(vs_url)}&offset={offset}&count={page}"
+
+
+def iter_pages(client: FhirClient, base: str, vs_url: str, page: int = None):
+    """
+    Páginas de la expansión de `vs_url`: cada una es la lista plana de
+    conceptos (fhirjson.Concept, sin los abstractos) de esa página. Se
+    detiene cuando llega a expansion.total o cuando el servidor devuelve una
+    página incompleta.
+    """
+    base = base.rstrip("/")
+    page = page or EXPAND_PAGE
+    offset = 0
+    while True:
+        url = _expand_url(base, vs_url, None, offset, page)
+        exp = client.get_as(url, Expansion.parse)
+        if not exp:
+            raise ExpansionError(f"respuesta inválida en offset={offset}{client.why()}", url)
+        if exp.offset not in (None, offset):
+            raise ExpansionError(f"el servidor ignora offset (pedido {offset}, recibido {exp.offset})", url)
+        concepts = [c for c in exp.concepts if c.code is not None and not c.abstract]
+        if concepts:
+            yield concepts
+        offset += exp.size
+        if not exp.size or exp.size < page or (exp.total is not None and offset >= exp.total):
+            return
+
+
+def iter_concepts(client: FhirClient, base: str, vs_url: str, page: int = None):
+    """Conceptos de la expansión completa, uno a uno (ver iter_pages)."""
+    for concepts in iter_pages(client, base, vs_url, page):
+        yield from concepts
+
+
+def iter_stream(client: FhirClient, base: str, vs_url: str = None, vs_id: str = None,
+                page: int = None, stats: dict = None):
+    """
+    Todos los conceptos de la expansión (incluidos los abstractos), uno a
+    uno y sin armar la página completa cuando ijson está disponible.
+    `stats` (si se pasa) recibe "total" (expansion.total), "pages" y "bytes".
+    """
+    base = base.rstrip("/")
+    page = page or EXPAND_PAGE
+    stats = stats if stats is not None else {}
+    stats.update(total=None, pages=0, bytes=0)
+    offset = 0
+    while True:
+        url = _expand_url(base, vs_url, vs_id, offset, page)
+        body = client.get_stream(url)
+        if body is None:
+            raise ExpansionError(f"respuesta inválida en offset={offset}{client.why()}", url)
+        head = {}
+        n = 0
+        try:
+            with body:
+                items = _stream_items(body, head) if ijson else _load_items(body, head)
+                for item in items:
+                    n += 1
+                    yield from flatten([item], abstract=True)
+        except (ValueError, OSError) as e:  # JSON cortado o conexión caída a mitad del cuerpo
+            raise ExpansionError(f"cuerpo inválido en offset={offset}: {e}", url)
+        if head.get("resourceType") != "ValueSet":
+            raise ExpansionError(f"respuesta inválida en offset={offset}", url)
+        if head.get("offset") not in (None, offset):
+            raise ExpansionError(f"el servidor ignora offset (pedido {offset}, recibido {head.get('offset')})", url)
+        stats["pages"] += 1
+        stats["bytes"] += body.nbytes
+        if head.get("total") is not None:
+            stats["total"] = int(head["total"])
+        offset += n
+        if not n or n < page or (stats["total"] is not None and offset >= stats["total"]):
+            return
+
+
+def _stream_items(body, head: dict):
+    """Items de expansion.contains vía ijson; resourceType/total/offset quedan en `head`."""
+    builder = None
+    for prefix, event, value in ijson.parse(body):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == "expansion.contains.item" and event == "end_map":
+                yield builder.value
+                builder = None
+        elif prefix == "expansion.contains.item" and event == "start_map":
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix in ("resourceType", "expansion.total", "expansion.offset"):
+            head[prefix.rsplit(".", 1)[-1]] = value
+
+
+def _load_items(body, head: dict):
+    resp = loads(body.read())
+    if not isinstance(resp, dict):
+        return []
+    expansion = resp.get("expansion") or {}
+    head.update(resourceType=resp.get("resourceType"), total=expansion.get("total"),
+                offset=expansion.get("offset"))
+    return expansion.get("contains") or []
+
+
+def concept_key(c: dict) -> str:
+    """system|version|code de un concepto de expansion.contains."""
+    return f"{c.get('system') or ''}|{c.get('version') or ''}|{c.get('code')}"
+
+
+class ExpansionStats:
+    """
+    Estado acotado de una expansión recorrida en streaming: conteos, un set
+    de hashes de 8 bytes de concept_key (system|version|code: el mismo código
+    en dos versiones del sistema no cuenta como duplicado), un SHA-256
+    acumulado del contenido en el orden recibido y una huella que no depende
+    del orden (suma módulo 2**128 del hash de cada concepto), comparable
+    entre servidores que paginan distinto.
+    """
+
+    def __init__(self):
+        self.concepts = 0
+        self.inactive = 0
+        self.abstract = 0
+        self.duplicates = 0
+        self.duplicate_codes = []  # solo los primeros, para el reporte
+        self._seen = set()
+        self._digest = hashlib.sha256()
+        self._sum = 0
+        self._t0 = time.perf_counter()
+        self.seconds = 0.0
+
+    def add(self, c: dict):
+        key = concept_key(c)
+        self.concepts += 1
+        if c.get("inactive"):
+            self.inactive += 1
+        if c.get("abstract"):
+            self.abstract += 1
+        h = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        self._sum += int.from_bytes(h, "big")
+        h = h[:8]
+        if h in self._seen:
+            self.duplicates += 1
+            if len(self.duplicate_codes) < 5:
+                self.duplicate_codes.append(str(c.get("code")))
+        else:
+            self._seen.add(h)
+        self._digest.update(key.encode("utf-8") + b"\n")
+
+    def stop(self):
+        self.seconds = time.perf_counter() - self._t0
+
+    @property
+    def digest(self) -> str:
+        return self._digest.hexdigest()
+
+    @property
+    def fingerprint(self) -> str:
+        return f"{self._sum % (1 << 128):032x}"
+
+    @property
+    def rate(self) -> float:
+        return self.concepts / self.seconds if self.seconds > 0 else 0.0
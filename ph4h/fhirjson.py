@@ -0,0 +1,277 @@
+"""
+Decodificación de respuestas FHIR a estructuras compactas.
+
+Cada clase guarda solo los campos que leen los checks (en objetos con
+__slots__) y tiene dos entradas, que devuelven None si la respuesta no es
+del tipo esperado:
+
+- parse(cuerpo): con msgspec instalado (opcional) decodifica el cuerpo
+  directo a structs que declaran solo esos campos, así que el resto (text,
+  extensiones, designations, group[] de un ConceptMap, ...) se saltea sin
+  construirlo. Sin msgspec, o si la respuesta trae algo con otra forma,
+  es decode(loads(cuerpo)).
+- decode(obj): a partir de un JSON ya parseado (p.ej. un recurso de un
+  Bundle o una entrada de un batch). Ahí el JSON ya está construido entero:
+  lo único que se gana es que el resto del recurso se suelta enseguida en
+  vez de quedar vivo hasta que termina el check.
+
+loads() parsea con orjson si está instalado (opcional) y con json si no.
+"""
+import json
+from typing import Any, List, Optional
+
+try:
+    import orjson
+except ImportError:  # opcional
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # opcional
+    msgspec = None
+
+
+def loads(data):
+    """JSON de un cuerpo (bytes o str)."""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def _parse(data, decoder, from_doc, decode):
+    if decoder is None:
+        return decode(loads(data))
+    try:
+        doc = decoder.decode(data)
+    except msgspec.ValidationError:
+        # JSON válido pero con otra forma (p.ej. un OperationOutcome): que decida el camino genérico
+        return decode(loads(data))
+    return from_doc(doc)
+
+
+if msgspec is not None:
+    # Solo los campos que se leen; msgspec saltea el resto sin construirlo.
+    class _Link(msgspec.Struct):
+        relation: Any = None
+        url: Any = None
+
+    class _Entry(msgspec.Struct):
+        resource: Any = None
+
+    class _BundleDoc(msgspec.Struct):
+        resourceType: Any = None
+        total: Any = None
+        link: Optional[List[_Link]] = None
+        entry: Optional[List[Optional[_Entry]]] = None
+
+    class _Param(msgspec.Struct):
+        name: Any = None
+
+    class _ParametersDoc(msgspec.Struct):
+        resourceType: Any = None
+        parameter: Optional[List[_Param]] = None
+
+    class _Contains(msgspec.Struct):
+        system: Any = None
+        code: Any = None
+        version: Any = None
+        inactive: Any = None
+        abstract: Any = None
+        contains: Optional[List[Optional["_Contains"]]] = None
+
+    class _ExpansionDoc(msgspec.Struct):
+        total: Any = None
+        offset: Any = None
+        contains: Optional[List[Optional[_Contains]]] = None
+
+    class _ValueSetDoc(msgspec.Struct):
+        resourceType: Any = None
+        expansion: Optional[_ExpansionDoc] = None
+
+    class _ConceptMapDoc(msgspec.Struct):
+        resourceType: Any = None
+        id: Any = None
+        name: Any = None
+        url: Any = None
+        sourceUri: Any = None
+        sourceCanonical: Any = None
+        targetUri: Any = None
+        targetCanonical: Any = None
+        meta: Any = None
+        group: msgspec.Raw = msgspec.Raw()  # solo importa si vino
+
+    _DECODERS = {kind: msgspec.json.Decoder(doc) for kind, doc in (
+        ("Bundle", _BundleDoc), ("Parameters", _ParametersDoc), ("ValueSet", _ValueSetDoc),
+        ("ConceptMap", _ConceptMapDoc))}
+else:
+    _DECODERS = {}
+
+
+def _is(obj, kind: str) -> bool:
+    return isinstance(obj, dict) and obj.get("resourceType") == kind
+
+
+def _str(value) -> str:
+    return value.strip() if isinstance(value, str) else ""
+
+
+class Bundle:
+    """Página de un search: Bundle.total (o None), link next y entry[].resource."""
+    __slots__ = ("total", "next", "resources")
+
+    def __init__(self, total, next, resources):
+        self.total = total
+        self.next = next
+        self.resources = resources
+
+    @classmethod
+    def decode(cls, obj):
+        if not _is(obj, "Bundle"):
+            return None
+        total = obj.get("total")
+        nxt = next((l.get("url") for l in (obj.get("link") or [])
+                    if isinstance(l, dict) and l.get("relation") == "next" and l.get("url")), None)
+        return cls(total if isinstance(total, int) else None, nxt,
+                   [(e or {}).get("resource") or {} for e in (obj.get("entry") or [])])
+
+    @classmethod
+    def parse(cls, data):
+        return _parse(data, _DECODERS.get("Bundle"), cls._from_doc, cls.decode)
+
+    @classmethod
+    def _from_doc(cls, doc):
+        if doc.resourceType != "Bundle":
+            return None
+        nxt = next((l.url for l in (doc.link or []) if l.relation == "next" and l.url), None)
+        return cls(doc.total if isinstance(doc.total, int) else None, nxt,
+                   [(e.resource if e else None) or {} for e in (doc.entry or [])])
+
+
+class Parameters:
+    """Resultado de $translate/$lookup: solo los nombres de parameter[]."""
+    __slots__ = ("names",)
+
+    def __init__(self, names):
+        self.names = names
+
+    @classmethod
+    def decode(cls, obj):
+        if not _is(obj, "Parameters"):
+            return None
+        return cls(frozenset(p.get("name") for p in (obj.get("parameter") or []) if isinstance(p, dict)))
+
+    @classmethod
+    def parse(cls, data):
+        return _parse(data, _DECODERS.get("Parameters"), cls._from_doc, cls.decode)
+
+    @classmethod
+    def _from_doc(cls, doc):
+        if doc.resourceType != "Parameters":
+            return None
+        return cls(frozenset(p.name for p in (doc.parameter or [])))
+
+    def has(self, *names) -> bool:
+        return any(n in self.names for n in names)
+
+
+class Concept:
+    """Un concepto de expansion.contains, sin display/designation/extension."""
+    __slots__ = ("system", "code", "version", "inactive", "abstract")
+
+    def __init__(self, system, code, version=None, inactive=False, abstract=False):
+        self.system = system
+        self.code = code
+        self.version = version
+        self.inactive = inactive
+        self.abstract = abstract
+
+
+class Expansion:
+    """
+    Página de $expand: expansion.total/offset, la cantidad de items de primer
+    nivel (`size`, lo que avanza el offset) y los conceptos aplanados en
+    orden de documento, anidados y abstractos incluidos.
+    """
+    __slots__ = ("total", "offset", "size", "concepts")
+
+    def __init__(self, total, offset, size, concepts):
+        self.total = total
+        self.offset = offset
+        self.size = size
+        self.concepts = concepts
+
+    @classmethod
+    def decode(cls, obj):
+        if not _is(obj, "ValueSet"):
+            return None
+        expansion = obj.get("expansion") or {}
+        contains = expansion.get("contains") or []
+        concepts = []
+        stack = list(reversed(contains))
+        while stack:
+            c = stack.pop() or {}
+            concepts.append(Concept(c.get("system"), c.get("code"), c.get("version"),
+                                    bool(c.get("inactive")), bool(c.get("abstract"))))
+            stack.extend(reversed(c.get("contains") or []))
+        total = expansion.get("total")
+        return cls(int(total) if total is not None else None, expansion.get("offset"), len(contains), concepts)
+
+    @classmethod
+    def parse(cls, data):
+        return _parse(data, _DECODERS.get("ValueSet"), cls._from_doc, cls.decode)
+
+    @classmethod
+    def _from_doc(cls, doc):
+        if doc.resourceType != "ValueSet":
+            return None
+        expansion = doc.expansion
+        contains = (expansion.contains if expansion else None) or []
+        concepts = []
+        stack = list(reversed(contains))
+        while stack:
+            c = stack.pop()
+            if c is None:
+                concepts.append(Concept(None, None))
+                continue
+            concepts.append(Concept(c.system, c.code, c.version, bool(c.inactive), bool(c.abstract)))
+            stack.extend(reversed(c.contains or []))
+        total = expansion.total if expansion else None
+        return cls(int(total) if total is not None else None, expansion.offset if expansion else None,
+                   len(contains), concepts)
+
+
+class ConceptMapSummary:
+    """Lo que los checks leen de un ConceptMap: id, name, url, source, target y meta."""
+    __slots__ = ("id", "name", "url", "source", "target", "meta", "grouped")
+
+    def __init__(self, id, name, url, source, target, meta, grouped=False):
+        self.id = id
+        self.name = name
+        self.url = url
+        self.source = source
+        self.target = target
+        self.meta = meta
+        self.grouped = grouped  # el recurso traía group[] (el servidor ignoró _elements)
+
+    @classmethod
+    def decode(cls, obj):
+        if not _is(obj, "ConceptMap"):
+            return None
+        return cls(_str(obj.get("id")), _str(obj.get("name")), _str(obj.get("url")),
+                   _str(obj.get("sourceUri") or obj.get("sourceCanonical")),
+                   _str(obj.get("targetUri") or obj.get("targetCanonical")),
+                   obj.get("meta") or {}, "group" in obj)
+
+    @classmethod
+    def parse(cls, data):
+        return _parse(data, _DECODERS.get("ConceptMap"), cls._from_doc, cls.decode)
+
+    @classmethod
+    def _from_doc(cls, doc):
+        if doc.resourceType != "ConceptMap":
+            return None
+        return cls(_str(doc.id), _str(doc.name), _str(doc.url), _str(doc.sourceUri or doc.sourceCanonical),
+                   _str(doc.targetUri or doc.targetCanonical), doc.meta or {}, len(doc.group) > 0)
+
+    @property
+    def complete(self) -> bool:
+        """¿Alcanza para traducir sin volver a leer el recurso?"""
+        return bool(self.url and self.source and self.target)
@@ -0,0 +1,187 @@
+"""
+Historial SQLite de los barridos y cache de versiones para re-checks incrementales.
+
+Tablas:
+  runs       una fila por servidor y ciclo (códigos de salida y reporte completo)
+  results    cada línea [OK]/[WARN]/[FAIL] por recurso, marcando si fue reutilizada
+  resources  último resultado verificado de cada recurso, con su meta.versionId
+             y meta.lastUpdated; es lo que decide si un recurso se re-verifica
+  uploads    último paquete cargado y verificado en cada servidor (nombre,
+             versión y sha256 del .tgz); upload-package.py lo usa para no recargar
+  fingerprints  huella de la expansión de cada ValueSet por servidor, con la
+             meta del ValueSet al calcularla; drift.py la reutiliza si no cambió
+"""
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    country TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL,
+    full INTEGER NOT NULL,
+    rc_cs INTEGER, rc_vs INTEGER, rc_cm INTEGER,
+    report TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    version_id TEXT,
+    last_updated TEXT,
+    status TEXT NOT NULL,
+    line TEXT NOT NULL,
+    reused INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_run ON results(run_id);
+CREATE TABLE IF NOT EXISTS resources (
+    country TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    version_id TEXT,
+    last_updated TEXT,
+    status TEXT NOT NULL,
+    line TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (country, kind, key)
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    base TEXT NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    uploaded_at REAL NOT NULL,
+    PRIMARY KEY (base, name, version)
+);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    country TEXT NOT NULL,
+    url TEXT NOT NULL,
+    version_id TEXT,
+    last_updated TEXT,
+    concepts INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (country, url)
+);
+"""
+
+
+def _version(meta):
+    meta = meta if isinstance(meta, dict) else {}
+    return (meta.get("versionId") or ""), (meta.get("lastUpdated") or "")
+
+
+class History:
+    """Conexión SQLite compartida entre hilos (serializada con un lock)."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(str(path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+    def start_run(self, country: str, full: bool) -> int:
+        with self._lock:
+            cur = self.db.execute("INSERT INTO runs (country, started, full) VALUES (?, ?, ?)",
+                                  (country, time.time(), int(full)))
+            self.db.commit()
+            return cur.lastrowid
+
+    def finish_run(self, run_id: int, rcs, report: str):
+        with self._lock:
+            self.db.execute("UPDATE runs SET finished = ?, rc_cs = ?, rc_vs = ?, rc_cm = ?, report = ? WHERE id = ?",
+                            (time.time(), *rcs, report, run_id))
+            self.db.commit()
+
+    def last_full(self, country: str) -> float:
+        """Inicio del último ciclo completo terminado de un país (0 si nunca hubo)."""
+        with self._lock:
+            row = self.db.execute("SELECT MAX(started) FROM runs WHERE country = ? AND full = 1 AND finished IS NOT NULL",
+                                  (country,)).fetchone()
+        return row[0] or 0.0
+
+    def uploaded(self, base: str, name: str, version: str) -> str:
+        """sha256 del último .tgz name@version cargado y verificado en `base` ("" si nunca)."""
+        with self._lock:
+            row = self.db.execute("SELECT sha256 FROM uploads WHERE base = ? AND name = ? AND version = ?",
+                                  (base, name, version)).fetchone()
+        return row[0] if row else ""
+
+    def record_upload(self, base: str, name: str, version: str, sha256: str):
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?)",
+                            (base, name, version, sha256, time.time()))
+            self.db.commit()
+
+    def fingerprint(self, country: str, url: str, meta, max_age: float):
+        """
+        (conceptos, huella) de la última expansión de `url` en `country` si el
+        ValueSet trae la misma meta.versionId/lastUpdated y tiene menos de
+        max_age segundos; None si hay que recalcularla.
+        """
+        version_id, last_updated = _version(meta)
+        if not (version_id or last_updated):
+            return None
+        with self._lock:
+            row = self.db.execute(
+                "SELECT concepts, fingerprint FROM fingerprints WHERE country = ? AND url = ?"
+                " AND version_id = ? AND last_updated = ? AND checked_at >= ?",
+                (country, url, version_id, last_updated, time.time() - max_age)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def record_fingerprint(self, country: str, url: str, meta, concepts: int, fingerprint: str):
+        version_id, last_updated = _version(meta)
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (country, url, version_id, last_updated, concepts, fingerprint, time.time()))
+            self.db.commit()
+
+    def cache(self, country: str, run_id: int, full: bool) -> "RunCache":
+        return RunCache(self, country, run_id, full)
+
+
+class RunCache:
+    """
+    Cache de un servidor dentro de un ciclo (interfaz reuse/store de ph4h.checks).
+
+    reuse() devuelve (status, line) del último resultado OK/WARN si el recurso
+    trae la misma meta.versionId/lastUpdated; los FAIL siempre se re-verifican,
+    igual que todo en un ciclo completo o cuando el servidor no informa meta.
+    """
+
+    def __init__(self, history: History, country: str, run_id: int, full: bool):
+        self.h = history
+        self.country = country
+        self.run_id = run_id
+        self.full = full
+
+    def reuse(self, kind: str, key: str, meta):
+        version_id, last_updated = _version(meta)
+        if self.full or not (version_id or last_updated):
+            return None
+        with self.h._lock:
+            row = self.h.db.execute(
+                "SELECT status, line FROM resources WHERE country = ? AND kind = ? AND key = ?"
+                " AND version_id = ? AND last_updated = ? AND status != 'FAIL'",
+                (self.country, kind, key, version_id, last_updated)).fetchone()
+            if row:
+                self.h.db.execute("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, 1)",
+                                  (self.run_id, kind, key, version_id, last_updated, row[0], row[1]))
+                self.h.db.commit()
+        return (row[0], row[1]) if row else None
+
+    def store(self, kind: str, key: str, meta, status: str, line: str):
+        version_id, last_updated = _version(meta)
+        with self.h._lock:
+            self.h.db.execute("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                              (self.run_id, kind, key, version_id, last_updated, status, line))
+            self.h.db.execute("INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              (self.country, kind, key, version_id, last_updated, status, line, time.time()))
+            self.h.db.commit()
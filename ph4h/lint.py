@@ -0,0 +1,303 @@
+"""
+Linter offline de paquetes FHIR (.tgz): sin servidor y sin extraer a disco.
+
+lint_package() recorre el tar una sola vez ("r|gz") y arma índices hash
+(miembros por nombre, recursos por tipo/id y por tipo/canonical, códigos de
+cada CodeSystem completo); todas las verificaciones salen de esos índices:
+
+- package.json: name/version, y que cada resources[].reference sea un
+  miembro del paquete con ese resourceType (y que no falte ningún recurso).
+- .index.json: cada entrada apunta a un miembro con el mismo resourceType,
+  id, url y version, y ningún recurso queda afuera. url y version son
+  opcionales en el índice: si faltan es un aviso, si difieren un error.
+- Miembros, ids y canonicals repetidos.
+- Referencias colgantes: ValueSet -> CodeSystem (include.system y sus
+  códigos), ValueSet -> ValueSet (include.valueSet), ConceptMap -> ValueSet
+  (source/target) y ConceptMap -> CodeSystem (group.source/target y los
+  códigos de sus elementos).
+
+Una referencia que no está en el paquete es colgante salvo que empiece con
+alguno de los prefijos externos (LINT_EXTERNAL: SNOMED, LOINC, hl7.org,
+CIE de la OMS, ...), que se cuentan aparte.
+"""
+import os
+import tarfile
+from collections import Counter, defaultdict
+
+from .fhirjson import loads
+from .package import KINDS, codes_of
+
+PACKAGE_DIR = "package/"
+MANIFEST = "package.json"
+INDEX = ".index.json"
+OPTIONAL_INDEX_FIELDS = ("url", "version")  # en .index.json; filename, resourceType e id son obligatorios
+
+# Terminologías que viven en el servidor y no en los paquetes
+LINT_EXTERNAL = tuple(p.strip() for p in os.environ.get(
+    "LINT_EXTERNAL", "http://snomed.info/sct,http://loinc.org,http://hl7.org/fhir/,http://terminology.hl7.org/,"
+    "http://id.who.int/icd/,http://unitsofmeasure.org,http://www.nlm.nih.gov/research/umls/,urn:iso:,urn:ietf:"
+).split(",") if p.strip())
+
+
+class _Resource:
+    """Lo que el linter necesita de cada recurso del paquete."""
+    __slots__ = ("path", "kind", "id", "name", "url", "version", "refs", "codes")
+
+    def __init__(self, path: str, res: dict):
+        self.path = path
+        self.kind = res.get("resourceType")
+        self.id = res.get("id") or ""
+        self.name = res.get("name") or ""
+        self.url = (res.get("url") or "").strip()
+        self.version = res.get("version") or ""
+        self.refs = _refs(res)
+        # Códigos de un CodeSystem completo (None si no es CodeSystem o el contenido es parcial)
+        self.codes = codes_of(res) if self.kind == "CodeSystem" and res.get("content") in (None, "complete") else None
+
+
+def _canonical(value) -> str:
+    return (value or "").strip().split("|", 1)[0]
+
+
+def _refs(res: dict):
+    """[(campo, tipos que puede resolver, canonical, códigos o None)] de un ValueSet/ConceptMap."""
+    refs = []
+    if res.get("resourceType") == "ValueSet":
+        for i, inc in enumerate((res.get("compose") or {}).get("include") or []):
+            if inc.get("system"):
+                codes = frozenset(str(c["code"]) for c in (inc.get("concept") or []) if c.get("code") is not None)
+                refs.append((f"include[{i}].system", ("CodeSystem",), _canonical(inc["system"]), codes or None))
+            for vs in inc.get("valueSet") or []:
+                refs.append((f"include[{i}].valueSet", ("ValueSet",), _canonical(vs), None))
+    elif res.get("resourceType") == "ConceptMap":
+        for side in ("source", "target"):
+            canonical = res.get(f"{side}Uri") or res.get(f"{side}Canonical")
+            if canonical:
+                # En estos paquetes hay mapas cuyo source/target es directamente un CodeSystem
+                refs.append((side, ("ValueSet", "CodeSystem"), _canonical(canonical), None))
+        for i, g in enumerate(res.get("group") or []):
+            elements = g.get("element") or []
+            sources = frozenset(str(e["code"]) for e in elements if e.get("code") is not None)
+            targets = frozenset(str(t["code"]) for e in elements for t in (e.get("target") or [])
+                                if t.get("code") is not None)
+            for side, codes in (("source", sources), ("target", targets)):
+                if g.get(side):
+                    refs.append((f"group[{i}].{side}", ("CodeSystem",), _canonical(g[side]), codes or None))
+    return refs
+
+
+class LintResult:
+    """Hallazgos de un paquete: (nivel FAIL/WARN, verificación, mensaje)."""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self.name = ""
+        self.version = ""
+        self.counts = Counter()   # recursos por tipo
+        self.members = 0
+        self.external = Counter()  # canonical externo -> referencias
+        self.findings = []
+
+    def fail(self, check: str, message: str):
+        self.findings.append(("FAIL", check, message))
+
+    def warn(self, check: str, message: str):
+        self.findings.append(("WARN", check, message))
+
+    @property
+    def errors(self) -> int:
+        return sum(1 for level, _, _ in self.findings if level == "FAIL")
+
+    @property
+    def warnings(self) -> int:
+        return sum(1 for level, _, _ in self.findings if level == "WARN")
+
+    def as_dict(self) -> dict:
+        return {"path": self.path, "name": self.name, "version": self.version, "members": self.members,
+                "resources": dict(self.counts), "external": dict(self.external),
+                "findings": [{"level": l, "check": c, "message": m} for l, c, m in self.findings]}
+
+
+def scan(path, result: LintResult):
+    """
+    Una pasada por el tar: devuelve (manifiesto, índice, {nombre: _Resource}).
+    Los nombres son relativos a package/; el JSON inválido y los miembros
+    repetidos quedan como hallazgos.
+    """
+    manifest = index = None
+    resources = {}
+    seen = Counter()
+    with tarfile.open(path, "r|gz") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            name = member.name[len(PACKAGE_DIR):] if member.name.startswith(PACKAGE_DIR) else member.name
+            seen[name] += 1
+            if not name.endswith(".json"):
+                continue
+            try:
+                doc = loads(tar.extractfile(member).read())
+            except ValueError as e:
+                result.fail("json", f"{name}: JSON inválido ({e})")
+                continue
+            if name == MANIFEST:
+                manifest = doc
+            elif name == INDEX:
+                index = doc
+            elif isinstance(doc, dict) and doc.get("resourceType"):
+                resources[name] = _Resource(name, doc)
+            else:
+                result.warn("json", f"{name}: no es un recurso FHIR (sin resourceType)")
+    result.members = sum(seen.values())
+    for name, n in seen.items():
+        if n > 1:
+            result.fail("duplicados", f"{name}: {n} miembros con el mismo nombre en el tar")
+    return manifest, index, resources
+
+
+def _resolve_reference(reference: str, resources: dict, by_id: dict, by_name: dict):
+    """
+    (recurso, cómo se resolvió) de una referencia de package.json: por
+    archivo (lo que escribe build_package), por Tipo/id, o por Tipo/name
+    (lo que traen algunos paquetes armados a mano).
+    """
+    res = resources.get(f"{reference}.json")
+    if res is not None:
+        return res, "archivo"
+    kind, _, key = reference.partition("/")
+    if (kind, key) in by_id:
+        return by_id[(kind, key)][0], "id"
+    if (kind, key) in by_name:
+        return by_name[(kind, key)][0], "name"
+    return None, None
+
+
+def _check_manifest(manifest, resources: dict, by_id: dict, result: LintResult):
+    if manifest is None:
+        result.fail("manifiesto", f"falta {PACKAGE_DIR}{MANIFEST}")
+        return
+    if not isinstance(manifest, dict):
+        result.fail("manifiesto", f"{MANIFEST} no es un objeto JSON")
+        return
+    result.name, result.version = manifest.get("name") or "", manifest.get("version") or ""
+    for field in ("name", "version"):
+        if not manifest.get(field):
+            result.fail("manifiesto", f"{MANIFEST} sin {field}")
+    if "resources" not in manifest:
+        return
+    by_name = defaultdict(list)
+    for res in resources.values():
+        if res.name:
+            by_name[(res.kind, res.name)].append(res)
+    listed = Counter()
+    for ref in manifest.get("resources") or []:
+        reference = (ref or {}).get("reference") or ""
+        res, how = _resolve_reference(reference, resources, by_id, by_name)
+        if res is None:
+            result.fail("manifiesto", f"resources: {reference} no está en el paquete")
+            continue
+        listed[res.path] += 1
+        if ref.get("type") and ref["type"] != res.kind:
+            result.fail("manifiesto", f"resources: {reference} declarado como {ref['type']} pero es {res.kind}")
+        if how == "name":
+            result.warn("manifiesto", f"resources: {reference} referido por name (archivo {res.path})")
+    for path, n in listed.items():
+        if n > 1:
+            result.fail("manifiesto", f"resources: {path} listado {n} veces")
+    for path in sorted(set(resources) - set(listed)):
+        result.fail("manifiesto", f"resources: falta {path} ({resources[path].kind})")
+
+
+def _check_index(index, resources: dict, result: LintResult):
+    if index is None:
+        result.fail("índice", f"falta {PACKAGE_DIR}{INDEX}")
+        return
+    files = index.get("files") if isinstance(index, dict) else None
+    if not isinstance(files, list):
+        result.fail("índice", f"{INDEX} sin lista files")
+        return
+    if index.get("index-version") != 1:
+        result.warn("índice", f"{INDEX}: index-version {index.get('index-version')!r} (se espera 1)")
+    listed = Counter()
+    for entry in files:
+        entry = entry or {}
+        name = entry.get("filename") or ""
+        listed[name] += 1
+        res = resources.get(name)
+        if res is None:
+            result.fail("índice", f"{name or '(sin filename)'}: no está en el paquete")
+            continue
+        for field, actual in (("resourceType", res.kind), ("id", res.id), ("url", res.url),
+                              ("version", res.version)):
+            if field in OPTIONAL_INDEX_FIELDS and entry.get(field) is None:
+                # url y version son opcionales en el índice: si faltan no hay nada que contradiga al recurso
+                if actual:
+                    result.warn("índice", f"{name}: sin {field} en el índice ({actual!r} en el recurso)")
+                continue
+            declared = entry.get(field) or ""
+            if declared != actual:
+                result.fail("índice", f"{name}: {field} {declared!r} en el índice, {actual!r} en el recurso")
+    for name, n in listed.items():
+        if n > 1:
+            result.fail("índice", f"{name}: {n} entradas en el índice")
+    for name in sorted(set(resources) - set(listed)):
+        result.fail("índice", f"{name}: recurso sin entrada en el índice")
+
+
+def _check_unique(resources: dict, result: LintResult):
+    """Ids y canonicals repetidos; devuelve los índices {(tipo, id): [recurso]} y {(tipo, url): [recurso]}."""
+    by_id, by_url = defaultdict(list), defaultdict(list)
+    for res in resources.values():
+        if res.id:
+            by_id[(res.kind, res.id)].append(res)
+        if res.kind in KINDS:
+            if res.url:
+                by_url[(res.kind, res.url)].append(res)
+            else:
+                result.warn("duplicados", f"{res.path}: {res.kind} sin url canónica")
+    for (kind, rid), same in by_id.items():
+        if len(same) > 1:
+            result.fail("duplicados", f"{kind}/{rid} repetido en {', '.join(sorted(r.path for r in same))}")
+    for (kind, url), same in by_url.items():
+        if len(same) > 1:
+            versions = ", ".join(f"{r.path} ({r.version or 'sin versión'})" for r in sorted(same, key=lambda r: r.path))
+            result.fail("duplicados", f"{kind} {url} repetido: {versions}")
+    return by_id, by_url
+
+
+def _check_refs(resources: dict, by_url: dict, result: LintResult, external=LINT_EXTERNAL):
+    cs_codes = {res.url: res.codes for res in resources.values() if res.kind == "CodeSystem" and res.url}
+    for res in sorted(resources.values(), key=lambda r: r.path):
+        for field, kinds, url, codes in res.refs:
+            hit = next((k for k in kinds if (k, url) in by_url), None)
+            if hit is None:
+                if url.startswith(tuple(external)):
+                    result.external[url] += 1
+                else:
+                    result.fail("referencias", f"{res.path}: {field} -> {url} no está en el paquete")
+                continue
+            known = cs_codes.get(url) if hit == "CodeSystem" else None
+            missing = sorted(codes - known) if codes and known is not None else []
+            if missing:
+                sample = ", ".join(missing[:5]) + ("…" if len(missing) > 5 else "")
+                result.fail("códigos", f"{res.path}: {field} -> {url}: {len(missing)} códigos que el "
+                                       f"CodeSystem no define ({sample})")
+
+
+def lint_package(path, external=LINT_EXTERNAL) -> LintResult:
+    """
+    Todas las verificaciones de un .tgz, con una sola lectura del archivo.
+    `external`: prefijos de canonical que no hace falta que estén en el paquete.
+    """
+    result = LintResult(path)
+    try:
+        manifest, index, resources = scan(path, result)
+    except (OSError, tarfile.TarError, EOFError) as e:
+        result.fail("tgz", f"no se pudo leer el archivo: {e}")
+        return result
+    result.counts.update(res.kind for res in resources.values())
+    by_id, by_url = _check_unique(resources, result)
+    _check_manifest(manifest, resources, by_id, result)
+    _check_index(index, resources, result)
+    _check_refs(resources, by_url, result, external)
+    return result
@@ -0,0 +1,228 @@
+"""
+Generador de carga de lazo abierto contra un servidor de terminología.
+
+Las operaciones son las de los checks ($lookup de los pares CodeSystem/
+código configurados, $expand de cada ValueSet y $translate del primer
+concepto de cada ConceptMap "VS…"), armadas con los mismos *_query() de
+ph4h.checks. Los requests salen según un reloj (tasa fija o Poisson), no
+cuando termina el anterior: si el servidor se satura la cola crece y se ve
+en la latencia, que se mide desde el instante programado. Cada paso de una
+rampa informa throughput logrado, percentiles, errores por tipo y
+descartados (requests que no salieron por el tope local de concurrencia).
+"""
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .checks import (expand_query, first_concept_query, load_cs_checks, lookup_query,
+                     lstrip_spaces, translate_query)
+from .client import FhirClient, HttpPool
+from .fhirjson import ConceptMapSummary, Expansion, Parameters
+from .metrics import percentile
+from .search import SearchError, iter_entries
+
+OPERATIONS = ("lookup", "expand", "translate")
+
+
+class Operation:
+    """Un request concreto: operación, URL relativa a la base y decodificador de la respuesta."""
+    __slots__ = ("name", "query", "parse")
+
+    def __init__(self, name: str, query: str, parse):
+        self.name = name
+        self.query = query
+        self.parse = parse
+
+
+def workload(client: FhirClient, base: str, cs_local: str = None, code_local: str = None,
+             cs_checks=None, limit: int = 200, emit=print) -> dict:
+    """
+    {operación: [Operation]} con lo que el servidor tiene: los pares de
+    load_cs_checks, hasta `limit` ValueSet y hasta `limit` ConceptMap VS.
+    """
+    base = base.rstrip("/")
+    ops = {name: [] for name in OPERATIONS}
+    for c in load_cs_checks(cs_checks):
+        system, code = c.get("system") or cs_local, c.get("code") or code_local
+        if system and code:
+            ops["lookup"].append(Operation("$lookup", lookup_query(system, code), Parameters.parse))
+
+    try:
+        for res in iter_entries(client, f"{base}/ValueSet?_count=200&_elements=url"):
+            url = (res.get("url") or "").strip()
+            if url and len(ops["expand"]) < limit:
+                ops["expand"].append(Operation("$expand", expand_query("url", url), Expansion.parse))
+    except SearchError as e:
+        emit(f"[WARN] No se pudo listar ValueSet{e.why}")
+
+    maps = []
+    try:
+        for res in iter_entries(client, f"{base}/ConceptMap?_count=200"):
+            cm = ConceptMapSummary.decode(res)
+            if cm and lstrip_spaces(cm.name).startswith("VS") and cm.complete and len(maps) < limit:
+                maps.append(cm)
+    except SearchError as e:
+        emit(f"[WARN] No se pudo listar ConceptMap{e.why}")
+    for cm in maps:
+        exp = client.get_as(f"{base}/{first_concept_query(cm.source)}", Expansion.parse)
+        first = exp.concepts[0] if exp and exp.concepts else None
+        if first and first.code and first.system:
+            ops["translate"].append(Operation("$translate", translate_query(
+                cm.url, str(first.code).strip(), first.system.strip(), cm.source, cm.target), Parameters.parse))
+    return ops
+
+
+def parse_mix(spec: str) -> dict:
+    """"lookup=2,expand=1" -> {"lookup": 2.0, "expand": 1.0}."""
+    mix = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"operación desconocida: {name} (válidas: {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_ramp(spec: str):
+    """"10:100:10" -> [10, 20, ..., 100] req/s."""
+    start, end, step = (float(x) for x in spec.split(":"))
+    if start <= 0 or step <= 0 or end < start:
+        raise ValueError(f"rampa inválida: {spec} (INICIO:FIN:PASO, todos > 0)")
+    rates, r = [], start
+    while r <= end + 1e-9:
+        rates.append(round(r, 6))
+        r += step
+    return rates
+
+
+class StepResult:
+    """Resultados de un paso de tasa constante."""
+
+    def __init__(self, rate: float, seconds: float):
+        self.rate = rate
+        self.seconds = seconds
+        self.sent = 0
+        self.dropped = 0
+        self.latencies = []  # desde el instante programado, solo respuestas válidas
+        self.errors = Counter()
+        self.by_op = Counter()
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, op: str, latency: float, error: str = None):
+        with self._lock:
+            self.by_op[op] += 1
+            if error:
+                self.errors[error] += 1
+            else:
+                self.latencies.append(latency)
+
+    @property
+    def ok(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def failed(self) -> int:
+        return sum(self.errors.values())
+
+    @property
+    def throughput(self) -> float:
+        return self.ok / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        n = self.failed + self.dropped
+        return n / (self.sent + self.dropped) if self.sent + self.dropped else 0.0
+
+    def percentiles(self):
+        lat = sorted(self.latencies)
+        return {p: percentile(lat, p) for p in (50, 95, 99)} | {"max": lat[-1] if lat else 0.0}
+
+    def as_dict(self) -> dict:
+        return {"rate": self.rate, "seconds": self.seconds, "sent": self.sent, "ok": self.ok,
+                "dropped": self.dropped, "errors": dict(self.errors), "throughput": round(self.throughput, 3),
+                "error_rate": round(self.error_rate, 4), "by_operation": dict(self.by_op),
+                "latency": {str(k): round(v, 4) for k, v in self.percentiles().items()}}
+
+
+class LoadGenerator:
+    """
+    Dispara Operations contra `base` a tasa fija por paso. Usa su propio
+    HttpPool (sin reintentos, breaker ni topes adaptativos: interesa ver
+    cómo responde el servidor tal cual) con hasta `max_inflight` requests
+    en vuelo.
+    """
+
+    def __init__(self, base: str, ops: dict, mix: dict, timeout: float = 15, max_inflight: int = 256,
+                 poisson: bool = True, seed: int = None):
+        self.base = base.rstrip("/")
+        self.timeout = timeout
+        self.max_inflight = max_inflight
+        self.poisson = poisson
+        self.random = random.Random(seed)
+        self.pool = HttpPool(pool_hosts=4, pool_size=max_inflight)
+        self.names = [n for n in mix if ops.get(n) and mix[n] > 0]
+        self.weights = [mix[n] for n in self.names]
+        self.ops = ops
+        if not self.names:
+            raise ValueError("no hay operaciones para generar carga (¿el servidor no tiene ValueSet/ConceptMap?)")
+        self._inflight = 0
+        self._lock = threading.Lock()
+
+    def _pick(self) -> Operation:
+        name = self.random.choices(self.names, self.weights)[0]
+        return self.random.choice(self.ops[name])
+
+    def _fire(self, op: Operation, scheduled: float, step: StepResult):
+        error = None
+        try:
+            r = self.pool.get(f"{self.base}/{op.query}", self.timeout)
+            if r.status_code != 200:
+                error = f"HTTP {r.status_code}"
+            elif op.parse(r.content) is None:
+                error = "respuesta inválida"
+        except requests.Timeout:
+            error = "timeout"
+        except requests.ConnectionError:
+            error = "conexión"
+        except ValueError:
+            error = "JSON inválido"
+        except requests.RequestException as e:
+            error = type(e).__name__
+        except Exception as e:
+            # Un fallo inesperado también es un request fallido: sin esto el
+            # hilo muere en silencio y el paso cuenta enviados que nunca vuelven
+            error = type(e).__name__
+        finally:
+            with self._lock:
+                self._inflight -= 1
+            step.add(op.name, time.perf_counter() - scheduled, error)
+
+    def run_step(self, rate: float, seconds: float) -> StepResult:
+        step = StepResult(rate, seconds)
+        pool = ThreadPoolExecutor(max_workers=self.max_inflight)
+        start = time.perf_counter()
+        t = 0.0
+        try:
+            while True:
+                t += self.random.expovariate(rate) if self.poisson else 1.0 / rate
+                if t >= seconds:
+                    break
+                delay = start + t - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                with self._lock:
+                    if self._inflight >= self.max_inflight:
+                        step.dropped += 1
+                        continue
+                    self._inflight += 1
+                step.sent += 1
+                pool.submit(self._fire, self._pick(), start + t, step)
+        finally:
+            pool.shutdown(wait=True)
+        step.elapsed = max(seconds, time.perf_counter() - start)
+        return step
@@ -0,0 +1,180 @@
+"""
+Latencias de cada request HTTP, agrupadas por servidor, operación y recurso.
+
+Registrar cuesta dos perf_counter() y un append bajo lock; los percentiles
+se calculan recién al exportar (JSON, textfile de Prometheus o resumen).
+"""
+import json
+import math
+import os
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+OPERATIONS = ("$expand", "$lookup", "$translate", "$validate-code")
+
+
+def operation_of(url: str) -> str:
+    """Operación FHIR de una URL: metadata, load-package, $expand/$lookup/..., search, read o batch."""
+    u = urllib.parse.urlsplit(url)
+    path = urllib.parse.unquote(u.path).rstrip("/")
+    last = path.rsplit("/", 1)[-1]
+    if last in OPERATIONS:
+        return last
+    if last in ("metadata", "load-package"):
+        return last
+    parts = [p for p in path.split("/") if p]
+    if len(parts) >= 2 and parts[-2][:1].isupper():
+        return "read"
+    return "search" if parts and parts[-1][:1].isupper() else "batch"
+
+
+def resource_of(url: str) -> str:
+    """Recurso consultado: el canonical de ?url=, el system de $lookup, o Tipo[/id]."""
+    u = urllib.parse.urlsplit(url)
+    q = urllib.parse.parse_qs(u.query)
+    for key in ("url", "system"):
+        if q.get(key):
+            return q[key][0]
+    parts = [p for p in urllib.parse.unquote(u.path).split("/") if p]
+    for i, p in enumerate(parts):
+        if p[:1].isupper():
+            return "/".join(x for x in parts[i:i + 2] if not x.startswith("$"))
+    return ""
+
+
+def percentile(sorted_samples, p: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_samples:
+        return 0.0
+    k = max(0, math.ceil(p / 100 * len(sorted_samples)) - 1)
+    return sorted_samples[k]
+
+
+class _Series:
+    __slots__ = ("samples", "bytes", "errors")
+
+    def __init__(self):
+        self.samples = []
+        self.bytes = 0
+        self.errors = 0
+
+
+class Metrics:
+    """Recolector thread-safe de latencias por (servidor, operación, recurso)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self.started = time.time()
+
+    def record(self, server: str, url: str, seconds: float, nbytes: int, ok: bool):
+        key = (server, operation_of(url), resource_of(url))
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = _Series()
+            s.samples.append(seconds)
+            s.bytes += nbytes
+            if not ok:
+                s.errors += 1
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+            self.started = time.time()
+
+    def rows(self, group=("server", "operation", "resource"), server: str = None):
+        """
+        Agrega las series por las columnas de `group` y devuelve dicts con
+        count/errors/bytes/p50/p95/p99/max (segundos), ordenados por clave.
+        """
+        idx = {"server": 0, "operation": 1, "resource": 2}
+        with self._lock:
+            merged = {}
+            for key, s in self._series.items():
+                if server is not None and key[0] != server:
+                    continue
+                gkey = tuple(key[idx[g]] for g in group)
+                m = merged.setdefault(gkey, [[], 0, 0])
+                m[0].extend(s.samples)
+                m[1] += s.bytes
+                m[2] += s.errors
+        out = []
+        for gkey in sorted(merged):
+            samples, nbytes, errors = merged[gkey]
+            samples.sort()
+            row = dict(zip(group, gkey))
+            row.update(count=len(samples), errors=errors, bytes=nbytes,
+                       p50=round(percentile(samples, 50), 6), p95=round(percentile(samples, 95), 6),
+                       p99=round(percentile(samples, 99), 6), max=round(samples[-1] if samples else 0.0, 6),
+                       sum=round(sum(samples), 6))
+            out.append(row)
+        return out
+
+    def summary_lines(self, server: str):
+        """Resumen corto por operación para el reporte de un país."""
+        lines = []
+        for r in self.rows(group=("operation",), server=server):
+            lines.append(
+                f"[LATENCIA] {r['operation']}: n={r['count']} err={r['errors']} "
+                f"p50={r['p50'] * 1000:.0f}ms p95={r['p95'] * 1000:.0f}ms "
+                f"p99={r['p99'] * 1000:.0f}ms max={r['max'] * 1000:.0f}ms bytes={r['bytes']}")
+        return lines
+
+    def write_json(self, path: Path):
+        data = {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started)),
+            "finished": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "series": self.rows(),
+        }
+        _write_atomic(path, json.dumps(data, ensure_ascii=False, indent=2) + "\n")
+
+    def write_prometheus(self, path: Path):
+        """Textfile para el textfile collector de node_exporter."""
+        out = [
+            "# HELP ph4h_http_request_seconds Latencia de requests FHIR.",
+            "# TYPE ph4h_http_request_seconds summary",
+        ]
+        rows = self.rows()
+        for r in rows:
+            lbl = _labels(r)
+            for q in ("50", "95", "99"):
+                out.append(f'ph4h_http_request_seconds{{{lbl},quantile="0.{q}"}} {r["p" + q]:.6f}')
+            out.append(f"ph4h_http_request_seconds_sum{{{lbl}}} {r['sum']:.6f}")
+            out.append(f"ph4h_http_request_seconds_count{{{lbl}}} {r['count']}")
+        out += ["# HELP ph4h_http_request_seconds_max Latencia máxima observada.",
+                "# TYPE ph4h_http_request_seconds_max gauge"]
+        out += [f"ph4h_http_request_seconds_max{{{_labels(r)}}} {r['max']:.6f}" for r in rows]
+        out += ["# HELP ph4h_http_response_bytes_total Bytes de respuesta (descomprimidos).",
+                "# TYPE ph4h_http_response_bytes_total counter"]
+        out += [f"ph4h_http_response_bytes_total{{{_labels(r)}}} {r['bytes']}" for r in rows]
+        out += ["# HELP ph4h_http_request_errors_total Requests fallidos.",
+                "# TYPE ph4h_http_request_errors_total counter"]
+        out += [f"ph4h_http_request_errors_total{{{_labels(r)}}} {r['errors']}" for r in rows]
+        out += ["# HELP ph4h_sweep_timestamp_seconds Fin del último barrido.",
+                "# TYPE ph4h_sweep_timestamp_seconds gauge",
+                f"ph4h_sweep_timestamp_seconds {time.time():.0f}"]
+        _write_atomic(path, "\n".join(out) + "\n")
+
+    def export(self, directory: Path):
+        """Escribe metrics.json y ph4h.prom en `directory`."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.write_json(directory / "metrics.json")
+        self.write_prometheus(directory / "ph4h.prom")
+
+
+def _labels(row) -> str:
+    def esc(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{k}="{esc(row[k])}"' for k in ("server", "operation", "resource"))
+
+
+def _write_atomic(path: Path, text: str):
+    # node_exporter puede leer en cualquier momento: escribir aparte y renombrar
+    tmp = Path(f"{path}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
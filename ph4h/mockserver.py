@@ -0,0 +1,372 @@
+"""
+Servidor de terminología FHIR simulado, para medir los checks sin depender
+de los servidores de cada país.
+
+Sirve desde fixtures (carpetas de JSON como giis/ y prequal/, o paquetes
+.tgz) lo que usan check-cs/vs/cm, diff-package.py y upload-package.py:
+
+  GET  /fhir/metadata
+  GET  /fhir/<Tipo>?url=&version=&name=&_elements=&_count=&_summary=count  (paginado)
+  GET  /fhir/<Tipo>/<id>
+  GET  /fhir/CodeSystem/$lookup?system=&code=
+  GET  /fhir/ValueSet/$expand?url=&offset=&count=   y   /fhir/ValueSet/<id>/$expand
+  GET  /fhir/ConceptMap/$translate?url=&system=&code=
+  POST /fhir                         (Bundle batch con GETs)
+  POST /fhir-admin/load-package      (acepta y descarta el .tgz)
+
+La latencia (con jitter), la tasa de errores 503, el tamaño de página y el
+relleno de cada respuesta se configuran con MockConfig.
+"""
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from .package import KINDS, iter_resources
+
+# Fixtures por defecto: GIIS, PreQual y un paquete de país, resueltos contra la raíz
+# del repo para que mock-server.py, load-test.py --mock y los bench anden desde cualquier carpeta
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_FIXTURES = tuple(str(REPO_ROOT / p) for p in
+                         ("giis", "prequal", "packages/BAHAMAS-ALLEN-racsel_fhir_package.tgz"))
+
+# Sistemas que un Snowstorm real trae cargados aunque no vengan en los fixtures
+BUILTIN_SYSTEMS = ("http://snomed.info/sct",)
+
+
+class MockConfig:
+    """Comportamiento del servidor simulado (todo en segundos / bytes)."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 page_size: int = 20, max_page: int = 1000, pad_bytes: int = 0, lenient_lookup: bool = True,
+                 batch: bool = True, seed: int = None, capacity: int = 0, retry_after: float = 1.0):
+        self.latency = latency          # demora base de cada respuesta
+        self.jitter = jitter            # ± uniforme sobre la latencia
+        self.error_rate = error_rate    # probabilidad de responder 503
+        self.page_size = page_size      # _count por defecto de los search
+        self.max_page = max_page        # tope de _count / count
+        self.pad_bytes = pad_bytes      # relleno (text.div) agregado a cada recurso devuelto
+        self.lenient_lookup = lenient_lookup  # $lookup de un código desconocido en un sistema conocido responde igual
+        self.batch = batch              # False = POST /fhir responde 400 (servidor sin batch)
+        self.capacity = capacity        # requests simultáneos que atiende; por encima, 429 (0 = sin tope)
+        self.retry_after = retry_after  # Retry-After de esos 429
+        self.random = random.Random(seed)
+
+
+def _load(paths):
+    """{tipo: {id: recurso}} de carpetas de JSON y paquetes .tgz."""
+    store = {k: {} for k in KINDS}
+    for p in paths:
+        p = Path(p)
+        if p.is_dir():
+            items = []
+            for f in sorted(p.rglob("*.json")):
+                if f.name in ("package.json", ".index.json") or f.name.startswith("."):
+                    continue
+                try:
+                    with open(f, "r", encoding="utf-8") as fh:
+                        items.append((str(f), json.load(fh)))
+                except ValueError:
+                    continue
+        else:
+            items = iter_resources(p)
+        for name, res in items:
+            kind = res.get("resourceType") if isinstance(res, dict) else None
+            if kind in store:
+                rid = res.get("id") or Path(name).stem
+                res = dict(res, id=rid)
+                res.setdefault("meta", {"versionId": "1", "lastUpdated": "2025-01-01T00:00:00Z"})
+                store[kind][rid] = res
+    return store
+
+
+def _cs_concepts(concepts):
+    stack = list(reversed(concepts or []))
+    while stack:
+        c = stack.pop() or {}
+        if c.get("code") is not None:
+            yield c
+        stack.extend(reversed(c.get("concept") or []))
+
+
+class MockTerminology:
+    """Índices sobre los fixtures y las respuestas FHIR (sin nada de HTTP)."""
+
+    def __init__(self, paths):
+        self.store = _load(paths)
+        self.by_url = {k: {} for k in KINDS}
+        for kind, items in self.store.items():
+            for res in items.values():
+                if res.get("url"):
+                    self.by_url[kind].setdefault(res["url"], res)
+        self.codes = {}  # url de CodeSystem -> {code: display}
+        for cs in self.store["CodeSystem"].values():
+            self.codes.setdefault(cs.get("url"), {}).update(
+                (str(c["code"]), c.get("display") or "") for c in _cs_concepts(cs.get("concept")))
+        for url in BUILTIN_SYSTEMS:
+            if url not in self.by_url["CodeSystem"]:
+                rid = url.rstrip("/").rsplit("/", 1)[-1]
+                cs = {"resourceType": "CodeSystem", "id": rid, "url": url, "status": "active",
+                      "content": "not-present", "meta": {"versionId": "1", "lastUpdated": "2025-01-01T00:00:00Z"}}
+                self.store["CodeSystem"][rid] = self.by_url["CodeSystem"][url] = cs
+                self.codes.setdefault(url, {})
+        self._expansions = {}
+        self._lock = threading.Lock()
+
+    def expansion(self, vs: dict):
+        """Conceptos planos (system, code, display) de compose.include, con cache por ValueSet."""
+        key = vs.get("id")
+        with self._lock:
+            if key in self._expansions:
+                return self._expansions[key]
+        out = []
+        for inc in ((vs.get("compose") or {}).get("include") or []):
+            system = inc.get("system") or ""
+            concepts = inc.get("concept")
+            if concepts is None:  # sistema completo
+                concepts = [{"code": c, "display": d} for c, d in self.codes.get(system, {}).items()]
+            for c in concepts:
+                if c.get("code") is not None:
+                    item = {"system": system, "code": str(c["code"])}
+                    if c.get("display"):
+                        item["display"] = c["display"]
+                    out.append(item)
+        with self._lock:
+            self._expansions[key] = out
+        return out
+
+    def translate(self, cm: dict, system: str, code: str):
+        matches = []
+        for g in (cm.get("group") or []):
+            if system and g.get("source") and g["source"] != system:
+                continue
+            for e in (g.get("element") or []):
+                if str(e.get("code")) == code:
+                    for t in (e.get("target") or []):
+                        matches.append({"name": "match", "part": [
+                            {"name": "equivalence", "valueCode": t.get("equivalence") or t.get("relationship") or "equivalent"},
+                            {"name": "concept", "valueCoding": {"system": g.get("target"), "code": t.get("code"),
+                                                               "display": t.get("display")}}]})
+        return {"resourceType": "Parameters",
+                "parameter": [{"name": "result", "valueBoolean": bool(matches)}] + matches}
+
+    def lookup(self, system: str, code: str, lenient: bool):
+        codes = self.codes.get(system)
+        if codes is None or (code not in codes and not lenient):
+            return None
+        return {"resourceType": "Parameters", "parameter": [
+            {"name": "name", "valueString": system},
+            {"name": "display", "valueString": codes.get(code) or code}]}
+
+
+def _outcome(message: str):
+    return {"resourceType": "OperationOutcome",
+            "issue": [{"severity": "error", "code": "processing", "diagnostics": message}]}
+
+
+def _project(res: dict, elements: str):
+    keep = {e.strip() for e in elements.split(",") if e.strip()} | {"resourceType", "id", "meta"}
+    return {k: v for k, v in res.items() if k in keep}
+
+
+class MockServer:
+    """
+    Un servidor simulado escuchando en host:port (0 = puerto libre), en un
+    hilo aparte. Usar con `with` o start()/stop(); la URL FHIR queda en .base.
+    """
+
+    def __init__(self, fixtures, config: MockConfig = None, host: str = "127.0.0.1", port: int = 0,
+                 terminology: MockTerminology = None):
+        self.config = config or MockConfig()
+        self.term = terminology or MockTerminology(fixtures)
+        self.requests = 0
+        self.bytes = 0
+        self.inflight = 0
+        self.rejected = 0  # 429 por exceder capacity
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self.httpd.daemon_threads = True
+        self.base = f"http://{host}:{self.httpd.server_address[1]}/fhir"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _enter(self) -> bool:
+        with self._lock:
+            if self.config.capacity and self.inflight >= self.config.capacity:
+                self.rejected += 1
+                return False
+            self.inflight += 1
+            return True
+
+    def _leave(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def _count(self, nbytes: int):
+        with self._lock:
+            self.requests += 1
+            self.bytes += nbytes
+
+    # ----------------- Rutas -----------------
+    def get(self, path: str, q: dict, host: str):
+        """(status, cuerpo) de un GET relativo a /fhir."""
+        parts = [urllib.parse.unquote(p) for p in path.split("/") if p]
+        term, cfg = self.term, self.config
+        if parts == ["metadata"]:
+            return 200, {"resourceType": "CapabilityStatement", "status": "active", "kind": "instance",
+                         "fhirVersion": "4.0.1", "format": ["json"]}
+        if len(parts) == 2 and parts[0] == "CodeSystem" and parts[1] == "$lookup":
+            res = term.lookup(q.get("system", ""), q.get("code", ""), cfg.lenient_lookup)
+            return (200, res) if res else (404, _outcome("código no encontrado"))
+        if parts[:1] == ["ValueSet"] and parts[-1:] == ["$expand"] and len(parts) in (2, 3):
+            vs = term.store["ValueSet"].get(parts[1]) if len(parts) == 3 else term.by_url["ValueSet"].get(q.get("url"))
+            if not vs:
+                return 404, _outcome("ValueSet no encontrado")
+            concepts = term.expansion(vs)
+            offset = int(q.get("offset") or 0)
+            count = min(int(q.get("count") or q.get("_count") or cfg.max_page), cfg.max_page)
+            return 200, {"resourceType": "ValueSet", "id": vs.get("id"), "url": vs.get("url"),
+                         "expansion": {"total": len(concepts), "offset": offset,
+                                       "contains": concepts[offset:offset + count]}}
+        if parts == ["ConceptMap", "$translate"]:
+            cm = term.by_url["ConceptMap"].get(q.get("url"))
+            if not cm:
+                return 404, _outcome("ConceptMap no encontrado")
+            return 200, term.translate(cm, q.get("system", ""), q.get("code", ""))
+        if len(parts) == 2 and parts[0] in KINDS:
+            res = term.store[parts[0]].get(parts[1])
+            return (200, self._pad(res)) if res else (404, _outcome("no encontrado"))
+        if len(parts) == 1 and parts[0] in KINDS:
+            return 200, self._search(parts[0], q, host)
+        return 404, _outcome(f"ruta no soportada: /{'/'.join(parts)}")
+
+    def _search(self, kind: str, q: dict, host: str):
+        items = list(self.term.store[kind].values())
+        if q.get("url"):
+            items = [r for r in items if r.get("url") == q["url"]]
+        if q.get("version"):
+            items = [r for r in items if r.get("version") == q["version"]]
+        if q.get("name"):
+            items = [r for r in items if (r.get("name") or "").lower().startswith(q["name"].lower())]
+        if q.get("_summary") == "count":
+            return {"resourceType": "Bundle", "type": "searchset", "total": len(items)}
+        offset = int(q.get("_getpagesoffset") or 0)
+        count = min(int(q.get("_count") or self.config.page_size), self.config.max_page)
+        page = items[offset:offset + count]
+        if q.get("_elements"):
+            page = [_project(r, q["_elements"]) for r in page]
+        else:
+            page = [self._pad(r) for r in page]
+        links = []
+        if offset + count < len(items):
+            nq = dict(q, _getpagesoffset=offset + count, _count=count)
+            links.append({"relation": "next", "url": f"http://{host}/fhir/{kind}?{urllib.parse.urlencode(nq)}"})
+        return {"resourceType": "Bundle", "type": "searchset", "total": len(items), "link": links,
+                "entry": [{"fullUrl": f"http://{host}/fhir/{kind}/{r.get('id')}", "resource": r} for r in page]}
+
+    def _pad(self, res: dict):
+        if not self.config.pad_bytes:
+            return res
+        return dict(res, text={"status": "generated",
+                               "div": f'<div xmlns="http://www.w3.org/1999/xhtml">{"x" * self.config.pad_bytes}</div>'})
+
+    def batch(self, bundle: dict, host: str):
+        if not self.config.batch:
+            return 400, _outcome("batch no soportado")
+        if not isinstance(bundle, dict) or bundle.get("resourceType") != "Bundle" or bundle.get("type") != "batch":
+            return 400, _outcome("se esperaba un Bundle batch")
+        entries = []
+        for e in (bundle.get("entry") or []):
+            req = e.get("request") or {}
+            u = urllib.parse.urlsplit(req.get("url") or "")
+            if (req.get("method") or "GET") != "GET":
+                status, body = 405, _outcome("solo GET en batch")
+            else:
+                status, body = self.get(u.path, dict(urllib.parse.parse_qsl(u.query)), host)
+            entries.append({"resource": body, "response": {"status": f"{status} {'OK' if status < 400 else 'Error'}"}})
+        return 200, {"resourceType": "Bundle", "type": "batch-response", "entry": entries}
+
+
+def _handler(server: MockServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # wfile con buffer: headers y cuerpo salen en un solo write. Sin buffer
+        # van en dos y, con keep-alive, Nagle + delayed ACK demoran ~40 ms cada request.
+        wbufsize = -1
+
+        def log_message(self, *args):
+            pass
+
+        def _delay_or_fail(self) -> bool:
+            cfg = server.config
+            if not server._enter():
+                self._send(429, _outcome("demasiados requests simultáneos"),
+                           {"Retry-After": f"{cfg.retry_after:g}"})
+                return True
+            try:
+                d = cfg.latency + (cfg.random.uniform(-cfg.jitter, cfg.jitter) if cfg.jitter else 0.0)
+                if d > 0:
+                    time.sleep(d)
+            finally:
+                server._leave()
+            if cfg.error_rate and cfg.random.random() < cfg.error_rate:
+                self._send(503, _outcome("error simulado"))
+                return True
+            return False
+
+        def _send(self, status: int, body: dict, headers: dict = None):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.send_header("Content-Type", "application/fhir+json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            self.wfile.flush()
+            server._count(len(data))
+
+        def do_GET(self):
+            if self._delay_or_fail():
+                return
+            u = urllib.parse.urlsplit(self.path)
+            if not (u.path == "/fhir" or u.path.startswith("/fhir/")):
+                return self._send(404, _outcome("fuera de /fhir"))
+            self._send(*server.get(u.path[len("/fhir"):], dict(urllib.parse.parse_qsl(u.query)),
+                                   self.headers.get("Host", "")))
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self._delay_or_fail():
+                return
+            path = urllib.parse.urlsplit(self.path).path.rstrip("/")
+            if path.endswith("/fhir-admin/load-package"):
+                return self._send(200, {"resourceType": "OperationOutcome", "issue": [
+                    {"severity": "information", "code": "informational",
+                     "diagnostics": f"paquete recibido ({len(body)} bytes)"}]})
+            if path != "/fhir":
+                return self._send(404, _outcome("fuera de /fhir"))
+            try:
+                bundle = json.loads(body)
+            except ValueError:
+                return self._send(400, _outcome("JSON inválido"))
+            self._send(*server.batch(bundle, self.headers.get("Host", "")))
+
+    return Handler
@@ -0,0 +1,337 @@
+"""
+Paquetes FHIR (.tgz): lectura en streaming y construcción reproducible.
+
+index_package() recorre el tar una sola vez ("r|gz") y arma un índice
+compacto: (tipo, canonical) -> versión, id y el set de códigos del
+artefacto. Lo que no es CodeSystem/ValueSet/ConceptMap se ignora.
+
+build_package() escribe package.json, .index.json y los recursos directo
+al tar (TarInfo en memoria, sin carpetas temporales ni subprocesos), con
+metadatos fijos para que las mismas fuentes den el mismo .tgz byte a byte,
+y una cache por sha256 de cada fuente para no re-parsear lo que no cambió.
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import tarfile
+from datetime import datetime
+from pathlib import Path
+
+KINDS = ("CodeSystem", "ValueSet", "ConceptMap")
+
+
+class Artifact:
+    """Lo mínimo de un CodeSystem/ValueSet/ConceptMap para compararlo."""
+    __slots__ = ("kind", "url", "version", "id", "codes", "path")
+
+    def __init__(self, kind: str, url: str, version: str, rid: str, codes, path: str = ""):
+        self.kind = kind
+        self.url = url
+        self.version = version
+        self.id = rid
+        self.codes = codes
+        self.path = path
+
+
+def _cs_codes(concepts, out: set):
+    # Conceptos anidados (jerarquías) sin recursión
+    stack = list(concepts or [])
+    while stack:
+        c = stack.pop() or {}
+        if c.get("code") is not None:
+            out.add(str(c["code"]))
+        stack.extend(c.get("concept") or [])
+    return out
+
+
+def codes_of(res: dict) -> frozenset:
+    """
+    Códigos de un recurso: CodeSystem -> code; ValueSet -> system|code de
+    compose.include[].concept; ConceptMap -> system|code de cada element origen.
+    """
+    kind = res.get("resourceType")
+    out = set()
+    if kind == "CodeSystem":
+        _cs_codes(res.get("concept"), out)
+    elif kind == "ValueSet":
+        for inc in ((res.get("compose") or {}).get("include") or []):
+            system = inc.get("system") or ""
+            out.update(f"{system}|{c.get('code')}" for c in (inc.get("concept") or []) if c.get("code") is not None)
+    elif kind == "ConceptMap":
+        for g in (res.get("group") or []):
+            source = g.get("source") or ""
+            out.update(f"{source}|{e.get('code')}" for e in (g.get("element") or []) if e.get("code") is not None)
+    return frozenset(out)
+
+
+def artifact_of(res: dict, path: str = "") -> Artifact:
+    """Artifact de un recurso ya decodificado, o None si no es un tipo indexable o no tiene url."""
+    if not isinstance(res, dict) or res.get("resourceType") not in KINDS or not res.get("url"):
+        return None
+    return Artifact(res["resourceType"], res["url"].strip(), res.get("version") or "",
+                    res.get("id") or "", codes_of(res), path)
+
+
+def iter_resources(path):
+    """(nombre del miembro, recurso) de cada .json del paquete, en el orden del tar."""
+    with tarfile.open(path, "r|gz") as tar:
+        for member in tar:
+            if not member.isfile() or not member.name.endswith(".json"):
+                continue
+            base = member.name.rsplit("/", 1)[-1]
+            if base in ("package.json", ".index.json"):
+                continue
+            f = tar.extractfile(member)
+            try:
+                yield member.name, json.load(f)
+            except ValueError:
+                continue  # JSON inválido: lo reporta el linter, no el índice
+
+
+def index_package(path) -> dict:
+    """{(tipo, canonical): Artifact} de un paquete .tgz, en una sola pasada."""
+    index = {}
+    for name, res in iter_resources(path):
+        a = artifact_of(res, name)
+        if a is not None:
+            index[(a.kind, a.url)] = a
+    return index
+
+
+def package_manifest(path) -> dict:
+    """package.json del paquete ({} si no lo trae); suele ser el primer miembro del tar."""
+    with tarfile.open(path, "r|gz") as tar:
+        for member in tar:
+            if member.isfile() and member.name.rsplit("/", 1)[-1] == "package.json":
+                try:
+                    return json.load(tar.extractfile(member))
+                except ValueError:
+                    return {}
+    return {}
+
+
+# ----------------- Construcción -----------------
+# mtime fijo de los miembros del tar: mismas fuentes -> mismo .tgz byte a byte
+SOURCE_DATE_EPOCH = int(os.environ.get("SOURCE_DATE_EPOCH", "0"))
+
+
+def is_resource_file(name: str) -> bool:
+    return name.endswith(".json") and not name.startswith((".", "package", "index"))
+
+
+def list_dir(source_dir: Path):
+    """
+    Un solo recorrido de la carpeta: (ruta en el paquete, ruta) de cada JSON
+    FHIR, ordenados para que el paquete no dependa del orden de os.walk.
+    """
+    source_dir = Path(source_dir)
+    found = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = [d for d in dirs if not d.startswith((".", "__"))]
+        for file in files:
+            if is_resource_file(file):
+                path = Path(root) / file
+                found.append((path.relative_to(source_dir).as_posix(), path))
+    return sorted(found)
+
+
+class PackageSpec:
+    """
+    Qué va en un paquete: el manifiesto y las fuentes [(ruta en el paquete, ruta)].
+    Una fuente sin ruta en el paquete va a <resourceType>/<nombre del archivo>;
+    en lugar de una ruta puede venir el contenido (bytes) de un recurso generado.
+    cache=False desactiva la cache de índice.
+    """
+
+    def __init__(self, name: str, version: str, output, sources, description: str = "",
+                 author: str = "", url: str = "", fhir_version: str = "4.0.1", dependencies: dict = None,
+                 cache=None):
+        self.name = name
+        self.version = datetime.now().strftime("%Y.%m.%d") if version == "today" else version
+        self.output = Path(output)
+        self.sources = sources
+        self.description = description
+        self.author = author
+        self.url = url
+        self.fhir_version = fhir_version
+        self.dependencies = dependencies or {}
+        self.cache = (None if cache is False else Path(cache) if cache
+                      else self.output.parent / f".{self.output.stem}-build-cache.json")
+
+    @classmethod
+    def from_dict(cls, d: dict, root: Path = Path(".")):
+        """
+        Entrada de la configuración de build-package.py: "directory" (todo su
+        contenido) y/o "files" (rutas sueltas); rutas relativas a `root`.
+        """
+        root = Path(root)
+        sources = list_dir(root / d["directory"]) if d.get("directory") else []
+        sources += [(None, root / f) for f in (d.get("files") or [])]
+        return cls(d["name"], d.get("version", "1.0.0"), root / d["output"], sources,
+                   description=d.get("description", ""), author=d.get("author", ""), url=d.get("url", ""),
+                   fhir_version=d.get("fhirVersion", "4.0.1"), dependencies=d.get("dependencies"),
+                   cache=root / d["cache"] if d.get("cache") else None)
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _source_sha256(src) -> str:
+    return hashlib.sha256(src).hexdigest() if isinstance(src, bytes) else file_sha256(src)
+
+
+def _load_cache(path: Path) -> dict:
+    if path is None:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path: Path, cache: dict):
+    if path is None:
+        return
+    tmp = Path(f"{path}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _tar_info(arcname: str, size: int) -> tarfile.TarInfo:
+    # Metadatos fijos (mtime, dueño, permisos) para que el tar sea reproducible
+    info = tarfile.TarInfo(arcname)
+    info.size = size
+    info.mtime = SOURCE_DATE_EPOCH
+    info.mode = 0o644
+    info.uid = info.gid = 0
+    info.uname = info.gname = ""
+    return info
+
+
+class _HashingWriter:
+    """Archivo de salida que calcula el sha256 de lo que se escribe."""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+
+
+def index_entries(hashed, cache: dict, log=print):
+    """
+    Entradas de .index.json de [(ruta en el paquete, ruta, sha256)]. Las
+    fuentes cuyo sha256 ya está en la cache no se vuelven a parsear.
+    Devuelve (entradas con su ruta, cache nueva, cantidad parseada).
+    """
+    known = cache.get("entries") or {}
+    entries, new_cache, parsed = [], {}, 0
+    for arcname, path, digest in hashed:
+        entry = known.get(digest)
+        if entry is None:
+            try:
+                if isinstance(path, bytes):
+                    data = json.loads(path)
+                else:
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+            except Exception as e:
+                log(f"⚠️  Error leyendo {arcname if isinstance(path, bytes) else path}: {e}")
+                continue
+            parsed += 1
+            entry = {"resourceType": data.get("resourceType", "Unknown"), "id": data.get("id", ""),
+                     "url": data.get("url", "")}
+            if data.get("version"):
+                entry["version"] = data["version"]
+        new_cache[digest] = entry
+        arcname = arcname or f"{entry['resourceType']}/{Path(path).name}"
+        entries.append((arcname, path, entry))
+    entries.sort(key=lambda e: e[0])
+    return entries, new_cache, parsed
+
+
+def build_package(spec: PackageSpec, compresslevel: int = 9, force: bool = False, log=print) -> bool:
+    """
+    Construye spec.output. Devuelve False si ya estaba al día: las fuentes
+    no cambiaron desde el último build, o el resultado salió idéntico.
+    """
+    out = spec.output
+    cache = {} if force else _load_cache(spec.cache)
+    hashed = [(arcname, path, _source_sha256(path)) for arcname, path in spec.sources]
+
+    # Huella de las entradas (manifiesto incluido): si coincide con la del
+    # último build y el .tgz sigue siendo el que se escribió, no hay nada que hacer.
+    manifest_key = json.dumps([spec.name, spec.version, spec.description, spec.author, spec.url,
+                               spec.fhir_version, spec.dependencies, compresslevel, SOURCE_DATE_EPOCH])
+    inputs = hashlib.sha256("\n".join([manifest_key] + [f"{a or Path(p).name}\t{d}" for a, p, d in hashed])
+                            .encode("utf-8")).hexdigest()
+    if (not force and cache.get("inputs") == inputs and out.exists()
+            and file_sha256(out) == cache.get("package_sha256")):
+        log(f"✅ Sin cambios: {out} ya está al día")
+        return False
+
+    entries, new_cache, parsed = index_entries(hashed, cache, log)
+    log(f"📦 Creando paquete: {out.name} ({len(entries)} recursos, {parsed} parseados, "
+        f"{len(entries) - parsed} desde la cache)")
+
+    files_info = [dict({"filename": arcname, "resourceType": e["resourceType"], "id": e["id"],
+                        "kind": e["resourceType"].lower(), "url": e["url"]},
+                       **({"version": e["version"]} if e.get("version") else {}))
+                  for arcname, _path, e in entries]
+    manifest = {
+        "name": spec.name,
+        "version": spec.version,
+        "description": spec.description,
+        "fhirVersion": spec.fhir_version,
+        "dependencies": spec.dependencies,
+        "author": spec.author,
+        "url": spec.url,
+        "resources": [{"type": e["resourceType"], "reference": arcname[:-len(".json")]}
+                      for arcname, _path, e in entries],
+    }
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(f"{out}.tmp")
+    with open(tmp, "wb") as raw:
+        hw = _HashingWriter(raw)
+        # Header gzip sin nombre ni fecha: parte del .tgz reproducible
+        with gzip.GzipFile(filename="", mode="wb", fileobj=hw, mtime=0, compresslevel=compresslevel) as gz:
+            with tarfile.open(fileobj=gz, mode="w", format=tarfile.GNU_FORMAT) as tar:
+                for arcname, doc in (("package/package.json", manifest),
+                                     ("package/.index.json", {"index-version": 1, "files": files_info})):
+                    data = json.dumps(doc, ensure_ascii=False, indent=2).encode("utf-8")
+                    tar.addfile(_tar_info(arcname, len(data)), io.BytesIO(data))
+                for arcname, path, _e in entries:
+                    if isinstance(path, bytes):
+                        tar.addfile(_tar_info(f"package/{arcname}", len(path)), io.BytesIO(path))
+                        continue
+                    with open(path, "rb") as f:
+                        tar.addfile(_tar_info(f"package/{arcname}", os.fstat(f.fileno()).st_size), f)
+    package_sha256 = hw.sha256.hexdigest()
+
+    changed = not (out.exists() and file_sha256(out) == package_sha256)
+    if changed:
+        os.replace(tmp, out)
+    else:
+        tmp.unlink()
+    _save_cache(spec.cache, {"inputs": inputs, "package_sha256": package_sha256, "entries": new_cache})
+    if not changed:
+        log(f"✅ Sin cambios: {out} es idéntico al anterior")
+        return False
+    log(f"✅ Paquete creado: {out} ({len(entries)} recursos, sha256 {package_sha256[:16]})")
+    return True
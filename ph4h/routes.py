@@ -0,0 +1,125 @@
+"""
+Elección de ruta cuando un país tiene varias URL base (directa, vía proxy, ...).
+
+race() pide /metadata a todas las rutas a la vez y se queda con la primera
+que responde un CapabilityStatement; a las demás les da un margen corto
+para registrar su latencia. RouteCache guarda la elección (y la latencia
+de cada ruta) en un JSON con TTL, así los barridos siguientes van directo
+a la ruta rápida sin volver a correr la carrera.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from .client import FhirClient, env, rtype
+
+ROUTE_TTL = float(env("ROUTE_TTL", "3600"))      # segundos que vale una elección
+ROUTE_TIMEOUT = float(env("ROUTE_TIMEOUT", "10"))  # timeout del /metadata de la carrera
+ROUTE_GRACE = 1.0  # segundos extra para medir las rutas perdedoras
+
+
+def race(client: FhirClient, bases, grace: float = ROUTE_GRACE):
+    """
+    (ruta ganadora o None, {ruta: segundos o None}) de una carrera de /metadata.
+    None en la latencia = falló o no respondió dentro del margen.
+    """
+    bases = [b.rstrip("/") for b in bases]
+    latencies = {b: None for b in bases}
+
+    def probe(base):
+        t0 = time.perf_counter()
+        meta = client.get_json(f"{base}/metadata")
+        return base, rtype(meta) == "CapabilityStatement", time.perf_counter() - t0
+
+    winner = None
+    pool = ThreadPoolExecutor(max_workers=len(bases))
+    try:
+        pending = {pool.submit(probe, b) for b in bases}
+        deadline = None
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break  # se acabó el margen: las que faltan quedan sin medir
+            for base, ok, secs in sorted((f.result() for f in done), key=lambda r: r[2]):
+                if ok:
+                    latencies[base] = secs
+                    if winner is None:
+                        winner = base
+                        deadline = time.monotonic() + grace
+    finally:
+        pool.shutdown(wait=False)
+    return winner, latencies
+
+
+def describe(chosen: str, latencies: dict) -> str:
+    def fmt(base):
+        secs = latencies.get(base)
+        return f"{base} ({'sin respuesta' if secs is None else f'{secs * 1000:.0f}ms'})"
+    others = [fmt(b) for b in latencies if b != chosen]
+    return fmt(chosen) + (f" | descartadas: {', '.join(others)}" if others else "")
+
+
+class RouteCache:
+    """Ruta elegida por país, con la latencia de cada candidata; persistida en JSON."""
+
+    def __init__(self, path=None, ttl: float = ROUTE_TTL):
+        self.path = Path(path) if path else None
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = {}
+        if self.path and self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {}
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def get(self, country: str, bases):
+        """Ruta vigente de `country` si se eligió entre estas mismas candidatas hace menos de ttl."""
+        with self._lock:
+            entry = self._data.get(country)
+        if (entry and sorted(entry.get("candidates") or []) == sorted(b.rstrip("/") for b in bases)
+                and time.time() - entry.get("chosen_at", 0) < self.ttl):
+            return entry
+        return None
+
+    def put(self, country: str, chosen: str, latencies: dict):
+        with self._lock:
+            self._data[country] = {"base": chosen, "chosen_at": time.time(),
+                                   "candidates": sorted(latencies), "latencies": latencies}
+            self._save()
+
+    def invalidate(self, country: str):
+        with self._lock:
+            if self._data.pop(country, None) is not None:
+                self._save()
+
+    def pick(self, client: FhirClient, country: str, bases, emit=print) -> str:
+        """Ruta para los checks de `country`: la de la cache o la ganadora de una carrera."""
+        bases = [b.rstrip("/") for b in bases]
+        if len(bases) == 1:
+            return bases[0]
+        entry = self.get(country, bases)
+        if entry:
+            age = time.time() - entry["chosen_at"]
+            emit(f"[INFO] Ruta (elegida hace {age:.0f}s): {describe(entry['base'], entry['latencies'])}")
+            return entry["base"]
+        winner, latencies = race(client, bases)
+        if winner is None:
+            emit(f"[WARN] Ninguna ruta respondió /metadata; se usa {bases[0]}")
+            return bases[0]
+        self.put(country, winner, latencies)
+        emit(f"[INFO] Ruta: {describe(winner, latencies)}")
+        return winner
@@ -0,0 +1,95 @@
+"""
+Recorrido de búsquedas FHIR paginadas (Bundle searchset).
+
+iter_entries() pide la primera página; si trae Bundle.total y su link next
+pagina por offset (_getpagesoffset de HAPI/Snowstorm, u _offset), arma las
+URLs de todas las páginas restantes y las pide en paralelo. Si no, sigue
+los link next de a uno. En ambos casos los recursos salen en el orden del
+servidor, página por página, a medida que llegan, para que quien los
+consume pueda ir trabajando sin esperar el listado completo.
+"""
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import FhirClient, env
+from .fhirjson import Bundle
+
+OFFSET_PARAMS = ("_getpagesoffset", "_offset")
+PAGE_CONCURRENCY = max(1, int(env("PAGE_CONCURRENCY", "4")))  # páginas pedidas a la vez
+
+
+class SearchError(Exception):
+    """Una página del listado no llegó; `why` es el motivo de corte del cliente (ver FhirClient.why)."""
+
+    def __init__(self, url: str, why: str = ""):
+        super().__init__(f"página no disponible: {url}{why}")
+        self.url = url
+        self.why = why
+
+
+def offset_urls(next_url: str, total: int):
+    """
+    URLs de las páginas que faltan, variando el offset del link next, o
+    None si el link no pagina por offset.
+    """
+    u = urllib.parse.urlsplit(next_url)
+    query = urllib.parse.parse_qsl(u.query, keep_blank_values=True)
+    params = dict(query)
+    key = next((k for k in OFFSET_PARAMS if k in params), None)
+    try:
+        start = int(params[key]) if key else 0
+        step = int(params.get("_count") or start)
+    except ValueError:
+        return None
+    if key is None or step <= 0:
+        return None
+    urls = []
+    for offset in range(start, total, step):
+        q = [(k, str(offset) if k == key else v) for k, v in query]
+        urls.append(urllib.parse.urlunsplit(u._replace(query=urllib.parse.urlencode(q))))
+    return urls
+
+
+def iter_entries(client: FhirClient, url: str, stats: dict = None, concurrency: int = None):
+    """
+    Recursos (entry[].resource) de todas las páginas de la búsqueda `url`.
+    `stats` (si se pasa) recibe "total" (Bundle.total de la primera página,
+    o None), "pages" y "parallel" (si las páginas se pidieron en paralelo)
+    apenas se conocen. Lanza SearchError si alguna página falla.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(total=None, pages=0, parallel=False)
+    page = client.get_as(url, Bundle.parse)
+    if not page:
+        raise SearchError(url, client.why())
+    stats["pages"] = 1
+    stats["total"] = page.total
+    nxt = page.next
+    urls = offset_urls(nxt, page.total) if nxt and page.total is not None else None
+    yield from page.resources
+
+    if urls:
+        stats["parallel"] = True
+
+        def fetch(u):
+            return u, client.get_as(u, Bundle.parse), client.why()
+
+        pool = ThreadPoolExecutor(max_workers=concurrency or PAGE_CONCURRENCY)
+        try:
+            for u, page, why in pool.map(fetch, urls):
+                if not page:
+                    raise SearchError(u, why)
+                stats["pages"] += 1
+                yield from page.resources
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        # Si el total se quedó corto, la última página todavía trae next
+        nxt = page.next
+
+    while nxt:
+        page = client.get_as(nxt, Bundle.parse)
+        if not page:
+            raise SearchError(nxt, client.why())
+        stats["pages"] += 1
+        yield from page.resources
+        nxt = page.next
@@ -0,0 +1,165 @@
+"""
+Carga de paquetes .tgz en Snowstorm (POST multipart a /fhir-admin/load-package).
+
+El cuerpo multipart se arma alrededor del archivo abierto y se envía de a
+bloques con su Content-Length, sin leer el .tgz entero a memoria. Antes de
+cargar se mira el registro de cargas (History.uploaded) y se confirma con
+unos pocos _summary=count que el servidor siga teniendo esa versión; si
+ambas cosas coinciden no se vuelve a cargar. Después de cargar se corre
+check_package() contra ese servidor.
+"""
+import io
+import os
+import time
+import uuid
+from pathlib import Path
+
+import requests
+
+from .checks import check_package
+from .client import BUDGET_EXHAUSTED, CIRCUIT_OPEN, BudgetExhausted, FhirClient, enc, env, host_port, overloaded, rtype
+from .history import History
+from .package import KINDS, file_sha256, index_package, package_manifest
+
+UPLOAD_TIMEOUT = float(env("UPLOAD_TIMEOUT", "600"))  # segundos de espera de la respuesta de load-package
+UPLOAD_RETRIES = int(env("UPLOAD_RETRIES", "2"))
+CONNECT_TIMEOUT = 10
+PROBES_PER_KIND = 3  # artefactos por tipo que se consultan para confirmar que la versión sigue cargada
+
+
+def load_package_url(base: str) -> str:
+    """http://host:8180/fhir -> http://host:8180/fhir-admin/load-package"""
+    root = base.rstrip("/")
+    if root.endswith("/fhir"):
+        root = root[:-len("/fhir")]
+    return f"{root}/fhir-admin/load-package"
+
+
+class MultipartFile:
+    """
+    multipart/form-data de solo lectura: campos de texto + el archivo, leído
+    del disco a medida que requests pide bloques. __len__ le da a requests
+    el Content-Length sin tener que armar el cuerpo en memoria.
+    """
+
+    def __init__(self, path, fields: dict, name: str = "file"):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        head = "".join(f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'
+                       for k, v in fields.items())
+        head += (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{Path(path).name}"\r\n'
+                 f"Content-Type: application/gzip\r\n\r\n")
+        tail = f"\r\n--{boundary}--\r\n".encode()
+        self._parts = [io.BytesIO(head.encode()), open(path, "rb"), io.BytesIO(tail)]
+        self._len = len(head.encode()) + os.path.getsize(path) + len(tail)
+        self.sent = 0
+
+    def __len__(self):
+        return self._len
+
+    def read(self, n: int = -1) -> bytes:
+        out = b""
+        while self._parts and (n is None or n < 0 or len(out) < n):
+            chunk = self._parts[0].read(-1 if n is None or n < 0 else n - len(out))
+            if not chunk:
+                self._parts.pop(0).close()
+                continue
+            out += chunk
+        self.sent += len(out)
+        return out
+
+    def close(self):
+        for part in self._parts:
+            part.close()
+        self._parts = []
+
+
+def server_holds(client: FhirClient, base: str, index: dict) -> bool:
+    """¿Siguen en el servidor unos pocos artefactos de cada tipo, con la versión del paquete?"""
+    for kind in KINDS:
+        for a in [a for a in index.values() if a.kind == kind][:PROBES_PER_KIND]:
+            url = f"{base}/{kind}?url={enc(a.url)}" + (f"&version={enc(a.version)}" if a.version else "") + "&_summary=count"
+            resp = client.get_json(url)
+            if rtype(resp) != "Bundle" or not int(resp.get("total") or 0):
+                return False
+    return True
+
+
+def post_package(client: FhirClient, url: str, path, timeout: float = None, retries: int = None):
+    """
+    Sube el .tgz con resourceUrls="*". Reintenta errores de conexión, timeouts,
+    429 y 5xx con el backoff del cliente; un 4xx corta en seco.
+    Devuelve (ok, detalle).
+    """
+    timeout = UPLOAD_TIMEOUT if timeout is None else timeout
+    retries = UPLOAD_RETRIES if retries is None else retries
+    host = host_port(url)
+    detail = ""
+    for attempt in range(retries + 1):
+        pause = 0.0
+        if not client.breaker.allow(host):
+            return False, CIRCUIT_OPEN.strip()
+        body = MultipartFile(path, {"resourceUrls": "*"})
+        t0 = time.perf_counter()
+        try:
+            with client.limits.slot(url, client.deadline):
+                r = client.pool.post_data(url, body, body.content_type, (CONNECT_TIMEOUT, timeout))
+        except BudgetExhausted:
+            return False, BUDGET_EXHAUSTED.strip()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            client.record(url, time.perf_counter() - t0, body.sent, False)
+            client.breaker.failure(host)
+            client.limits.overload(url)
+            detail = f"{type(e).__name__}: {str(e)[:200]}"
+        else:
+            client.breaker.success(host)
+            client.record(url, time.perf_counter() - t0, body.sent, r.ok)
+            if r.ok:
+                return True, f"HTTP {r.status_code}"
+            detail = f"HTTP {r.status_code}: {r.text[:200].strip()}"
+            if not overloaded(r.status_code):
+                return False, detail
+            pause = client._pause(r)
+            client.limits.overload(url, pause)
+        finally:
+            body.close()
+        if attempt < retries:
+            time.sleep(client._backoff(attempt, pause))
+    return False, detail
+
+
+def upload(client: FhirClient, base: str, path, history: History = None, force: bool = False,
+           check: bool = True, emit=print, admin_url: str = None, timeout: float = None,
+           retries: int = None) -> int:
+    """
+    Carga `path` en el servidor `base` (si hace falta) y lo verifica.
+    Devuelve 0 si el paquete quedó cargado y coincide con el servidor, 1 si no.
+    """
+    base = base.rstrip("/")
+    path = Path(path)
+    manifest = package_manifest(path)
+    name, version = manifest.get("name") or path.stem, manifest.get("version") or ""
+    sha = file_sha256(path)
+    index = index_package(path)
+    label = f"{name}@{version} ({path.name}, sha256 {sha[:16]})"
+
+    if not force and history is not None and history.uploaded(base, name, version) == sha:
+        if server_holds(client, base, index):
+            emit(f"[OK] {label}: ya cargado en {base}, se omite")
+            return 0
+        emit(f"[INFO] {label}: registrado como cargado pero el servidor no tiene la versión, se recarga")
+
+    url = admin_url or load_package_url(base)
+    size = path.stat().st_size
+    t0 = time.perf_counter()
+    ok, detail = post_package(client, url, path, timeout, retries)
+    secs = time.perf_counter() - t0
+    if not ok:
+        emit(f"[FAIL] {label}: carga en {url} falló ({detail})")
+        return 1
+    emit(f"[OK] {label}: cargado en {url} ({detail}, {size / 1e6:.1f} MB en {secs:.1f}s)")
+
+    rc = check_package(client, base, path, emit=emit, index=index) if check else 0
+    if rc == 0 and history is not None:
+        history.record_upload(base, name, version, sha)
+    return rc
@@ -0,0 +1,290 @@
+"""
+Planillas de subsets por país (spreadsheets/*.xlsx) -> recursos FHIR del paquete.
+
+read_workbook() lee cada hoja en modo read_only, fila por fila, y guarda
+solo los pares código/término de cada sistema; generate() arma a partir de
+eso los CodeSystem locales/RACSEL/CIE/PreQual, los ValueSet por categoría
+y globales, y los ConceptMap entre sistemas, con ids estables (uuid5 de
+la url) para que la misma planilla dé siempre el mismo paquete.
+
+openpyxl es opcional: solo hace falta para generar paquetes.
+"""
+import json
+import re
+import uuid
+from pathlib import Path
+
+try:
+    import openpyxl
+except ImportError:  # opcional
+    openpyxl = None
+
+VERSION = "2024"
+VS_BASE = "http://racsel.org/fhir/ValueSet"
+CM_BASE = "http://racsel.org/fhir/ConceptMap"
+
+# Sistema -> (canonical, etiqueta en nombres/urls de ConceptMap)
+SYSTEMS = {
+    "racsel": ("http://racsel.org/connectathon", "RACSEL"),
+    "snomed": ("http://snomed.info/sct", "SNOMED"),
+    "icd10": ("http://hl7.org/fhir/sid/icd-10", "CIE10"),
+    "icd11": ("http://id.who.int/icd/release/11/mms", "CIE11"),
+    "prequal": ("http://smart.who.int/pcmt-vaxprequal/CodeSystem/PreQualProductIDs", "PreQual"),
+    "local": (None, "Local"),  # la url sale de la fila "Local Code System" de la planilla
+}
+
+# ValueSet global de cada sistema
+GLOBAL_VS = {"local": "local-vs", "racsel": "racsel-vs", "snomed": "snomed-vs", "icd10": "cie10-vs",
+             "icd11": "cie11-vs", "prequal": "prequal-vs"}
+
+# Hoja (sin espacios sobrantes) -> (nombre de recurso, slug de ValueSet, slug de ConceptMap, etiqueta)
+CATEGORIES = {
+    "Antecedentes Personales": ("AntecedentesPersonales", "antecedentes-personales", "antecedentes", "Antecedentes"),
+    "Diagnósticos": ("Diagnosticos", "diagnosticos", "diagnosticos", "Diagnosticos"),
+    "Vacunas": ("Vacunas", "vacunas", "vacunas", "Vacunas"),
+    "Alergias": ("Alergias", "alergias", "alergias", "Alergias"),
+    "Medicación": ("Medicacion", "medicacion", "medicacion", "Medicacion"),
+    "Procedimientos": ("Procedimientos", "procedimientos", "procedimientos", "Procedimientos"),
+}
+
+# Encabezado de la columna de código -> sistema (el término va en la columna siguiente)
+HEADERS = {"code": "racsel", "local code": "local", "icd-10 code": "icd10", "icd-11 code": "icd11",
+           "snomed code": "snomed", "prequalcode": "prequal"}
+
+# ConceptMaps por categoría: ida y vuelta entre estos pares (si la categoría tiene ambos sistemas)
+CATEGORY_PAIRS = [("local", "racsel"), ("local", "snomed"), ("racsel", "snomed"),
+                  ("local", "icd10"), ("local", "icd11"), ("local", "prequal"),
+                  ("icd11", "prequal"), ("prequal", "snomed")]
+# ConceptMaps globales (todas las categorías juntas)
+GLOBAL_PAIRS = [("local", "racsel"), ("local", "snomed"), ("icd10", "snomed"), ("icd11", "snomed"),
+                ("local", "icd10"), ("local", "icd11")]
+
+
+def _code(v) -> str:
+    """Código de una celda: los números enteros (SNOMED) vienen como int/float."""
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    return str(v).strip()
+
+
+def _text(v) -> str:
+    return "" if v is None else str(v).strip()
+
+
+class Workbook:
+    """Lo que importa de una planilla: filas por categoría y el CodeSystem PreQual."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.categories = {}   # hoja -> [{sistema: (código, término)}]
+        self.local_urls = {}   # hoja -> url del CodeSystem local
+        self.prequal = []      # [(código, término)] de la hoja PreQualCodeSystem
+
+
+def read_workbook(path) -> Workbook:
+    """Lee la planilla en streaming (read_only, values_only), una fila a la vez."""
+    if openpyxl is None:
+        raise RuntimeError("❌ Falta openpyxl para leer planillas (pip install openpyxl)")
+    wb = Workbook(path)
+    book = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        local_default = None
+        for ws in book.worksheets:
+            title = ws.title.strip()
+            if title == "PreQualCodeSystem":
+                wb.prequal = _read_pairs(ws)
+            elif title in CATEGORIES:
+                rows, local_url = _read_category(ws)
+                wb.categories[title] = rows
+                if local_url:
+                    wb.local_urls[title] = local_url
+                    local_default = local_default or local_url
+        # Las hojas sin su propia fila "Local Code System" usan la de la primera que la trae
+        for title in wb.categories:
+            wb.local_urls.setdefault(title, local_default)
+    finally:
+        book.close()
+    if not any(wb.local_urls.values()):
+        raise ValueError(f"❌ {path}: no se encontró la fila 'Local Code System'")
+    return wb
+
+
+def _read_pairs(ws):
+    """Pares (código, término) bajo el encabezado "code" de la hoja."""
+    out, col = [], None
+    for row in ws.iter_rows(values_only=True):
+        if col is None:
+            lowered = [_text(c).lower() for c in row]
+            col = lowered.index("code") if "code" in lowered else None
+            continue
+        code = _code(row[col]) if col < len(row) else ""
+        if code:
+            out.append((code, _text(row[col + 1]) if col + 1 < len(row) else ""))
+    return out
+
+
+def _read_category(ws):
+    rows, cols, local_url = [], None, None
+    for row in ws.iter_rows(values_only=True):
+        cells = [_text(c) for c in row]
+        if cols is None:
+            lowered = [c.lower() for c in cells]
+            if "local code system" in lowered:
+                i = lowered.index("local code system")
+                local_url = cells[i + 1] if i + 1 < len(cells) else None
+            if "code" in lowered and "local code" in lowered:
+                cols = {HEADERS[c]: i for i, c in enumerate(lowered) if c in HEADERS}
+            continue
+        entry = {}
+        for system, i in cols.items():
+            code = _code(row[i]) if i < len(row) else ""
+            if code and code != "-":
+                entry[system] = (code, _text(row[i + 1]) if i + 1 < len(row) else "")
+        if "racsel" in entry:
+            rows.append(entry)
+    return rows, local_url
+
+
+# ----------------- Recursos -----------------
+def _id(url: str) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, url))
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def _concepts(pairs):
+    seen, out = set(), []
+    for code, display in pairs:
+        if code not in seen:
+            seen.add(code)
+            out.append({"code": code, "display": display} if display else {"code": code})
+    return out
+
+
+def _codesystem(url: str, name: str, pairs) -> dict:
+    return {"resourceType": "CodeSystem", "id": _id(url), "url": url, "name": name, "version": VERSION,
+            "status": "active", "content": "fragment", "concept": _concepts(pairs)}
+
+
+def _valueset(url: str, name: str, by_system: dict) -> dict:
+    return {"resourceType": "ValueSet", "id": _id(url), "url": url, "name": name, "status": "active",
+            "compose": {"include": [{"system": system, "concept": _concepts(pairs)}
+                                    for system, pairs in by_system.items() if pairs]}}
+
+
+def _conceptmap(url: str, name: str, source: str, target: str, groups: dict, canonical: bool = True) -> dict:
+    """groups: {(sistema origen, sistema destino): [(código, término, código destino, término destino)]}"""
+    out = []
+    for (src_sys, tgt_sys), pairs in groups.items():
+        elements = {}
+        for code, display, tcode, tdisplay in pairs:
+            el = elements.setdefault(code, {"code": code, "display": display, "target": []})
+            if tcode not in {t["code"] for t in el["target"]}:
+                el["target"].append({"code": tcode, "display": tdisplay, "equivalence": "equivalent"})
+        if elements:
+            out.append({"source": src_sys, "target": tgt_sys, "element": list(elements.values())})
+    keys = ("sourceCanonical", "targetCanonical") if canonical else ("sourceUri", "targetUri")
+    return {"resourceType": "ConceptMap", "id": _id(url), "url": url, "name": name, "version": VERSION,
+            "status": "active", keys[0]: source, keys[1]: target, "group": out}
+
+
+def generate(wb: Workbook):
+    """(ruta en el paquete, recurso) de todos los recursos de la planilla, en orden estable."""
+    def system_url(title, system):
+        return wb.local_urls[title] if system == "local" else SYSTEMS[system][0]
+
+    def label(system):
+        return SYSTEMS[system][1]
+
+    # ---- CodeSystems (fragmentos con lo que aparece en la planilla)
+    by_cs = {}  # url -> [(code, display)]
+    for title, rows in wb.categories.items():
+        for r in rows:
+            for system, pair in r.items():
+                if system != "snomed":
+                    by_cs.setdefault((system, system_url(title, system)), []).append(pair)
+    if wb.prequal:
+        by_cs.setdefault(("prequal", SYSTEMS["prequal"][0]), [])[:0] = wb.prequal
+    cs_names = {"local": "LocalCodeSystem", "racsel": "RACSELCodeSystem", "icd10": "icd-10",
+                "icd11": "icd-11", "prequal": "PreQualCodeSystem"}
+    locals_ = sorted({u for (s, u) in by_cs if s == "local"})
+    for (system, url), pairs in sorted(by_cs.items()):
+        name = cs_names[system]
+        if system == "local" and len(locals_) > 1 and url != locals_[0]:
+            name = f"{name}-{_slug(url.rstrip('/').rsplit('/', 1)[-1])}"
+        yield f"CodeSystem/{name}.json", _codesystem(url, name, pairs)
+
+    # ---- ValueSets por categoría y globales
+    def vs_url(title, system):
+        if title is None or system not in ("local", "racsel", "snomed"):
+            return f"{VS_BASE}/{GLOBAL_VS[system]}"
+        slug = CATEGORIES[title][1]
+        return f"{VS_BASE}/{slug}-vs" if system == "snomed" else f"{VS_BASE}/{slug}-{system}-vs"
+
+    global_vs = {}  # sistema -> {url de sistema: [pares]}
+    for title, rows in wb.categories.items():
+        name = CATEGORIES[title][0]
+        for system, suffix in (("snomed", ""), ("racsel", "Racsel"), ("local", "Local")):
+            pairs = [r[system] for r in rows if system in r]
+            if pairs:
+                yield (f"ValueSet/{name}{suffix}ValueSet.json",
+                       _valueset(vs_url(title, system), f"{name}{suffix}ValueSet", {system_url(title, system): pairs}))
+        for r in rows:
+            for system, pair in r.items():
+                global_vs.setdefault(system, {}).setdefault(system_url(title, system), []).append(pair)
+    if wb.prequal:
+        global_vs.setdefault("prequal", {}).setdefault(SYSTEMS["prequal"][0], [])[:0] = wb.prequal
+    vs_names = {"local": "LocalValueSet", "racsel": "RACSELValueSet", "snomed": "SNOMEDValueSet",
+                "icd10": "CIE10ValueSet", "icd11": "CIE11ValueSet", "prequal": "PreQualValueSet"}
+    for system in ("local", "racsel", "snomed", "icd10", "icd11", "prequal"):
+        if system in global_vs:
+            arc = "VacunasPreQualValueSet" if system == "prequal" else vs_names[system]
+            yield f"ValueSet/{arc}.json", _valueset(vs_url(None, system), vs_names[system], global_vs[system])
+
+    def mappings(rows, title, a, b):
+        groups = {}
+        for r in rows:
+            if a in r and b in r:
+                groups.setdefault((system_url(title, a), system_url(title, b)), []).append(r[a] + r[b])
+        return groups
+
+    # ---- ConceptMaps por categoría (entre ValueSets)
+    for title, rows in wb.categories.items():
+        cat, cat_label = CATEGORIES[title][2], CATEGORIES[title][3]
+        for x, y in CATEGORY_PAIRS:
+            for a, b in ((x, y), (y, x)):
+                groups = mappings(rows, title, a, b)
+                if not groups:
+                    continue
+                la, lb = label(a), label(b)
+                url = f"{CM_BASE}/vs-{cat}-{la.lower()}-to-{lb.lower()}"
+                yield (f"ConceptMap/VS-{cat_label}-{la}-to-{lb}.json",
+                       _conceptmap(url, f"VS{cat_label}{la}to{lb}", vs_url(title, a), vs_url(title, b), groups))
+
+    # ---- ConceptMaps globales: entre CodeSystems y entre ValueSets globales
+    for x, y in GLOBAL_PAIRS:
+        for a, b in ((x, y), (y, x)):
+            groups = {}
+            for title, rows in wb.categories.items():
+                for key, pairs in mappings(rows, title, a, b).items():
+                    groups.setdefault(key, []).extend(pairs)
+            if not groups:
+                continue
+            la, lb = label(a), label(b)
+            src = system_url(next(iter(wb.categories)), a)
+            yield (f"ConceptMap/{la}-to-{lb}.json",
+                   _conceptmap(f"{src.rstrip('/')}/{la.lower()}-to-{lb.lower()}", f"{la} to {lb}",
+                               src, system_url(next(iter(wb.categories)), b), groups, canonical=False))
+            url = f"{CM_BASE}/vs-{la.lower()}-global-to-{lb.lower()}-global"
+            yield (f"ConceptMap/VS-{la}-Global-to-{lb}-Global.json",
+                   _conceptmap(url, f"VS{la}Globalto{lb}Global", vs_url(None, a), vs_url(None, b), groups))
+
+
+def package_sources(wb: Workbook):
+    """Fuentes para ph4h.package.PackageSpec: (ruta en el paquete, JSON en bytes)."""
+    return [(arcname, json.dumps(res, ensure_ascii=False, indent=2).encode("utf-8"))
+            for arcname, res in generate(wb)]
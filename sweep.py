@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Barrido de todos los servidores en un solo proceso (reemplaza checkThemAll.sh).
+
+Lee la tabla país/servidor/CodeSystem/código de servers.json, corre
+check-cs, check-vs y check-cm para cada servidor en paralelo y escribe
+<out-dir>/st-status-<PAÍS>.txt con el mismo formato que checkServer.sh.
+
+Uso:
+  python3 sweep.py [servers.json] [--out-dir current-status]
+                   [--max-inflight N] [--max-per-host N] [--budget SEG]
+                   [--metrics-dir DIR] [--cs-batch] [--vs-full] [--cm-coverage] [--cm-lean]
+                   [--routes routes.json] [--route-ttl SEG] [--only PAÍS ...]
+                   [--adaptive] [--aimd-start N] [--aimd-max N]
+
+Además de los reportes deja metrics.json y ph4h.prom (textfile collector
+de Prometheus) con las latencias p50/p95/p99/max por servidor/operación.
+
+Una entrada de servers.json puede traer "cs_checks" (lista de
+{"label", "system", "code"}) para reemplazar los pares CodeSystem/código
+por defecto de check-cs.
+
+En vez de "base", una entrada puede traer "bases" con varias rutas al
+mismo servidor (directa, vía proxy, ...): una carrera de /metadata elige la
+más rápida que responde, y la elección (con la latencia de cada ruta) se
+guarda en --routes durante --route-ttl segundos.
+
+Con --adaptive el tope de requests simultáneos de cada host no es fijo:
+arranca en --aimd-start y sube de a poco mientras las respuestas llegan
+rápido y sin errores, se recorta a la mitad ante timeouts, 429 o 5xx y
+respeta Retry-After (AIMD, ver ph4h.client.AdaptiveLimit). El límite final
+de cada host queda en su reporte y en la salida. Los hilos por check
+(CONCURRENCY) siguen siendo el máximo real.
+
+Modo daemon (historial en SQLite, re-checks incrementales):
+  python3 sweep.py --daemon [--db history.sqlite] [--interval 300] [--full-every 3600]
+
+Cada ciclo guarda los resultados en la base; los ValueSet/ConceptMap cuyo
+meta.versionId/lastUpdated no cambió (en un ConceptMap, tampoco la de su
+ValueSet origen) reutilizan su último resultado OK y cada --full-every
+segundos se fuerza un ciclo completo, que también re-verifica lo que la
+meta no cubre (p.ej. un cambio en el CodeSystem destino de un ConceptMap).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ph4h.checks import (CM_RETRIES, CM_SLEEP_RETRY, CS_RETRIES, CS_SLEEP_RETRY,
+                         VS_RETRIES, VS_SLEEP_RETRY, check_codesystems,
+                         check_conceptmaps, check_valuesets)
+from ph4h.client import (AIMD_MAX, AIMD_START, Deadline, FhirClient, Limits, env, host_port,
+                         shared_metrics, shared_pool)
+from ph4h.history import History
+from ph4h.routes import ROUTE_TIMEOUT, ROUTE_TTL, RouteCache
+
+
+def load_servers(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        servers = json.load(f)
+    for s in servers:
+        if s.get("bases") and not s.get("base"):
+            s["base"] = s["bases"][0]
+        for key in ("country", "base", "cs_local", "code"):
+            if not s.get(key):
+                raise ValueError(f"❌ {path}: entrada sin '{key}': {s}")
+    return servers
+
+
+def run_server(server: dict, limits: Limits, out_dir: Path, budget: float = 0,
+               history: History = None, full_every: float = 0, cs_batch: bool = None,
+               cm_coverage: bool = None, vs_full: bool = None, cm_lean: bool = None,
+               routes: RouteCache = None) -> Path:
+    """Corre los tres checks de un servidor (con un presupuesto común) y escribe su reporte."""
+    country = server["country"]
+    deadline = Deadline(budget)
+    cache = run_id = None
+    if history is not None:
+        full = time.time() - history.last_full(country) >= full_every
+        run_id = history.start_run(country, full)
+        cache = history.cache(country, run_id, full)
+    lines = [
+        "=====================================================",
+        f" Reporte de estado SNOWSTORM - FHIR - País: {country}",
+        f" Fecha: {time.strftime('%a %b %d %I:%M:%S %p %Z %Y')}",
+        "=====================================================",
+        "",
+    ]
+    emit = lines.append
+
+    bases = server.get("bases") or [server["base"]]
+    base = bases[0]
+    if len(bases) > 1:
+        routes = routes or RouteCache()
+        racer = FhirClient(ROUTE_TIMEOUT, 0, 0, limits=limits, log=emit, deadline=deadline, label=country)
+        base = routes.pick(racer, country, bases, emit=emit)
+
+    checks = [
+        ("check-cs.py", CS_RETRIES, CS_SLEEP_RETRY,
+         lambda c: check_codesystems(c, base, server["cs_local"], server["code"], emit=emit, cache=cache,
+                                     cs_checks=server.get("cs_checks"), batch=cs_batch)),
+        ("check-vs.py", VS_RETRIES, VS_SLEEP_RETRY,
+         lambda c: check_valuesets(c, base, emit=emit, cache=cache, full=vs_full)),
+        ("check-cm.py", CM_RETRIES, CM_SLEEP_RETRY,
+         lambda c: check_conceptmaps(c, base, emit=emit, cache=cache, coverage=cm_coverage, lean=cm_lean)),
+    ]
+    rcs = []
+    for name, retries, sleep_retry, run in checks:
+        client = FhirClient.from_env(retries=retries, sleep_retry=sleep_retry, limits=limits, log=emit,
+                                     deadline=deadline, label=country)
+        try:
+            rcs.append(run(client))
+        except Exception:
+            # Equivalente al 2>&1 de checkServer.sh: el traceback queda en el reporte
+            emit(f"[FAIL] {name} abortó:")
+            lines.extend(traceback.format_exc().rstrip("\n").split("\n"))
+            rcs.append(1)
+
+    if len(bases) > 1 and all(rcs):
+        routes.invalidate(country)  # nada anduvo por esta ruta: el próximo barrido vuelve a correr la carrera
+
+    limits.report(emit, host_port(base))
+    lines += [""] + shared_metrics().summary_lines(country)
+    lines += ["", f"✅ Revisión completada para {country}"]
+
+    out_path = out_dir / f"st-status-{country}.txt"
+    tmp_path = out_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, out_path)
+    if history is not None:
+        history.finish_run(run_id, rcs, "\n".join(lines))
+    return out_path
+
+
+def sweep_once(servers, limits: Limits, args, history: History = None, routes: RouteCache = None):
+    """Un barrido completo; devuelve los segundos que tomó."""
+    print(f"Checking {len(servers)} servers...")
+    t0 = time.monotonic()
+    # Un hilo por servidor: el tiempo total lo marca el servidor más lento;
+    # la carga real la acotan los topes de Limits.
+    with ThreadPoolExecutor(max_workers=max(1, len(servers))) as pool:
+        futures = [(s["country"], pool.submit(run_server, s, limits, Path(args.out_dir), args.budget,
+                                              history, args.full_every, args.cs_batch, args.cm_coverage, args.vs_full,
+                                              args.cm_lean, routes))
+                   for s in servers]
+        for country, fut in futures:
+            try:
+                print(f"Resultado guardado en: {fut.result()}")
+            except Exception as e:
+                print(f"❌ {country}: {e}", file=sys.stderr)
+    shared_pool().stats.report()
+    limits.report()
+    shared_metrics().export(Path(args.metrics_dir or args.out_dir))
+    elapsed = time.monotonic() - t0
+    print(f"Finished in {elapsed:.1f}s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica todos los servidores FHIR de servers.json en un solo proceso.")
+    parser.add_argument("config", nargs="?", default="servers.json", help="Tabla de servidores (JSON)")
+    parser.add_argument("--out-dir", default="current-status", help="Carpeta de los reportes st-status-<PAÍS>.txt")
+    parser.add_argument("--max-inflight", type=int, default=int(env("MAX_INFLIGHT", "32")),
+                        help="Tope global de requests simultáneos (0 = sin tope)")
+    parser.add_argument("--max-per-host", type=int, default=int(env("MAX_PER_HOST", "4")),
+                        help="Tope de requests simultáneos por host (0 = sin tope)")
+    parser.add_argument("--budget", type=float, default=float(env("SERVER_BUDGET", "300")),
+                        help="Segundos máximos por servidor para los tres checks (0 = sin límite)")
+    parser.add_argument("--metrics-dir", help="Dónde escribir metrics.json y ph4h.prom (por defecto --out-dir)")
+    parser.add_argument("--cs-batch", action="store_true", default=None,
+                        help="check-cs en un Bundle batch, reportando todos los resultados (CS_BATCH=1)")
+    parser.add_argument("--vs-full", action="store_true", default=None,
+                        help="check-vs recorre la expansión completa de cada ValueSet (VS_FULL=1)")
+    parser.add_argument("--cm-coverage", action="store_true", default=None,
+                        help="check-cm traduce todos los códigos de cada ConceptMap (CM_COVERAGE=1)")
+    parser.add_argument("--cm-lean", action="store_true", default=None,
+                        help="check-cm lista solo los campos necesarios y no relee cada ConceptMap (CM_LEAN=1)")
+    parser.add_argument("--routes", help="Rutas elegidas por país (JSON; por defecto <out-dir>/routes.json)")
+    parser.add_argument("--route-ttl", type=float, default=ROUTE_TTL,
+                        help="Segundos que vale la ruta elegida antes de volver a correr la carrera (ROUTE_TTL)")
+    parser.add_argument("--adaptive", action="store_true", default=env("ADAPTIVE_LIMITS", "0") == "1",
+                        help="Tope por host adaptativo (AIMD) en vez de --max-per-host (ADAPTIVE_LIMITS=1)")
+    parser.add_argument("--aimd-start", type=float, default=AIMD_START,
+                        help="Requests simultáneos por host al arrancar (--adaptive, AIMD_START)")
+    parser.add_argument("--aimd-max", type=float, default=AIMD_MAX,
+                        help="Techo del tope adaptativo por host (--adaptive, AIMD_MAX)")
+    parser.add_argument("--only", nargs="*", help="Limitar el barrido a estos países")
+    parser.add_argument("--daemon", action="store_true", help="Repetir el barrido cada --interval segundos")
+    parser.add_argument("--db", help="Historial SQLite (por defecto history.sqlite con --daemon)")
+    parser.add_argument("--interval", type=float, default=300, help="Segundos entre inicios de ciclo (--daemon)")
+    parser.add_argument("--full-every", type=float, default=3600,
+                        help="Forzar un ciclo completo cada N segundos (0 = siempre completo); solo ese "
+                             "ciclo ve cambios en el CodeSystem destino de un ConceptMap")
+    args = parser.parse_args()
+
+    servers = load_servers(Path(args.config))
+    if args.only:
+        wanted = {c.upper() for c in args.only}
+        servers = [s for s in servers if s["country"].upper() in wanted]
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    limits = Limits(args.max_inflight, args.max_per_host, args.adaptive, args.aimd_start, args.aimd_max)
+    routes = RouteCache(args.routes or out_dir / "routes.json", args.route_ttl)
+
+    db = args.db or ("history.sqlite" if args.daemon else None)
+    history = History(db) if db else None
+    try:
+        if not args.daemon:
+            sweep_once(servers, limits, args, history, routes)
+            return
+        while True:
+            shared_metrics().reset()
+            elapsed = sweep_once(servers, limits, args, history, routes)
+            time.sleep(max(0.0, args.interval - elapsed))
+    except KeyboardInterrupt:
+        print("Daemon detenido.")
+    finally:
+        if history is not None:
+            history.close()
+
+
+if __name__ == "__main__":
+    main()
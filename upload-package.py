@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Carga un paquete .tgz en varios servidores Snowstorm a la vez y lo verifica.
+
+Uso:
+  python3 upload-package.py PAQUETE.tgz BASE_URL [BASE_URL ...]
+  python3 upload-package.py PAQUETE.tgz --only PAÍS [PAÍS ...] [--servers servers.json]
+        [--jobs N] [--timeout SEG] [--retries N] [--db history.sqlite] [--force] [--no-check]
+
+Por cada servidor: si el registro de cargas (--db) dice que ya tiene este
+mismo .tgz (nombre, versión y sha256) y el servidor lo confirma, se omite;
+si no, se sube en streaming a <raíz>/fhir-admin/load-package (o a "admin"
+de la entrada de servers.json) y se compara el paquete con el servidor
+(como diff-package.py). Sale con 1 si algún servidor falla.
+"""
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ph4h.client import FhirClient, Limits, env, host_of
+from ph4h.history import History
+from ph4h.upload import upload
+from sweep import load_servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga un paquete FHIR en varios servidores Snowstorm y lo verifica.")
+    parser.add_argument("package", help="Paquete .tgz")
+    parser.add_argument("bases", nargs="*", help="URL base FHIR de cada servidor")
+    parser.add_argument("--only", nargs="*", help="Servidores de --servers (por país)")
+    parser.add_argument("--servers", default="servers.json", help="Tabla de servidores (con --only)")
+    parser.add_argument("--jobs", type=int, default=4, help="Servidores cargados a la vez")
+    parser.add_argument("--timeout", type=float, help="Segundos de espera de la respuesta de load-package (UPLOAD_TIMEOUT)")
+    parser.add_argument("--retries", type=int, help="Reintentos de la carga (UPLOAD_RETRIES)")
+    parser.add_argument("--max-per-host", type=int, default=int(env("MAX_PER_HOST", "4")),
+                        help="Tope de requests simultáneos por host en la verificación (0 = sin tope)")
+    parser.add_argument("--db", default="history.sqlite", help="Registro de cargas (SQLite)")
+    parser.add_argument("--force", action="store_true", help="Cargar aunque el registro diga que ya está")
+    parser.add_argument("--no-check", action="store_true", help="No comparar el paquete con el servidor después de cargar")
+    args = parser.parse_args()
+
+    targets = [{"country": host_of(b), "base": b} for b in args.bases]
+    if args.only:
+        wanted = {c.upper() for c in args.only}
+        targets += [s for s in load_servers(Path(args.servers)) if s["country"].upper() in wanted]
+    if not targets:
+        parser.error("indicar al menos un BASE_URL o --only PAÍS")
+    package = Path(args.package)
+    if not package.is_file():
+        parser.error(f"no existe el paquete {package}")
+
+    history = History(args.db)
+    limits = Limits(0, args.max_per_host)
+
+    def run(server):
+        lines = []
+        client = FhirClient.from_env(limits=limits, log=lines.append, label=server["country"])
+        try:
+            rc = upload(client, server["base"], package, history=history, force=args.force,
+                        check=not args.no_check, emit=lines.append, admin_url=server.get("admin"),
+                        timeout=args.timeout, retries=args.retries)
+        except Exception as e:
+            lines.append(f"[FAIL] {server['country']}: {e}")
+            rc = 1
+        return lines, rc
+
+    failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            for server, (lines, rc) in zip(targets, pool.map(run, targets)):
+                print(f"===== {server['country']} ({server['base']}) =====")
+                for line in lines:
+                    print(line)
+                failed += rc != 0
+    finally:
+        history.close()
+    print(f"[RESUMEN] Servidores: {len(targets)} | OK: {len(targets) - failed} | con FAIL: {failed}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
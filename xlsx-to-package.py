@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Genera los paquetes FHIR de cada país a partir de sus planillas de subsets.
+
+Uso:
+  python3 xlsx-to-package.py [planilla.xlsx ...] [--out-dir packages] [--names spreadsheets/package-names.json]
+                             [--jobs N] [--level 0-9] [--force]
+
+Sin planillas toma spreadsheets/*.xlsx. Cada planilla se lee fila por fila
+(openpyxl read_only) y su paquete se arma en memoria, sin carpeta
+intermedia de JSON; las planillas se procesan en paralelo en procesos
+separados (el parseo de xlsx es CPU puro). Un manifiesto en la carpeta de
+salida guarda el SHA-256 de cada planilla y del paquete generado: si ni la
+planilla, ni el generador, ni el .tgz cambiaron, la planilla se salta sin abrirla.
+
+Nombre de salida: el de --names si la planilla está ahí; si no, el paquete
+que ya existe para ese país en --out-dir (BAHAMAS-ALLEN-racsel_fhir_package.tgz
+para 2025_BAHAMAS_...), así se reemplaza en lugar de duplicarlo; si no hay
+ninguno, <PAÍS>_racsel_fhir_package.tgz.
+
+Diferencias con los paquetes de packages/ armados a mano:
+- ids uuid5 del canonical (estables) en vez de uuid4 al azar, y códigos
+  siempre como string (algunos venían como número);
+- 6 ConceptMap más: Antecedentes CIE10 <-> Local y Global CIE10/CIE11 <-> Local,
+  que salen de las columnas de la planilla y no se habían armado;
+- archivos *PreQual* en vez de *Prequal* (VS-Vacunas-CIE11-to-PreQual.json, ...);
+- CodeSystem sin códigos repetidos (icd-11 traía XM0N50 dos veces);
+- lo que cambió en la planilla desde el armado manual (COSTARICA: la hoja
+  Diagnósticos ya no trae códigos locales, así que no hay recursos
+  Diagnosticos Local).
+"""
+import argparse
+import glob
+import hashlib
+import json
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import ph4h.package
+import ph4h.workbook
+from ph4h.package import PackageSpec, build_package, file_sha256
+from ph4h.workbook import package_sources, read_workbook
+
+CACHE_FILE = ".xlsx-build-cache.json"
+PACKAGE_SUFFIX = "racsel_fhir_package.tgz"
+
+
+def generator_version() -> str:
+    """Huella del código que genera los paquetes: si cambia, se regeneran todos."""
+    h = hashlib.sha256()
+    for module in (ph4h.workbook, ph4h.package):
+        h.update(Path(module.__file__).read_bytes())
+    return h.hexdigest()
+
+
+def country_of(xlsx: Path) -> str:
+    """2025_BAHAMAS_Subsets_Conectaton.xlsx -> BAHAMAS"""
+    parts = xlsx.stem.split("_")
+    return parts[1].upper() if len(parts) > 1 else xlsx.stem.upper()
+
+
+def existing_package(out_dir: Path, country: str):
+    """El paquete que ya hay para el país en out_dir (PAÍS_... o PAÍS-ALGO-...), si hay uno solo."""
+    pattern = re.compile(rf"{re.escape(country)}[-_](.*[-_])?{re.escape(PACKAGE_SUFFIX)}$")
+    found = [p for p in out_dir.glob(f"{country}*{PACKAGE_SUFFIX}") if pattern.match(p.name)]
+    return found[0] if len(found) == 1 else None
+
+
+def output_names(workbooks, out_dir: Path, names: dict = None) -> dict:
+    """
+    Planilla -> .tgz: el de `names` ({planilla: archivo}), el paquete ya
+    existente del país, o PAÍS_racsel_fhir_package.tgz; si dos planillas son
+    del mismo país y ninguna está en `names`, se agrega el último token del nombre.
+    """
+    names = names or {}
+    countries = [country_of(x) for x in workbooks]
+    out = {}
+    for xlsx, country in zip(workbooks, countries):
+        if xlsx.name in names:
+            out[xlsx] = out_dir / names[xlsx.name]
+        elif countries.count(country) > 1:
+            out[xlsx] = out_dir / f"{country}-{xlsx.stem.split('_')[-1]}_{PACKAGE_SUFFIX}"
+        else:
+            out[xlsx] = existing_package(out_dir, country) or out_dir / f"{country}_{PACKAGE_SUFFIX}"
+    clash = [o.name for o in out.values() if list(out.values()).count(o) > 1]
+    if clash:
+        raise ValueError(f"dos planillas generan el mismo paquete: {', '.join(sorted(set(clash)))}")
+    return out
+
+
+def build_country(xlsx: Path, output: Path, compresslevel: int = 9) -> str:
+    """Planilla -> paquete (corre en un proceso aparte). Devuelve el SHA-256 del .tgz."""
+    wb = read_workbook(xlsx)
+    spec = PackageSpec(
+        name="racsel.connectathon",
+        version="1.0.0",
+        output=output,
+        sources=package_sources(wb),
+        description="RACSEL Connectathon FHIR Package",
+        author="RACSEL",
+        url="http://racsel.org",
+        cache=False,  # la cache de este script es por planilla, no por recurso
+    )
+    build_package(spec, compresslevel=compresslevel, force=True,
+                  log=lambda msg: print(f"[{xlsx.name}] {msg}", flush=True))
+    return file_sha256(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera los paquetes FHIR de cada país desde sus planillas .xlsx.")
+    parser.add_argument("workbooks", nargs="*", help="Planillas (por defecto spreadsheets/*.xlsx)")
+    parser.add_argument("--out-dir", default="packages", help="Carpeta de salida de los .tgz")
+    parser.add_argument("--names", default="spreadsheets/package-names.json",
+                        help="JSON {planilla: archivo .tgz} para las planillas cuyo nombre no se puede deducir")
+    parser.add_argument("--jobs", type=int, default=None, help="Procesos en paralelo (por defecto, uno por CPU)")
+    parser.add_argument("--level", type=int, default=9, choices=range(0, 10), metavar="0-9", help="Nivel de compresión gzip")
+    parser.add_argument("--force", action="store_true", help="Regenerar todo aunque nada haya cambiado")
+    args = parser.parse_args()
+
+    workbooks = [Path(p) for p in (args.workbooks or sorted(glob.glob("spreadsheets/*.xlsx")))]
+    if not workbooks:
+        print("❌ No hay planillas para procesar", file=sys.stderr)
+        sys.exit(1)
+    out_dir = Path(args.out_dir)
+    names = {}
+    if Path(args.names).is_file():
+        with open(args.names, "r", encoding="utf-8") as f:
+            names = json.load(f)
+    try:
+        outputs = output_names(workbooks, out_dir, names)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    cache_path = out_dir / CACHE_FILE
+
+    version = generator_version()
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    entries = cache.get("workbooks", {}) if cache.get("generator") == version and not args.force else {}
+
+    pending = []
+    for xlsx in workbooks:
+        output = outputs[xlsx]
+        digest = file_sha256(xlsx)
+        prev = entries.get(xlsx.name) or {}
+        if (prev.get("sha256") == digest and prev.get("output") == output.name and output.exists()
+                and prev.get("package_sha256") == file_sha256(output)):
+            print(f"✅ Sin cambios: {xlsx.name} -> {output}")
+            continue
+        pending.append((xlsx, output, digest))
+
+    failed = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [(xlsx, output, digest, pool.submit(build_country, xlsx, output, args.level))
+                       for xlsx, output, digest in pending]
+            for xlsx, output, digest, fut in futures:
+                try:
+                    entries[xlsx.name] = {"sha256": digest, "output": output.name, "package_sha256": fut.result()}
+                except Exception as e:
+                    print(f"❌ {xlsx.name}: {e}", file=sys.stderr)
+                    entries.pop(xlsx.name, None)
+                    failed += 1
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path.with_name(cache_path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"generator": version, "workbooks": entries}, f, indent=2, sort_keys=True)
+    tmp.replace(cache_path)
+    print(f"[RESUMEN] Planillas: {len(workbooks)} | generadas: {len(pending) - failed} | "
+          f"sin cambios: {len(workbooks) - len(pending)} | con error: {failed}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()